@@ -0,0 +1,124 @@
+"""
+Load test for api_server.py: starts the server on a database of synthetic
+reservations, then client processes keep making one kind of request over
+keep-alive connections for a few seconds, and the throughput, latency and
+status codes of each kind are reported.
+
+Run with:
+    python api_load.py [--rows N] [--clients N] [--workers N] [--seconds S]
+
+Works on a throwaway database in a temporary directory (see benchmark.py), so
+it never touches the real flights.db.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import random
+import time
+
+import api_server
+import repository
+from benchmark import FIRST_NAMES, fill_database, generate_rows, latency_summary, use_database
+
+
+def run_api_server(path, workers, ports):
+    """The API server process of bench_api(); reports the port it listens on through `ports`."""
+    repository.DATABASE_NAME = path
+    server = api_server.APIServer(("127.0.0.1", 0), workers)
+    ports.put(server.server_address[1])
+    server.serve_forever()
+
+
+def run_api_client(port, scenario, seconds, first, max_id):
+    """
+    One load-test client process: makes `scenario` requests over a single
+    keep-alive connection for `seconds`. Returns the status codes seen and the
+    latency of every request.
+    """
+    rng = random.Random(first)
+    rows = generate_rows(10 ** 6, seed=first, first=first)
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    fields = ("name", "flight_number", "departure", "destination", "date", "seat_number")
+
+    def booking():
+        row = next(rows)
+        return dict(zip(fields, row[:4] + (row[4].replace("2025", "2032", 1), row[5])))
+
+    def request():
+        if scenario == "list page":
+            return "GET", f"/reservations?after={rng.randrange(max_id)}&limit=50", None
+        if scenario == "get by ID":
+            return "GET", f"/reservations/{rng.randrange(1, max_id)}", None
+        if scenario == "search":
+            return "GET", f"/reservations?name={rng.choice(FIRST_NAMES)}&limit=50", None
+        if scenario == "book":
+            return "POST", "/reservations", booking()
+        return "POST", "/reservations/batch", {"reservations": [booking() for _ in range(100)]}
+
+    statuses, samples = {}, []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        method, url, body = request()
+        data = None if body is None else json.dumps(body)
+        start = time.perf_counter()
+        conn.request(method, url, body=data, headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        response.read()
+        samples.append(time.perf_counter() - start)
+        statuses[response.status] = statuses.get(response.status, 0) + 1
+    conn.close()
+    return statuses, samples
+
+
+def bench_api(args):
+    """
+    Load-tests api_server.py: client processes keep making one kind of request
+    over keep-alive connections for a few seconds, and the throughput and
+    latency of each kind are reported.
+    """
+    path = use_database("api.db")
+    start = time.perf_counter()
+    fill_database(args.rows)
+    print(f"Loaded {args.rows} rows in {time.perf_counter() - start:.1f}s")
+    repository.close_connections()
+
+    ports = multiprocessing.Queue()
+    server = multiprocessing.Process(target=run_api_server, args=(path, args.workers, ports), daemon=True)
+    server.start()
+    port = ports.get(timeout=30)
+    print(f"{args.clients} clients, {args.workers} server workers, {args.seconds:g} s per request kind")
+    print(f"{'request':<20}{'requests':>10}{'req/s':>10}{'rows/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}  statuses")
+    try:
+        with multiprocessing.Pool(args.clients) as pool:
+            for scenario in ("list page", "get by ID", "search", "book", "batch of 100"):
+                work = [(port, scenario, args.seconds, args.rows + (index + 1) * 10 ** 6, args.rows)
+                        for index in range(args.clients)]
+                outcomes = pool.starmap(run_api_client, work)
+                samples = [sample for _, client_samples in outcomes for sample in client_samples]
+                statuses = {}
+                for client_statuses, _ in outcomes:
+                    for status, count in client_statuses.items():
+                        statuses[status] = statuses.get(status, 0) + count
+                summary = latency_summary(samples)
+                rate = len(samples) / args.seconds
+                rows = rate * (100 if scenario == "batch of 100" else 1)
+                print(f"{scenario:<20}{len(samples):>10}{rate:>10.0f}{rows:>10.0f}{summary['p50_ms']:>9.2f}"
+                      f"{summary['p99_ms']:>9.2f}{summary['max_ms']:>9.2f}  "
+                      + " ".join(f"{status}x{count}" for status, count in sorted(statuses.items())))
+    finally:
+        server.terminate()
+        server.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Requests/sec of the FlightyReserveMate HTTP API")
+    parser.add_argument("--rows", type=int, default=100000, help="synthetic reservations to load")
+    parser.add_argument("--clients", type=int, default=8, help="client processes, one keep-alive connection each")
+    parser.add_argument("--workers", type=int, default=16, help="server worker threads")
+    parser.add_argument("--seconds", type=float, default=5.0, help="how long each kind of request is made")
+    bench_api(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
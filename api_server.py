@@ -0,0 +1,425 @@
+"""
+Optional local HTTP/JSON API over the reservations database, for other tools.
+
+Usage:
+    python api_server.py [--db PATH] [--host 127.0.0.1] [--port 8080] [--workers N] [--log]
+
+Endpoints (request and response bodies are JSON; reservations are objects with
+id and the fields of validation.FIELDS):
+
+    GET    /reservations                 one page, in ID order (see below)
+    GET    /reservations/ID              {"reservation": {...}, "version": N}
+    POST   /reservations                 book one: {"name": ..., ...} -> 201 {"id": N}
+    PUT    /reservations/ID              change one -> {"id": N, "version": N}; pass
+                                         "version" to refuse (409, with what is stored
+                                         now) if someone else changed it since
+    DELETE /reservations/ID              delete one (it can be restored, see cli.py)
+    POST   /reservations/batch           book many: {"reservations": [{...}, ...]}
+    POST   /reservations/batch/update    change many: {"reservations": [{"id": N, ...}, ...]}
+    POST   /reservations/batch/delete    delete many: {"ids": [N, ...]}
+    GET    /flights/FLIGHT/DATE/seats    {"booked": ["12A", ...]}
+    GET    /changes?since=N              {"watermark": N, "changes": {"ID": "I"|"U"|"D"} or null}
+
+GET /reservations takes ?limit=N (at most MAX_PAGE_SIZE) and either ?after=ID or
+?before=ID, and returns {"reservations": [...], "next_after": ID or null,
+"prev_before": ID or null}; pass next_after back as ?after= for the next page,
+or prev_before as ?before= for the one before (which may be empty).
+Any of ?name= (prefix), ?fuzzy=, ?flight=, ?from=, ?to=, ?date_from=,
+?date_to=, ?ids=1,2,3 (at most MAX_PAGE_SIZE) and ?archived=1 turn it into a
+search with the same paging. Batch calls answer {"results": [{"index": ...,
+"ok": ..., "id": ..., "error": ..., "fields": ...}]}, one per item in order.
+Each item is checked on its own: an invalid one fails with its problems in
+"fields" ({field: problem}, otherwise null) while the rest are still written.
+
+Errors are {"error": {"title": ..., "message": ...}} with 400 for invalid
+input (and "fields": {field: problem} when reservation fields are invalid), 404 for unknown reservations, 409 for seat, route and edit conflicts,
+and 503 (with Retry-After) while another program keeps the database locked.
+
+Requests are handled concurrently by a fixed pool of worker threads, each
+keeping its own pooled repository connection, so connections are opened once
+per worker rather than once per request. Keep-alive connections are
+supported; each one holds a worker while it is open, up to KEEPALIVE_TIMEOUT
+seconds idle. There is no authentication: the server listens on localhost
+unless told otherwise.
+"""
+import argparse
+import json
+import re
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import repository
+from instrumentation import span
+from repository import (DatabaseBusyError, InvalidReservationError, RepositoryError, ReservationConflictError,
+                        ReservationNotFoundError, RouteConflictError, SeatUnavailableError)
+from validation import FIELDS, check_reservation, describe_errors
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+
+# Requests handled at once; each worker keeps one database connection
+API_WORKERS = 16
+
+# Seconds an idle keep-alive connection may hold on to a worker
+KEEPALIVE_TIMEOUT = 5
+
+MAX_PAGE_SIZE = 1000
+DEFAULT_PAGE_SIZE = 200
+MAX_BATCH_SIZE = 10000
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+# Seconds a client is asked to wait before retrying while the database is busy
+BUSY_RETRY_AFTER = 1
+
+# SQLite lets one connection write at a time, and a connection that finds the
+# database locked polls for it with growing sleeps, so under load some writes
+# starve while others go through. Workers take turns on this lock instead;
+# other processes are still waited for by SQLite.
+_write_lock = threading.Lock()
+
+COLUMNS = ("id",) + FIELDS
+
+# Query parameters of GET /reservations that make it a search, and the
+# search_reservations() argument each one sets
+SEARCH_PARAMETERS = {
+    "name": "name",
+    "fuzzy": "fuzzy_name",
+    "flight": "flight_number",
+    "from": "departure",
+    "to": "destination",
+    "date_from": "date_from",
+    "date_to": "date_to",
+}
+
+
+class APIError(Exception):
+    """A request the API refuses; becomes an error response with `status`."""
+
+    def __init__(self, status, title, message, fields=None):
+        super().__init__(message)
+        self.status = status
+        self.title = title
+        self.fields = fields
+
+
+def _status_of(error):
+    """The HTTP status that reports a RepositoryError."""
+    if isinstance(error, ReservationNotFoundError):
+        return 404
+    if isinstance(error, (SeatUnavailableError, RouteConflictError, ReservationConflictError)):
+        return 409
+    if isinstance(error, InvalidReservationError):
+        return 400
+    if isinstance(error, DatabaseBusyError):
+        return 503
+    return 500
+
+
+def _reservation_json(reservation):
+    return dict(zip(COLUMNS, reservation))
+
+
+def _fields(item):
+    """The reservation fields of a request object, in FIELDS order, checked like the booking form."""
+    if not isinstance(item, dict):
+        raise APIError(400, "Input Error", "Each reservation must be a JSON object.")
+    fields = tuple(("" if item.get(field) is None else str(item.get(field))).strip() for field in FIELDS)
+    errors = check_reservation(*fields)
+    if errors:
+        raise APIError(400, "Input Error", describe_errors(errors), errors)
+    return fields
+
+
+def _int(value, name):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise APIError(400, "Input Error", f"{name} must be a whole number.") from None
+
+
+def _result_json(index, result):
+    return {"index": index, "ok": result.ok, "id": result.reservation_id, "error": result.error, "fields": None}
+
+
+def _write_batch(items, make_row, write):
+    """
+    Turns each batch item into a row with make_row() and writes the rows that
+    could be made with write(); an item make_row() refuses fails on its own.
+
+    Returns:
+        tuple: (200, {"results": [...]}), one result per item in order.
+    """
+    results = [None] * len(items)
+    rows, indexes = [], []
+    for index, item in enumerate(items):
+        try:
+            rows.append(make_row(item))
+            indexes.append(index)
+        except APIError as e:
+            results[index] = {"index": index, "ok": False, "id": None, "error": str(e), "fields": e.fields}
+    if rows:
+        with _write_lock:
+            for index, result in zip(indexes, write(rows)):
+                results[index] = _result_json(index, result)
+    return 200, {"results": results}
+
+
+def _batch_items(body, key):
+    items = body.get(key) if isinstance(body, dict) else None
+    if not isinstance(items, list):
+        raise APIError(400, "Input Error", f'Expected {{"{key}": [...]}}.')
+    if len(items) > MAX_BATCH_SIZE:
+        raise APIError(413, "Batch Too Large", f"At most {MAX_BATCH_SIZE} items per batch.")
+    return items
+
+
+# --- Endpoints: each takes the handler, the query, the body (if it has one) and
+# the groups of its path, and returns (status, JSON payload) ---
+
+def list_reservations(handler, query):
+    limit = max(1, min(_int(query.get("limit", DEFAULT_PAGE_SIZE), "limit"), MAX_PAGE_SIZE))
+    after_id = _int(query.get("after", 0), "after")
+    before_id = _int(query["before"], "before") if "before" in query else None
+    filters = {argument: query[parameter] for parameter, argument in SEARCH_PARAMETERS.items() if query.get(parameter)}
+    if query.get("ids"):
+        ids = query["ids"].split(",")
+        # Each ID is a bound parameter, and SQLite limits how many a statement takes
+        if len(ids) > MAX_PAGE_SIZE:
+            raise APIError(400, "Input Error", f"At most {MAX_PAGE_SIZE} ids per request.")
+        filters["reservation_ids"] = [_int(value, "ids") for value in ids]
+    archived = query.get("archived", "") in ("1", "true", "yes")
+    if filters or archived:
+        rows = repository.search_reservations(after_id=after_id, limit=limit, before_id=before_id,
+                                              include_archived=archived, **filters)
+    else:
+        rows = repository.get_reservations_page(after_id=after_id, limit=limit, before_id=before_id)
+    return 200, {
+        "reservations": [_reservation_json(row) for row in rows],
+        "next_after": rows[-1][0] if len(rows) == limit else None,
+        "prev_before": rows[0][0] if rows else None,
+    }
+
+
+def get_reservation(handler, query, reservation_id):
+    found = repository.get_versioned_reservation(int(reservation_id))
+    if found is None:
+        raise ReservationNotFoundError(reservation_id)
+    reservation, version = found
+    return 200, {"reservation": _reservation_json(reservation), "version": version}
+
+
+def add_reservation(handler, query, body):
+    fields = _fields(body)
+    with _write_lock:
+        return 201, {"id": repository.add_reservation(*fields)}
+
+
+def update_reservation(handler, query, body, reservation_id):
+    version = body.get("version") if isinstance(body, dict) else None
+    fields = _fields(body)
+    expected_version = None if version is None else _int(version, "version")
+    try:
+        with _write_lock:
+            version = repository.update_reservation(int(reservation_id), *fields, expected_version=expected_version)
+    except ReservationConflictError as e:
+        # What is stored now, so the client can show the difference and retry on top of it
+        return 409, {"error": {"title": e.title, "message": str(e)},
+                     "reservation": _reservation_json(e.current), "version": e.version}
+    return 200, {"id": int(reservation_id), "version": version}
+
+
+def delete_reservation(handler, query, reservation_id):
+    with _write_lock:
+        repository.delete_reservation(int(reservation_id))
+    return 200, {"deleted": int(reservation_id)}
+
+
+def add_reservations(handler, query, body):
+    return _write_batch(_batch_items(body, "reservations"), _fields, repository.add_reservations)
+
+
+def _update_row(item):
+    return (_int(item.get("id") if isinstance(item, dict) else None, "id"),) + _fields(item)
+
+
+def update_reservations(handler, query, body):
+    return _write_batch(_batch_items(body, "reservations"), _update_row, repository.update_reservations)
+
+
+def delete_reservations(handler, query, body):
+    return _write_batch(_batch_items(body, "ids"), lambda value: _int(value, "ids"), repository.delete_reservations)
+
+
+def get_booked_seats(handler, query, flight_number, date):
+    return 200, {"booked": repository.get_booked_seats(flight_number, date)}
+
+
+def get_changes(handler, query):
+    since = _int(query.get("since", 0), "since")
+    limit = max(1, min(_int(query.get("limit", 1000), "limit"), MAX_PAGE_SIZE * 10))
+    watermark, changes = repository.get_changes_since(since, limit)
+    return 200, {"watermark": watermark,
+                 "changes": None if changes is None else {str(key): op for key, op in changes.items()}}
+
+
+# (method, path pattern, endpoint, takes a body); matched in order
+ROUTES = [
+    ("GET", r"/reservations", list_reservations, False),
+    ("POST", r"/reservations", add_reservation, True),
+    ("POST", r"/reservations/batch", add_reservations, True),
+    ("POST", r"/reservations/batch/update", update_reservations, True),
+    ("POST", r"/reservations/batch/delete", delete_reservations, True),
+    ("GET", r"/reservations/(\d+)", get_reservation, False),
+    ("PUT", r"/reservations/(\d+)", update_reservation, True),
+    ("DELETE", r"/reservations/(\d+)", delete_reservation, False),
+    ("GET", r"/flights/([^/]+)/([^/]+)/seats", get_booked_seats, False),
+    ("GET", r"/changes", get_changes, False),
+]
+_ROUTES = [(method, re.compile(pattern + "/?"), endpoint, takes_body) for method, pattern, endpoint, takes_body in ROUTES]
+
+
+class APIRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, so clients do not reconnect for every call
+    timeout = KEEPALIVE_TIMEOUT
+    # Headers and body go out as two writes; with Nagle's algorithm the body
+    # waits for the client's delayed ACK, adding ~40 ms to every response
+    disable_nagle_algorithm = True
+    log_requests = False
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method):
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        self.body_read = False
+        retry_after = None
+        try:
+            route, groups = self._route(method, url.path)
+            with span(f"api.{route[2].__name__}"):
+                body = self._read_body() if route[3] else None
+                args = (self, query) + ((body,) if route[3] else ()) + groups
+                status, payload = route[2](*args)
+        except APIError as e:
+            status, payload = e.status, {"error": {"title": e.title, "message": str(e)}}
+            if e.fields:
+                payload["error"]["fields"] = e.fields
+        except RepositoryError as e:
+            status, payload = _status_of(e), {"error": {"title": e.title, "message": str(e)}}
+            if status == 503:
+                retry_after = BUSY_RETRY_AFTER
+        except Exception:
+            self.log_error("%s", traceback.format_exc())
+            status, payload = 500, {"error": {"title": "Server Error", "message": "The request could not be handled."}}
+        if not self.body_read and self.headers.get("Content-Length", "0") != "0":
+            self.close_connection = True  # The unread body would be taken for the next request
+        self._send(status, payload, retry_after)
+
+    def _route(self, method, path):
+        allowed = []
+        for route in _ROUTES:
+            match = route[1].fullmatch(path)
+            if match:
+                if route[0] == method:
+                    return route, tuple(unquote(group) for group in match.groups())
+                allowed.append(route[0])
+        if allowed:
+            raise APIError(405, "Method Not Allowed", f"{path} accepts {', '.join(allowed)}.")
+        raise APIError(404, "Not Found", f"There is no {path}.")
+
+    def _read_body(self):
+        length = _int(self.headers.get("Content-Length", 0), "Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise APIError(413, "Request Too Large", f"Request bodies are limited to {MAX_BODY_BYTES} bytes.")
+        data = self.rfile.read(length)
+        self.body_read = True
+        try:
+            return json.loads(data or b"null")
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise APIError(400, "Input Error", f"The request body is not valid JSON: {e}") from e
+
+    def _send(self, status, payload, retry_after=None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        if retry_after is not None:
+            self.send_header("Retry-After", str(retry_after))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.log_requests:
+            super().log_message(format, *args)
+
+
+class APIServer(HTTPServer):
+    """
+    HTTPServer that hands each connection to a fixed pool of worker threads.
+    ThreadingHTTPServer starts a thread per connection, and every new thread
+    would open (and leave behind) its own database connection.
+    """
+    def __init__(self, address, workers=API_WORKERS, handler=APIRequestHandler):
+        super().__init__(address, handler)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api")
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="api_server.py", description="FlightyReserveMate local HTTP/JSON API")
+    parser.add_argument("--db", default=repository.DATABASE_NAME, help="database file (default: %(default)s)")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address to listen on (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=API_WORKERS, help="requests handled at once (default: %(default)s)")
+    parser.add_argument("--log", action="store_true", help="print a line for every request")
+    args = parser.parse_args(argv)
+
+    repository.DATABASE_NAME = args.db
+    try:
+        repository.create_table()
+    except repository.DuplicateSeatsError as e:
+        print(f"warning: {e}", file=sys.stderr)
+    except RepositoryError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    APIRequestHandler.log_requests = args.log
+    server = APIServer((args.host, args.port), args.workers)
+    print(f"Serving {args.db} on http://{args.host}:{server.server_address[1]}/ with {args.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
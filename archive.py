@@ -0,0 +1,134 @@
+"""
+Moves the reservations of past flights out of the live database.
+
+The live tables only need upcoming flights, yet nothing ever removed old ones,
+so every scan and listing got slower as the years went by. archive_past()
+moves reservations (and deleted reservations) whose flight date is before a
+cutoff into a separate database file next to flights.db, ARCHIVE_CHUNK_SIZE
+rows per transaction with a short pause between chunks, so the app keeps
+working while a large backlog is archived. Flights left without reservations
+are then removed together with their booking counts.
+
+Listings, the dashboard and every query leave archived reservations out;
+search_reservations(include_archived=True) searches them too.
+
+In WAL mode a transaction spanning two database files is atomic in each file
+but not across both. A crash between the two can leave a reservation in both
+the archive and the live table, never in neither; the next run copies it again
+(replacing the earlier copy) and removes it from the live table.
+
+Run it from the command line, for example every night:
+    python cli.py archive [--before YYYY-MM-DD]
+"""
+import datetime
+import sqlite3
+import time
+from collections import namedtuple
+
+from repository import (ARCHIVE_SCHEMA, RepositoryError, attach_archive, get_connection, now_timestamp, parse_day,
+                        reservation_cache, transaction)
+
+# Reservations moved per transaction; each chunk holds the write lock for one or
+# two tenths of a second. 5000 archives twice as fast but makes bookings made
+# meanwhile wait up to a second.
+ARCHIVE_CHUNK_SIZE = 1000
+
+# After every chunk the job stays off the write lock for as long as it held it,
+# up to MAX_PAUSE seconds, so waiting writers get their turn (as in migrations.py)
+MAX_PAUSE = 0.1
+
+# reservations/deleted count the rows moved to the archive, flights the past
+# flights removed from the live database
+ArchiveReport = namedtuple("ArchiveReport", ["reservations", "deleted", "flights"])
+
+# Passed to the progress callback: rows moved so far out of total
+ArchiveProgress = namedtuple("ArchiveProgress", ["done", "total"])
+
+_ARCHIVE_COLUMNS = ('id, name, flight_number, departure, destination, day, seat_number, version, '
+                    'deleted_at, archived_at')
+
+
+def archive_past(before=None, chunk_size=ARCHIVE_CHUNK_SIZE, progress=None):
+    """
+    Archives every reservation whose flight date is before `before`.
+
+    Args:
+        before (str): Cutoff date (YYYY-MM-DD); defaults to today, so flights
+                      that have not flown yet stay live.
+        chunk_size (int): Reservations moved per transaction.
+        progress (callable): Called with an ArchiveProgress after every chunk.
+
+    Returns:
+        ArchiveReport: How much was moved and removed.
+
+    Raises:
+        InvalidReservationError: If `before` is not a valid YYYY-MM-DD date.
+        RepositoryError: If the archive could not be written; chunks already
+                         moved stay moved and the next run carries on.
+    """
+    cutoff = parse_day(before or datetime.date.today().isoformat())
+    try:
+        conn = get_connection()
+        attach_archive(conn, create=True)
+        live_total = conn.execute('SELECT COUNT(*) FROM flights f JOIN reservations r ON r.flight_id = f.id '
+                                  'WHERE f.day < ?', (cutoff,)).fetchone()[0]
+        deleted_total = conn.execute('SELECT COUNT(*) FROM deleted_reservations WHERE day < ?',
+                                     (cutoff,)).fetchone()[0]
+        total = live_total + deleted_total
+
+        live = _move_in_chunks(
+            'SELECT r.id FROM flights f JOIN reservations r ON r.flight_id = f.id WHERE f.day < ? LIMIT ?',
+            f'INSERT OR REPLACE INTO {ARCHIVE_SCHEMA}.reservations ({_ARCHIVE_COLUMNS}) '
+            f'SELECT r.id, r.name, f.flight_number, f.departure, f.destination, f.day, r.seat_number, r.version, '
+            f'NULL, ? FROM reservations r JOIN flights f ON f.id = r.flight_id WHERE r.id = ?',
+            'DELETE FROM reservations WHERE id = ?',
+            cutoff, chunk_size, lambda done: progress and progress(ArchiveProgress(done, total)))
+        deleted = _move_in_chunks(
+            'SELECT id FROM deleted_reservations WHERE day < ? LIMIT ?',
+            f'INSERT OR REPLACE INTO {ARCHIVE_SCHEMA}.reservations ({_ARCHIVE_COLUMNS}) '
+            f'SELECT id, name, flight_number, departure, destination, day, seat_number, version, deleted_at, ? '
+            f'FROM deleted_reservations WHERE id = ?',
+            'DELETE FROM deleted_reservations WHERE id = ?',
+            cutoff, chunk_size, lambda done: progress and progress(ArchiveProgress(live + done, total)))
+        flights = _remove_empty_flights(cutoff, chunk_size)
+    except sqlite3.Error as e:
+        raise RepositoryError(f"Failed to archive reservations: {e}") from e
+    return ArchiveReport(live, deleted, flights)
+
+
+def _move_in_chunks(select_ids, copy, delete, cutoff, chunk_size, report):
+    """Copies rows to the archive and deletes them, a chunk per transaction. Returns how many moved."""
+    moved = 0
+    while True:
+        started = time.perf_counter()
+        with transaction(immediate=True) as conn:
+            ids = [row[0] for row in conn.execute(select_ids, (cutoff, chunk_size))]
+            if not ids:
+                return moved
+            now = now_timestamp()
+            conn.executemany(copy, [(now, reservation_id) for reservation_id in ids])
+            conn.executemany(delete, [(reservation_id,) for reservation_id in ids])
+        reservation_cache.invalidate(ids)
+        moved += len(ids)
+        report(moved)
+        time.sleep(min(time.perf_counter() - started, MAX_PAUSE))
+
+
+def _remove_empty_flights(cutoff, chunk_size):
+    """Removes past flights that no reservation points at any more, with their booking counts."""
+    removed = 0
+    while True:
+        started = time.perf_counter()
+        with transaction(immediate=True) as conn:
+            ids = [row[0] for row in conn.execute(
+                'SELECT id FROM flights f WHERE day < ? '
+                'AND NOT EXISTS (SELECT 1 FROM reservations r WHERE r.flight_id = f.id) LIMIT ?',
+                (cutoff, chunk_size))]
+            if not ids:
+                # Past days are only ever counted down from here on
+                conn.execute('DELETE FROM day_bookings WHERE day < ? AND booked = 0', (cutoff,))
+                return removed
+            conn.executemany('DELETE FROM flight_bookings WHERE flight_id = ?', [(flight_id,) for flight_id in ids])
+            conn.executemany('DELETE FROM flights WHERE id = ?', [(flight_id,) for flight_id in ids])
+        removed += len(ids)
+        time.sleep(min(time.perf_counter() - started, MAX_PAUSE))
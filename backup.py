@@ -0,0 +1,267 @@
+"""
+Online backups of the reservations database.
+
+Copying flights.db with the file manager while the app runs can catch it
+half-written, and misses whatever is still in flights.db-wal. backup_database()
+uses SQLite's online backup API instead: it copies BACKUP_PAGES_PER_STEP pages
+at a time, pausing between steps so the disk stays free for the app, from a
+read transaction held open for the whole copy. In WAL mode that transaction
+pins one snapshot of the database: writers keep committing while the copy runs,
+and the copy is the database exactly as it was when it started.
+
+Snapshots are backups kept in a folder next to the database (flights.backups),
+the newest SNAPSHOT_RETENTION of them. While it is open, the GUI takes one
+whenever the newest is SNAPSHOT_INTERVAL old; `python cli.py backup --if-due`
+does the same from cron or Task Scheduler. restore_database() brings a backup back, keeping a copy of
+the database it replaces.
+
+The archive (flights.archive.db) and the write queue (flights.outbox.db) are
+separate files and are not part of a backup.
+
+Does not import Tkinter, so it works from cli.py.
+"""
+import datetime
+import os
+import sqlite3
+import time
+from collections import namedtuple
+
+import repository
+from repository import BackupError, RepositoryError
+
+# Database pages copied per backup step (256 KiB with 4 KiB pages). Bigger steps
+# finish sooner but make bookings made meanwhile wait longer: at 1M rows a
+# backup took 4 s at 64 pages and 2 s at 256, with the slowest booking waiting
+# 8 ms and 164 ms respectively.
+BACKUP_PAGES_PER_STEP = 64
+
+# Seconds to wait after every step
+BACKUP_STEP_PAUSE = 0.005
+
+# Seconds between scheduled snapshots, and how many snapshots are kept
+SNAPSHOT_INTERVAL = 24 * 60 * 60
+SNAPSHOT_RETENTION = 7
+
+# Snapshot file names sort by the time they were taken
+SNAPSHOT_TIME_FORMAT = "%Y%m%d-%H%M%S"
+
+# A backup file; taken_at is a datetime, size in bytes, rows the reservations
+# in it (None for snapshots found by list_snapshots(), which are not opened)
+Snapshot = namedtuple("Snapshot", ["path", "taken_at", "size", "rows"], defaults=(None,))
+
+# Passed to the progress callback: database pages copied so far out of total
+BackupProgress = namedtuple("BackupProgress", ["done", "total"])
+
+
+def snapshot_dir():
+    """The folder holding the snapshots of repository.DATABASE_NAME, e.g. flights.backups."""
+    return os.path.splitext(repository.DATABASE_NAME)[0] + ".backups"
+
+
+def backup_database(path, pages_per_step=BACKUP_PAGES_PER_STEP, pause=BACKUP_STEP_PAUSE, progress=None):
+    """
+    Copies the database to `path` while it stays in use.
+
+    The copy is written to `path`.partial and renamed when complete, so `path`
+    is never a half-written backup.
+
+    Args:
+        path (str): File to write; it is overwritten.
+        pages_per_step (int): Database pages copied per step.
+        pause (float): Seconds to wait between steps.
+        progress (callable): Called with a BackupProgress after every step.
+
+    Returns:
+        Snapshot: The backup written.
+
+    Raises:
+        BackupError: If the database could not be read or the backup written.
+    """
+    partial = path + ".partial"
+
+    def step_done(status, remaining, total):
+        if progress:
+            progress(BackupProgress(total - remaining, total))
+        if remaining:
+            time.sleep(pause)
+
+    try:
+        if os.path.exists(partial):
+            os.remove(partial)
+        source = sqlite3.connect(repository.DATABASE_NAME, timeout=repository.BUSY_TIMEOUT, isolation_level=None)
+        try:
+            # Without an open read transaction every step starts a new one, and a
+            # commit by another connection in between starts the backup over
+            source.execute("BEGIN")
+            # The first read takes the snapshot the backup copies, so this count
+            # is exactly the reservations in the copy
+            rows = source.execute("SELECT COUNT(*) FROM reservations").fetchone()[0]
+            target = sqlite3.connect(partial, isolation_level=None)
+            try:
+                source.backup(target, pages=pages_per_step, progress=step_done)
+                # A single self-contained file, with no -wal file next to it once opened
+                target.execute("PRAGMA journal_mode = DELETE")
+            finally:
+                target.close()
+        finally:
+            source.close()
+        os.replace(partial, path)
+        taken_at = datetime.datetime.now()
+    except (sqlite3.Error, OSError) as e:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise BackupError(f"Failed to back up the database: {e}") from e
+    return Snapshot(path, taken_at, os.path.getsize(path), rows)
+
+
+def take_snapshot(retention=SNAPSHOT_RETENTION, progress=None):
+    """
+    Backs the database up into snapshot_dir() and deletes all but the newest
+    `retention` snapshots.
+
+    Returns:
+        Snapshot: The snapshot taken.
+
+    Raises:
+        BackupError: If the snapshot could not be written.
+    """
+    snapshot = _backup_to_folder("", progress)
+    prune_snapshots(retention)
+    return snapshot
+
+
+def _backup_to_folder(suffix, progress=None):
+    folder = snapshot_dir()
+    try:
+        os.makedirs(folder, exist_ok=True)
+    except OSError as e:
+        raise BackupError(f"Failed to create the backup folder {folder}: {e}") from e
+    stem = os.path.splitext(os.path.basename(repository.DATABASE_NAME))[0]
+    name = f"{stem}-{datetime.datetime.now().strftime(SNAPSHOT_TIME_FORMAT)}{suffix}.db"
+    return backup_database(os.path.join(folder, name), progress=progress)
+
+
+def list_snapshots():
+    """Returns the snapshots in snapshot_dir(), newest first."""
+    folder = snapshot_dir()
+    if not os.path.isdir(folder):
+        return []
+    snapshots = []
+    for name in os.listdir(folder):
+        if not name.endswith(".db"):
+            continue
+        path = os.path.join(folder, name)
+        stat = os.stat(path)
+        snapshots.append(Snapshot(path, datetime.datetime.fromtimestamp(stat.st_mtime), stat.st_size))
+    snapshots.sort(key=lambda snapshot: snapshot.taken_at, reverse=True)
+    return snapshots
+
+
+def prune_snapshots(retention=SNAPSHOT_RETENTION):
+    """
+    Deletes all but the newest `retention` snapshots.
+
+    Returns:
+        list: The Snapshots deleted.
+    """
+    removed = list_snapshots()[retention:]
+    for snapshot in removed:
+        try:
+            os.remove(snapshot.path)
+        except OSError as e:
+            raise BackupError(f"Failed to delete the old backup {snapshot.path}: {e}") from e
+    return removed
+
+
+def snapshot_due(interval=SNAPSHOT_INTERVAL):
+    """True if the newest snapshot is older than `interval` seconds, or there is none."""
+    snapshots = list_snapshots()
+    return not snapshots or (datetime.datetime.now() - snapshots[0].taken_at).total_seconds() >= interval
+
+
+def take_snapshot_if_due(interval=SNAPSHOT_INTERVAL, retention=SNAPSHOT_RETENTION):
+    """Takes a snapshot if snapshot_due(); returns it, or None if none was due."""
+    if not snapshot_due(interval):
+        return None
+    return take_snapshot(retention)
+
+
+def restore_database(path, progress=None):
+    """
+    Replaces the contents of the database with a backup.
+
+    The current database is first saved as a snapshot ending in
+    -before-restore, so a restore can itself be undone. The backup is then
+    copied in a single step under the write lock: other connections see either
+    the old database or the restored one, never a mix. Reservation caches here
+    and in other copies of the app reload, and an older backup is upgraded to
+    the current schema.
+
+    Args:
+        path (str): Backup file to restore.
+        progress (callable): Called with a BackupProgress while the current
+                             database is saved.
+
+    Returns:
+        Snapshot: The copy of the database as it was before the restore.
+
+    Raises:
+        BackupError: If `path` is not an intact backup of this app's database,
+                     or it could not be restored.
+    """
+    _check_backup(path)
+    before = _backup_to_folder("-before-restore", progress)
+    try:
+        target = sqlite3.connect(repository.DATABASE_NAME, timeout=repository.BUSY_TIMEOUT, isolation_level=None)
+        try:
+            watermark = _change_watermark(target)
+            source = sqlite3.connect(path)
+            try:
+                source.backup(target)
+            finally:
+                source.close()
+            target.execute("PRAGMA journal_mode = WAL")
+        finally:
+            target.close()
+    except sqlite3.Error as e:
+        raise BackupError(f"Failed to restore {path}: {e}. The database as it was is saved in {before.path}.") from e
+    repository.reservation_cache.clear()
+    try:
+        repository.create_table()
+        # Caches that remember a position in the change log, here and in other
+        # copies of the app, must not take the restored log for changes they
+        # have already seen, so it carries on past both
+        with repository.transaction(immediate=True) as conn:
+            watermark = max(watermark, _change_watermark(conn)) + 1
+            conn.execute("DELETE FROM reservation_changes")
+            conn.execute("DELETE FROM sqlite_sequence WHERE name = 'reservation_changes'")
+            conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('reservation_changes', ?)", (watermark,))
+    except (RepositoryError, sqlite3.Error) as e:
+        raise BackupError(f"{path} was restored but could not be upgraded: {e}") from e
+    return before
+
+
+def _check_backup(path):
+    """Raises BackupError unless `path` is an intact SQLite database with reservations in it."""
+    if not os.path.isfile(path):
+        raise BackupError(f"{path} does not exist.")
+    try:
+        conn = sqlite3.connect(path)
+        try:
+            result = conn.execute("PRAGMA quick_check").fetchone()[0]
+            has_reservations = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reservations'").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        raise BackupError(f"{path} is not a readable database: {e}") from e
+    if result != "ok":
+        raise BackupError(f"{path} is damaged: {result}")
+    if has_reservations is None:
+        raise BackupError(f"{path} is not a reservations database.")
+
+
+def _change_watermark(conn):
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'reservation_changes'").fetchone()
+    return row[0] if row else 0
+
@@ -0,0 +1,108 @@
+import os
+from tkinter import ttk, filedialog
+import dialogs
+import backup
+from seats import inventory
+
+class BackupsPage(ttk.Frame):
+    """
+    Snapshots of the database, taken every day while the app runs and on
+    request, and restoring one of them (or any backup file). Backing up never
+    stops anyone from booking; restoring replaces every reservation, so it
+    asks first and keeps a copy of the database it replaces.
+    """
+    def __init__(self, parent, controller):
+        ttk.Frame.__init__(self, parent)
+        self.controller = controller
+
+        ttk.Label(self, text="Backups", font=("Helvetica", 20, "bold"), foreground="#00567a").pack(pady=20)
+
+        ttk.Label(self, text=f"A snapshot is taken every {backup.SNAPSHOT_INTERVAL // 3600} hours while the app is "
+                             f"open; the newest {backup.SNAPSHOT_RETENTION} are kept in {backup.snapshot_dir()}.",
+                  font=("Helvetica", 11), wraplength=760).pack(padx=25, pady=(0, 10))
+
+        frame = ttk.Frame(self)
+        frame.pack(fill="both", expand=True, padx=25, pady=5)
+        scroll = ttk.Scrollbar(frame)
+        scroll.pack(side="right", fill="y")
+        self.tree = ttk.Treeview(frame, columns=("Taken", "Size", "File"), show="headings", height=10,
+                                 yscrollcommand=scroll.set, selectmode="browse")
+        scroll.config(command=self.tree.yview)
+        for name, width, anchor in (("Taken", 170, "center"), ("Size", 100, "center"), ("File", 420, "w")):
+            self.tree.heading(name, text=name, anchor=anchor)
+            self.tree.column(name, width=width, anchor=anchor)
+        self.tree.pack(fill="both", expand=True)
+
+        # Busy/status line shown while a backup or restore runs
+        self.status_label = ttk.Label(self, text="", font=("Helvetica", 10, "italic"), foreground="#555")
+        self.status_label.pack(anchor="w", padx=20)
+
+        button_frame = ttk.Frame(self)
+        button_frame.pack(pady=15)
+        ttk.Button(button_frame, text="💾 Back Up Now", command=self.back_up).pack(side="left", padx=10, ipadx=10, ipady=5)
+        ttk.Button(button_frame, text="♻️ Restore Selected…", command=self.restore_selected).pack(side="left", padx=10, ipadx=10, ipady=5)
+        ttk.Button(button_frame, text="📂 Restore From File…", command=self.restore_file).pack(side="left", padx=10, ipadx=10, ipady=5)
+        ttk.Button(button_frame, text="🏠 Go Home", command=lambda: controller.show_frame("HomePage")).pack(side="left", padx=10, ipadx=10, ipady=5)
+
+    def on_show_page(self):
+        self.refresh()
+
+    def refresh(self):
+        """Lists the snapshots, newest first."""
+        self.controller.db_worker.submit(backup.list_snapshots, key=("backups", "list"),
+                                         on_done=self._show, on_error=self._on_error)
+
+    def _show(self, snapshots):
+        self.tree.delete(*self.tree.get_children())
+        for snapshot in snapshots:
+            self.tree.insert('', 'end', iid=snapshot.path, values=(
+                snapshot.taken_at.strftime("%Y-%m-%d %H:%M:%S"), f"{snapshot.size / 1e6:.1f} MB",
+                os.path.basename(snapshot.path)))
+
+    def back_up(self):
+        self.status_label.config(text="Backing up…")
+        self.controller.db_worker.submit(backup.take_snapshot, key=("backups", "take"),
+                                         on_done=self._on_backed_up, on_error=self._on_error)
+
+    def _on_backed_up(self, snapshot):
+        self.status_label.config(text=f"Backed up to {os.path.basename(snapshot.path)}.")
+        self.refresh()
+
+    def restore_selected(self):
+        selected = self.tree.selection()
+        if not selected:
+            dialogs.showwarning("No Backup Selected", "Please select the snapshot to restore.")
+            return
+        self._restore(selected[0])
+
+    def restore_file(self):
+        path = filedialog.askopenfilename(
+            title="Restore Backup", initialdir=backup.snapshot_dir() if os.path.isdir(backup.snapshot_dir()) else None,
+            filetypes=[("Database files", "*.db"), ("All files", "*.*")])
+        if path:
+            self._restore(path)
+
+    def _restore(self, path):
+        if not dialogs.askyesno(
+                "Restore Backup",
+                f"Replace every reservation with the ones in {os.path.basename(path)}?\n\n"
+                "Bookings made since that backup will no longer be listed. The database as it is now "
+                "is saved as a snapshot first, so this can be undone."):
+            return
+        self.status_label.config(text="Restoring…")
+        self.controller.db_worker.submit(backup.restore_database, path, key=("backups", "restore"),
+                                         on_done=self._on_restored, on_error=self._on_error)
+
+    def _on_restored(self, before):
+        inventory.clear()
+        if "ReservationsPage" in self.controller.frames:
+            self.controller.frames["ReservationsPage"].refresh_table()
+        self.status_label.config(text="")
+        dialogs.showinfo("Backup Restored",
+                         f"The backup was restored. The database as it was before is saved as "
+                         f"{os.path.basename(before.path)}.")
+        self.refresh()
+
+    def _on_error(self, error):
+        self.status_label.config(text="")
+        dialogs.showerror(getattr(error, "title", "Backup Failed"), str(error))
@@ -0,0 +1,1020 @@
+"""
+Micro-benchmarks for the database layer.
+
+Run with:
+    python benchmark.py pool [--ops N]
+    python benchmark.py batch [--rows N]
+    python benchmark.py search [--rows N] [--queries N]
+    python benchmark.py cache [--rows N] [--queries N]
+    python benchmark.py transfer [--rows N]
+    python benchmark.py schema [--rows N]
+    python benchmark.py migrate [--rows N] [--chunk-size N]
+    python benchmark.py dashboard [--rows N] [--queries N]
+    python benchmark.py suite [--sizes N,N,...] [--ops N] [--writers N] [--json FILE] [--baseline FILE]
+    python benchmark.py archive [--rows N] [--fraction F]
+    python benchmark.py backup [--rows N] [--pages N,N,...]
+    python benchmark.py validate [--rows N]
+
+Every benchmark works on throwaway databases in a temporary directory, so it
+never touches the real flights.db. The HTTP API load test is in api_load.py and
+the concurrent writer stress test in write_stress.py.
+"""
+import argparse
+import atexit
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+import repository
+
+# Every benchmark database lives here, away from the real flights.db
+_SCRATCH_DIR = tempfile.mkdtemp(prefix="flighty-bench-")
+atexit.register(shutil.rmtree, _SCRATCH_DIR, ignore_errors=True)
+
+
+FIRST_NAMES = ["Ahmed", "Sara", "John", "Mona", "Omar", "Laila", "Peter", "Nadia", "Karim", "Emma",
+               "Youssef", "Hana", "David", "Salma", "Ali", "Maria", "Tarek", "Nour", "James", "Yasmin"]
+LAST_NAMES = ["Hassan", "Smith", "Abdelaziz", "Garcia", "Mahmoud", "Brown", "Saleh", "Miller", "Fathy", "Wilson",
+              "Ibrahim", "Taylor", "Mostafa", "Anderson", "Kamal", "Thomas", "Nasser", "Moore", "Farouk", "Clark"]
+CITIES = ["Cairo", "London", "Paris", "Dubai", "Rome", "Berlin", "Madrid", "Istanbul", "Athens", "Vienna",
+          "Riyadh", "Doha", "Amman", "Tunis", "Casablanca", "Lisbon", "Oslo", "Zurich", "Prague", "Warsaw"]
+SEAT_LETTERS = "ABCDEF"
+FLIGHT_NUMBERS = [f"FR{number}" for number in range(100, 1000)]
+
+
+def generate_rows(count, seed=42, days=365, first=0):
+    """
+    Yields `count` synthetic reservations spread over `days` days, with a
+    reproducible mix of names. Flights FR100-FR999 each fly a fixed route, and
+    seats are handed out in order so no seat is ever booked twice. Passing
+    `first` continues the sequence after that many rows, so the new rows do
+    not clash with those already loaded.
+    """
+    rng = random.Random(seed + first)
+    start = date(2025, 1, 1)
+    flights = len(FLIGHT_NUMBERS)
+    for i in range(first, first + count):
+        flight = i % flights
+        day = i // flights % days
+        seat = i // (flights * days)
+        yield (
+            f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            FLIGHT_NUMBERS[flight],
+            CITIES[flight % len(CITIES)],
+            # Offset by 1..len(CITIES)-1 so the destination never equals the departure
+            CITIES[(flight + 1 + flight // len(CITIES) % (len(CITIES) - 1)) % len(CITIES)],
+            (start + timedelta(days=day)).isoformat(),
+            f"{seat // len(SEAT_LETTERS) + 1}{SEAT_LETTERS[seat % len(SEAT_LETTERS)]}",
+        )
+
+
+def fill_database(count, chunk=50000):
+    """Bulk loads `count` synthetic reservations through the batch API."""
+    rows = generate_rows(count)
+    while count > 0:
+        size = min(chunk, count)
+        repository.add_reservations(next(rows) for _ in range(size))
+        count -= size
+
+
+def latency_summary(samples):
+    """Returns mean/p50/p99/max of a list of latencies in seconds, as milliseconds."""
+    samples = sorted(samples)
+    def pick(q):
+        return samples[min(len(samples) - 1, int(q * len(samples)))] * 1e3
+    return {
+        "mean_ms": statistics.fmean(samples) * 1e3,
+        "p50_ms": pick(0.50),
+        "p99_ms": pick(0.99),
+        "max_ms": samples[-1] * 1e3,
+    }
+
+
+def use_database(filename):
+    """Points the repository at a fresh file in the scratch directory."""
+    path = os.path.join(_SCRATCH_DIR, filename)
+    if os.path.exists(path):
+        os.remove(path)
+    repository.DATABASE_NAME = path
+    repository.create_table()
+    return path
+
+
+def time_per_op(func, args_list):
+    """Calls func once per argument tuple and returns the mean latency in microseconds."""
+    start = time.perf_counter()
+    for args in args_list:
+        func(*args)
+    elapsed = time.perf_counter() - start
+    return elapsed / max(len(args_list), 1) * 1e6
+
+
+# --- The single-table layout create_table() used before the flights table ---
+
+LEGACY_SCHEMA = '''
+    CREATE TABLE reservations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        flight_number TEXT NOT NULL,
+        departure TEXT NOT NULL,
+        destination TEXT NOT NULL,
+        date TEXT NOT NULL,
+        seat_number TEXT NOT NULL
+    );
+    CREATE TABLE reservation_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        reservation_id INTEGER NOT NULL,
+        op TEXT NOT NULL
+    );
+    CREATE TRIGGER reservations_log_insert AFTER INSERT ON reservations BEGIN
+        INSERT INTO reservation_changes (reservation_id, op) VALUES (NEW.id, 'I');
+    END;
+    CREATE TRIGGER reservations_log_update AFTER UPDATE ON reservations BEGIN
+        INSERT INTO reservation_changes (reservation_id, op) VALUES (NEW.id, 'U');
+    END;
+    CREATE TRIGGER reservations_log_delete AFTER DELETE ON reservations BEGIN
+        INSERT INTO reservation_changes (reservation_id, op) VALUES (OLD.id, 'D');
+    END;
+    CREATE INDEX idx_reservations_name ON reservations (name COLLATE NOCASE);
+    CREATE INDEX idx_reservations_flight ON reservations (flight_number COLLATE NOCASE, date);
+    CREATE INDEX idx_reservations_route
+        ON reservations (departure COLLATE NOCASE, destination COLLATE NOCASE, date);
+    CREATE INDEX idx_reservations_destination ON reservations (destination COLLATE NOCASE, date);
+    CREATE INDEX idx_reservations_date ON reservations (date);
+    CREATE UNIQUE INDEX idx_reservations_seat
+        ON reservations (flight_number COLLATE NOCASE, date, seat_number COLLATE NOCASE);
+    CREATE VIRTUAL TABLE reservations_fts
+        USING fts5(name, content='reservations', content_rowid='id', tokenize='trigram');
+    CREATE TRIGGER reservations_fts_insert AFTER INSERT ON reservations BEGIN
+        INSERT INTO reservations_fts (rowid, name) VALUES (NEW.id, NEW.name);
+    END;
+    CREATE TRIGGER reservations_fts_delete AFTER DELETE ON reservations BEGIN
+        INSERT INTO reservations_fts (reservations_fts, rowid, name) VALUES ('delete', OLD.id, OLD.name);
+    END;
+    CREATE TRIGGER reservations_fts_update AFTER UPDATE OF name ON reservations BEGIN
+        INSERT INTO reservations_fts (reservations_fts, rowid, name) VALUES ('delete', OLD.id, OLD.name);
+        INSERT INTO reservations_fts (rowid, name) VALUES (NEW.id, NEW.name);
+    END;
+    PRAGMA user_version = 1;
+'''
+
+
+def use_legacy_database(filename, rows=()):
+    """
+    Creates a database in the old single-table layout, loaded with `rows`,
+    without going through repository.create_table() (which would migrate it).
+    """
+    path = os.path.join(_SCRATCH_DIR, filename)
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(LEGACY_SCHEMA)
+        with conn:
+            conn.executemany('''
+                INSERT INTO reservations (name, flight_number, departure, destination, date, seat_number)
+                VALUES (?, ?, ?, ?, ?, ?)''', rows)
+            # As create_table() would on the next start
+            repository._prune_change_log(conn)
+    finally:
+        conn.close()
+    repository.DATABASE_NAME = path
+    return path
+
+
+def storage_report(path):
+    """VACUUMs the file and returns its size and the bytes used per table, indexes included."""
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("VACUUM")
+        # Indexes and FTS shadow tables are counted towards the table they belong to
+        tables = dict(conn.execute("SELECT name, tbl_name FROM sqlite_schema WHERE type IN ('table', 'index')"))
+        usage = {}
+        for name, size in conn.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name"):
+            table = tables.get(name, name)
+            if table.startswith("reservations_fts"):
+                table = "reservations_fts"
+            usage[table] = usage.get(table, 0) + size
+    finally:
+        conn.close()
+    return os.path.getsize(path), usage
+
+
+def time_scan(scan, runs=3):
+    """Returns the best of `runs` full scans in seconds, and the number of rows returned."""
+    best, count = float("inf"), 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        count = len(scan())
+        best = min(best, time.perf_counter() - start)
+    return best, count
+
+
+def rows_memory(scan):
+    """Returns the bytes of Python memory held by the list a full scan returns."""
+    import gc
+    import tracemalloc
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        rows = scan()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del rows
+    return size
+
+
+# --- Connection-per-call implementation, as database.py worked before pooling ---
+
+def _legacy_call(path, sql, params=(), fetch=None):
+    conn = sqlite3.connect(path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        result = getattr(cursor, fetch)() if fetch else None
+        conn.commit()
+        return result
+    finally:
+        conn.close()
+
+
+def legacy_operations(path):
+    """Returns the CRUD operations implemented with a fresh connection per call."""
+    return {
+        "add": lambda *row: _legacy_call(path, '''
+            INSERT INTO reservations (name, flight_number, departure, destination, date, seat_number)
+            VALUES (?, ?, ?, ?, ?, ?)''', row),
+        "get": lambda rid: _legacy_call(path, 'SELECT * FROM reservations WHERE id = ?', (rid,), "fetchone"),
+        "update": lambda rid, *row: _legacy_call(path, '''
+            UPDATE reservations
+            SET name = ?, flight_number = ?, departure = ?, destination = ?, date = ?, seat_number = ?
+            WHERE id = ?''', row + (rid,)),
+        "delete": lambda rid: _legacy_call(path, 'DELETE FROM reservations WHERE id = ?', (rid,)),
+    }
+
+
+def pooled_operations():
+    """Returns the same operations routed through the pooled repository module."""
+    return {
+        "add": repository.add_reservation,
+        "get": repository.get_reservation_by_id,
+        "update": repository.update_reservation,
+        "delete": repository.delete_reservation,
+    }
+
+
+def run_crud(operations, ops):
+    """Times add/get/update/delete over `ops` rows and returns {operation: microseconds}."""
+    ids = range(1, ops + 1)
+    rows = list(generate_rows(ops))
+    # Updates rename the passenger, keeping each row on its own seat
+    renamed = [(rid, "Jane Doe") + row[1:] for rid, row in zip(ids, rows)]
+    return {
+        "add": time_per_op(operations["add"], rows),
+        "get": time_per_op(operations["get"], [(rid,) for rid in ids]),
+        "update": time_per_op(operations["update"], renamed),
+        "delete": time_per_op(operations["delete"], [(rid,) for rid in ids]),
+    }
+
+
+def bench_pool(args):
+    """Compares per-operation latency of connection-per-call against the pooled layer."""
+    # The old layer never enabled WAL, so run it against a rollback-journal file
+    path = use_legacy_database("legacy.db")
+    before = run_crud(legacy_operations(path), args.ops)
+
+    use_database("pooled.db")
+    after = run_crud(pooled_operations(), args.ops)
+    repository.close_connections()
+
+    print(f"Per-operation latency over {args.ops} ops (microseconds)")
+    print(f"{'operation':<10}{'before':>12}{'after':>12}{'speedup':>10}")
+    for name in before:
+        print(f"{name:<10}{before[name]:>12.1f}{after[name]:>12.1f}{before[name] / after[name]:>9.1f}x")
+
+
+def bench_batch(args):
+    """Compares one-call-per-row writes against the batched single-transaction API."""
+    rows = list(generate_rows(args.rows))
+    ids = list(range(1, args.rows + 1))
+    timings = {}
+
+    use_database("per_row.db")
+    start = time.perf_counter()
+    for row in rows:
+        repository.add_reservation(*row)
+    timings["add"] = [time.perf_counter() - start]
+    start = time.perf_counter()
+    for rid in ids:
+        repository.delete_reservation(rid)
+    timings["delete"] = [time.perf_counter() - start]
+
+    use_database("batched.db")
+    start = time.perf_counter()
+    repository.add_reservations(rows)
+    timings["add"].append(time.perf_counter() - start)
+    start = time.perf_counter()
+    repository.delete_reservations(ids)
+    timings["delete"].append(time.perf_counter() - start)
+    repository.close_connections()
+
+    print(f"Total time for {args.rows} rows (milliseconds)")
+    print(f"{'operation':<10}{'per-row':>12}{'batched':>12}{'speedup':>10}")
+    for name, (per_row, batched) in timings.items():
+        print(f"{name:<10}{per_row * 1e3:>12.1f}{batched * 1e3:>12.1f}{per_row / batched:>9.1f}x")
+
+
+def search_queries(rng):
+    """Returns {label: function returning random search_reservations() filters} for typical searches."""
+    return {
+        "name prefix": lambda: {"name": rng.choice(FIRST_NAMES) + " " + rng.choice(LAST_NAMES)[:3]},
+        "fuzzy name": lambda: {"fuzzy_name": rng.choice(LAST_NAMES)[1:6]},
+        "flight + day": lambda: {"flight_number": f"FR{rng.randint(100, 999)}",
+                                 "date_from": "2025-03-01", "date_to": "2025-03-01"},
+        "route + range": lambda: {"departure": rng.choice(CITIES), "destination": rng.choice(CITIES),
+                                  "date_from": "2025-05-01", "date_to": "2025-05-31"},
+        "date range": lambda: {"date_from": "2025-07-01", "date_to": "2025-07-07"},
+    }
+
+
+def bench_search(args):
+    """Measures indexed search latency on a large synthetic table."""
+    use_database("search.db")
+    start = time.perf_counter()
+    fill_database(args.rows)
+    print(f"Loaded {args.rows} rows in {time.perf_counter() - start:.1f}s")
+    repository.close_connections()  # Runs PRAGMA optimize so the planner has index statistics
+
+    queries = search_queries(random.Random(7))
+
+    print(f"Search latency over {args.queries} queries each, first page of 200 rows (milliseconds)")
+    print(f"{'query':<16}{'mean':>9}{'p50':>9}{'p99':>9}{'max':>9}")
+    for label, make_filters in queries.items():
+        samples = []
+        for _ in range(args.queries):
+            filters = make_filters()
+            repository.reservation_cache.clear()  # Measure the indexes, not the result cache
+            start = time.perf_counter()
+            repository.search_reservations(limit=200, **filters)
+            samples.append(time.perf_counter() - start)
+        summary = latency_summary(samples)
+        print(f"{label:<16}{summary['mean_ms']:>9.2f}{summary['p50_ms']:>9.2f}"
+              f"{summary['p99_ms']:>9.2f}{summary['max_ms']:>9.2f}")
+    repository.close_connections()
+
+
+def bench_cache(args):
+    """Measures repeated lookups served by the reservation cache against going to SQLite."""
+    use_database("cache.db")
+    fill_database(args.rows)
+    repository.close_connections()
+
+    rng = random.Random(11)
+    ids = [rng.randint(1, args.rows) for _ in range(args.queries)]
+    cursors = [rng.randint(0, args.rows - 200) for _ in range(args.queries)]
+    flights = [rng.choice(FLIGHT_NUMBERS) for _ in range(args.queries)]
+    lookups = {
+        "row by id": lambda i: repository.get_reservation_by_id(ids[i]),
+        "page": lambda i: repository.get_reservations_page(after_id=cursors[i], limit=200),
+        "search": lambda i: repository.search_reservations(flight_number=flights[i], limit=200),
+    }
+
+    print(f"Lookup latency over {args.queries} lookups each (microseconds)")
+    print(f"{'lookup':<12}{'uncached':>10}{'cached':>10}{'speedup':>10}")
+    for label, lookup in lookups.items():
+        uncached = []
+        cached = []
+        for i in range(args.queries):
+            repository.reservation_cache.clear()
+            start = time.perf_counter()
+            lookup(i)
+            uncached.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            lookup(i)
+            cached.append(time.perf_counter() - start)
+        miss, hit = statistics.fmean(uncached) * 1e6, statistics.fmean(cached) * 1e6
+        print(f"{label:<12}{miss:>10.1f}{hit:>10.1f}{miss / hit:>9.1f}x")
+    print(repository.reservation_cache.stats())
+    repository.close_connections()
+
+
+def bench_transfer(args):
+    """Measures streaming import and export throughput for CSV and JSON Lines."""
+    import csv
+    import json
+    import transfer
+
+    print(f"Import/export throughput for {args.rows} rows (rows/sec)")
+    print(f"{'format':<8}{'import':>12}{'export':>12}")
+    for fmt in transfer.FORMATS:
+        source = os.path.join(_SCRATCH_DIR, f"source.{fmt}")
+        with open(source, "w", newline="", encoding="utf-8") as handle:
+            if fmt == "csv":
+                writer = csv.writer(handle)
+                writer.writerow(transfer.FIELDS)
+                writer.writerows(generate_rows(args.rows))
+            else:
+                handle.writelines(json.dumps(dict(zip(transfer.FIELDS, row))) + "\n"
+                                  for row in generate_rows(args.rows))
+
+        use_database(f"transfer_{fmt}.db")
+        start = time.perf_counter()
+        report = transfer.import_reservations(source, fmt)
+        import_rate = report.imported / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        exported = transfer.export_reservations(os.path.join(_SCRATCH_DIR, f"export.{fmt}"), fmt)
+        export_rate = exported / (time.perf_counter() - start)
+        print(f"{fmt:<8}{import_rate:>12,.0f}{export_rate:>12,.0f}")
+        if report.rejected:
+            print(f"  ({report.rejected} generated rows rejected, e.g. duplicate seats)")
+    repository.close_connections()
+
+
+def bench_schema(args):
+    """Compares file size and full-scan time of the single-table layout against flights + reservations."""
+    path = use_legacy_database("schema.db", generate_rows(args.rows))
+    size_before, usage_before = storage_report(path)
+
+    def legacy_scan():
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute("SELECT * FROM reservations").fetchall()
+        finally:
+            conn.close()
+
+    scan_before = time_scan(legacy_scan)
+    memory_before = rows_memory(legacy_scan)
+
+    start = time.perf_counter()
+    repository.create_table()
+    migration = time.perf_counter() - start
+    repository.close_connections()
+    size_after, usage_after = storage_report(path)
+
+    def table_scan():
+        return repository.get_connection().execute("SELECT * FROM reservations").fetchall()
+
+    def joined_scan():
+        conn = repository.get_connection()
+        return conn.execute(f"SELECT {repository._RESERVATION_COLUMNS} FROM {repository._RESERVATION_SOURCE}").fetchall()
+
+    table_after = time_scan(table_scan)
+    joined_after = time_scan(joined_scan)
+    scan_after = time_scan(repository.get_all_reservations)
+    memory_after = rows_memory(repository.get_all_reservations)
+    repository.close_connections()
+
+    print(f"Schema comparison for {args.rows} reservations (migration took {migration:.1f}s)")
+    print(f"{'':<30}{'before':>12}{'after':>12}")
+    print(f"{'file size (MB)':<30}{size_before / 1e6:>12.1f}{size_after / 1e6:>12.1f}")
+    for table in sorted(name for name in set(usage_before) | set(usage_after) if not name.startswith("sqlite_")):
+        label = f"  {table} (MB)"
+        print(f"{label:<30}{usage_before.get(table, 0) / 1e6:>12.1f}{usage_after.get(table, 0) / 1e6:>12.1f}")
+    # Before the migration get_all_reservations() was exactly the plain table scan
+    print(f"{'scan reservations table (s)':<30}{scan_before[0]:>12.2f}{table_after[0]:>12.2f}")
+    print(f"{'scan joined to flights (s)':<30}{'':>12}{joined_after[0]:>12.2f}")
+    print(f"{'get_all_reservations (s)':<30}{scan_before[0]:>12.2f}{scan_after[0]:>12.2f}")
+    print(f"{'rows held in memory (MB)':<30}{memory_before / 1e6:>12.1f}{memory_after / 1e6:>12.1f}")
+    if scan_before[1] != scan_after[1]:
+        print(f"warning: {scan_before[1]} rows before the migration, {scan_after[1]} after")
+
+
+def bench_migrate(args):
+    """
+    Upgrades a single-table database through migrations.py while another
+    connection keeps reading and renaming passengers, and reports how long each
+    step took and how long that connection had to wait.
+    """
+    import threading
+    import migrations
+
+    path = use_legacy_database("migrate.db", generate_rows(args.rows))
+    # As the app has left every database since connection pooling came in
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.close()
+    migrations.CHUNK_SIZE = args.chunk_size
+    stop = threading.Event()
+    latencies = {"write": [], "read": []}
+
+    def client():
+        # SQL that works on both layouts, so the client keeps going across the swap
+        conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        rng = random.Random(5)
+        while not stop.is_set():
+            reservation_id = rng.randint(1, args.rows)
+            start = time.perf_counter()
+            conn.execute("UPDATE reservations SET name = ? WHERE id = ?", (rng.choice(FIRST_NAMES), reservation_id))
+            latencies["write"].append(time.perf_counter() - start)
+            start = time.perf_counter()
+            conn.execute("SELECT name FROM reservations WHERE id = ?", (reservation_id,)).fetchone()
+            latencies["read"].append(time.perf_counter() - start)
+            time.sleep(0.01)
+        conn.close()
+
+    steps = {}
+
+    def progress(report):
+        name = f"{report.version}: {report.step}"
+        steps.setdefault(name, [time.perf_counter(), None])[1] = time.perf_counter()
+
+    thread = threading.Thread(target=client)
+    thread.start()
+    start = time.perf_counter()
+    try:
+        repository.create_table(progress)
+    finally:
+        stop.set()
+        thread.join()
+    total = time.perf_counter() - start
+    repository.close_connections()
+
+    print(f"Migration of {args.rows} reservations in chunks of {args.chunk_size} rows: {total:.1f}s")
+    for name, (first, last) in steps.items():
+        print(f"  {name:<28}{last - first:>8.2f}s")
+    print(f"Concurrent client, {len(latencies['write'])} operations each (milliseconds)")
+    print(f"{'operation':<10}{'mean':>9}{'p50':>9}{'p99':>9}{'max':>9}")
+    for label, samples in latencies.items():
+        if samples:
+            summary = latency_summary(samples)
+            print(f"{label:<10}{summary['mean_ms']:>9.2f}{summary['p50_ms']:>9.2f}"
+                  f"{summary['p99_ms']:>9.2f}{summary['max_ms']:>9.2f}")
+
+
+def bench_dashboard(args):
+    """
+    Compares the dashboard figures read from the trigger-maintained counts with
+    the same figures computed by GROUP BY over every reservation.
+    """
+    use_database("dashboard.db")
+    start = time.perf_counter()
+    fill_database(args.rows)
+    print(f"Loaded {args.rows} rows in {time.perf_counter() - start:.1f}s")
+    conn = repository.get_connection()
+    first_day = repository.parse_day("2025-01-01")  # generate_rows() starts there
+
+    def group_by():
+        conn.execute('SELECT f.day, COUNT(*) FROM reservations r JOIN flights f ON f.id = r.flight_id '
+                     'WHERE f.day >= ? GROUP BY f.day ORDER BY f.day LIMIT 30', (first_day,)).fetchall()
+        conn.execute('SELECT f.departure, f.destination, COUNT(*) AS booked '
+                     'FROM reservations r JOIN flights f ON f.id = r.flight_id '
+                     'GROUP BY f.departure COLLATE NOCASE, f.destination COLLATE NOCASE '
+                     'ORDER BY booked DESC LIMIT 10').fetchall()
+        conn.execute('SELECT f.flight_number, f.day, COUNT(r.id) FROM flights f '
+                     'LEFT JOIN reservations r ON r.flight_id = f.id WHERE f.day >= ? '
+                     'GROUP BY f.id ORDER BY f.day, f.id LIMIT 100', (first_day,)).fetchall()
+
+    print(f"Dashboard load over {args.queries} runs each (milliseconds)")
+    print(f"{'source':<16}{'mean':>9}{'p50':>9}{'p99':>9}{'max':>9}")
+    for label, func in (("GROUP BY", group_by), ("summary tables", lambda: repository.get_dashboard("2025-01-01"))):
+        samples = []
+        for _ in range(args.queries):
+            start = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - start)
+        summary = latency_summary(samples)
+        print(f"{label:<16}{summary['mean_ms']:>9.2f}{summary['p50_ms']:>9.2f}"
+              f"{summary['p99_ms']:>9.2f}{summary['max_ms']:>9.2f}")
+    repository.close_connections()
+
+
+def bench_archive(args):
+    """
+    Archives the oldest `fraction` of the reservations while another thread keeps
+    booking, and compares full scans of the live table before and after.
+    """
+    import threading
+
+    import archive
+
+    use_database("archive.db")
+    if os.path.exists(repository.archive_path()):
+        os.remove(repository.archive_path())
+    start = time.perf_counter()
+    fill_database(args.rows)
+    print(f"Loaded {args.rows} rows in {time.perf_counter() - start:.1f}s")
+    conn = repository.get_connection()
+    cutoff_day = conn.execute('SELECT f.day FROM reservations r JOIN flights f ON f.id = r.flight_id '
+                              'ORDER BY f.day LIMIT 1 OFFSET ?', (int(args.rows * args.fraction),)).fetchone()[0]
+    cutoff = repository._from_day(cutoff_day)
+
+    def paged_listing():
+        rows, after_id = [], 0
+        while True:
+            page = repository.get_reservations_page(after_id=after_id, limit=1000)
+            if not page:
+                return rows
+            rows += page
+            after_id = page[-1].id
+
+    def scans():
+        repository.reservation_cache.clear()
+        listing = time_scan(paged_listing)
+        repository.reservation_cache.clear()
+        return listing, time_scan(repository.get_all_reservations)
+
+    before = scans()
+
+    # A client booking upcoming flights all the while
+    stop = threading.Event()
+    latencies = []
+
+    def book():
+        for row in generate_rows(10 ** 6, seed=99, first=args.rows):
+            if stop.is_set():
+                break
+            started = time.perf_counter()
+            try:
+                repository.add_reservation(*row[:4], row[4].replace("2025", "2031", 1), row[5])
+            except repository.RepositoryError:
+                pass
+            latencies.append(time.perf_counter() - started)
+            time.sleep(0.002)
+
+    writer = threading.Thread(target=book)
+    writer.start()
+    start = time.perf_counter()
+    report = archive.archive_past(cutoff)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    writer.join()
+    after = scans()
+
+    print(f"Archived {report.reservations} reservations before {cutoff} and removed {report.flights} flights "
+          f"in {elapsed:.1f}s ({report.reservations / elapsed:.0f} rows/s)")
+    summary = latency_summary(latencies)
+    print(f"Concurrent bookings meanwhile: {len(latencies)}, p50 {summary['p50_ms']:.2f} ms, "
+          f"p99 {summary['p99_ms']:.2f} ms, max {summary['max_ms']:.2f} ms")
+    print(f"{'live table scan':<24}{'before':>14}{'after':>14}")
+    for label, (old, new) in (("paged listing", (before[0], after[0])),
+                              ("get_all_reservations", (before[1], after[1]))):
+        print(f"{label:<24}{old[0] * 1e3:>9.0f} ms  {new[0] * 1e3:>9.0f} ms   ({old[1]} -> {new[1]} rows)")
+    repository.close_connections()
+
+
+def bench_backup(args):
+    """
+    Backs up and exports the database while another thread keeps booking, and
+    reports how long that took, whether the copy matches the moment it started,
+    and how long the bookings made meanwhile waited.
+    """
+    import threading
+
+    import backup
+    import transfer
+
+    use_database("backup.db")
+    start = time.perf_counter()
+    fill_database(args.rows)
+    print(f"Loaded {args.rows} rows in {time.perf_counter() - start:.1f}s")
+    rows = generate_rows(10 ** 7, seed=7, first=args.rows)
+    target = os.path.join(_SCRATCH_DIR, "backup-copy.db")
+
+    def with_writer(func):
+        """Runs func() while a thread books flights; returns its result, seconds taken and booking latencies."""
+        stop = threading.Event()
+        latencies = []
+
+        def book():
+            while not stop.is_set():
+                row = next(rows)
+                started = time.perf_counter()
+                repository.add_reservation(*row[:4], row[4].replace("2025", "2031", 1), row[5])
+                latencies.append(time.perf_counter() - started)
+                time.sleep(0.001)
+
+        writer = threading.Thread(target=book)
+        writer.start()
+        started = time.perf_counter()
+        try:
+            result = func()
+        finally:
+            elapsed = time.perf_counter() - started
+            stop.set()
+            writer.join()
+        return result, elapsed, latencies
+
+    def copied_rows():
+        copy = sqlite3.connect(target)
+        try:
+            return copy.execute("SELECT COUNT(*) FROM reservations").fetchone()[0]
+        finally:
+            copy.close()
+
+    def export():
+        """Exports, and counts the reservations in the same snapshot the export reads."""
+        with repository.read_snapshot() as snapshot:
+            expected = snapshot.execute("SELECT COUNT(*) FROM reservations").fetchone()[0]
+            return transfer.export_reservations(target + ".jsonl"), expected
+
+    # Each run's check turns its result into (rows copied, rows in the snapshot
+    # it copied), both read from that snapshot, so any difference is a bug
+    runs = [("no backup", lambda: time.sleep(1.0), None)]
+    for pages in args.pages:
+        runs.append((f"backup, {pages} pages/step" if pages > 0 else "backup, one step",
+                     lambda pages=pages: backup.backup_database(target, pages_per_step=pages),
+                     lambda snapshot: (copied_rows(), snapshot.rows)))
+    runs.append(("export (jsonl)", export, lambda counts: counts))
+
+    print(f"{'while booking':<26}{'seconds':>9}{'copied':>10}{'expected':>10}"
+          f"{'bookings':>10}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for label, func, check in runs:
+        result, elapsed, latencies = with_writer(func)
+        copied, expected = check(result) if check else ("", "")
+        summary = latency_summary(latencies)
+        print(f"{label:<26}{elapsed:>9.2f}{copied:>10}{expected:>10}{len(latencies):>10}"
+              f"{summary['p50_ms']:>9.2f}{summary['p99_ms']:>9.2f}{summary['max_ms']:>9.2f}")
+    repository.close_connections()
+
+
+def bench_validate(args):
+    """
+    Validates synthetic reservations one by one without the field caches, one
+    by one with them, and as import batches.
+    """
+    import validation
+
+    rows = list(generate_rows(args.rows))
+    checks = validation._CHECKS
+
+    def uncached():
+        validation._CHECKS = tuple(check.__wrapped__ for check in checks)
+        try:
+            return [validation.validate_reservation(*row) for row in rows]
+        finally:
+            validation._CHECKS = checks
+
+    runs = (("per row, uncached", uncached),
+            ("per row, cached", lambda: [validation.validate_reservation(*row) for row in rows]),
+            ("batch, cached", lambda: validation.validate_reservations(rows)))
+    print(f"{args.rows} rows")
+    print(f"{'validation':<20}{'seconds':>9}{'rows/s':>12}")
+    for label, func in runs:
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        print(f"{label:<20}{elapsed:>9.3f}{args.rows / elapsed:>12.0f}")
+
+
+# --- Regression suite: every operation at several table sizes, as JSON ---
+
+def throughput(samples):
+    """latency_summary() plus the operation count and operations per second."""
+    summary = latency_summary(samples)
+    summary["count"] = len(samples)
+    summary["ops_per_sec"] = len(samples) / sum(samples) if sum(samples) else 0.0
+    return summary
+
+
+def timed(func, args_list):
+    """Calls func once per argument tuple and returns each call's latency in seconds."""
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        func(*args)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run_writer(path, rows):
+    """
+    One of the concurrent writer processes: books each row in its own
+    transaction and returns (latencies, errors).
+    """
+    repository.DATABASE_NAME = path
+    samples, errors = [], 0
+    for row in rows:
+        start = time.perf_counter()
+        try:
+            repository.add_reservation(*row)
+        except repository.RepositoryError:
+            errors += 1
+        samples.append(time.perf_counter() - start)
+    repository.close_connections()
+    return samples, errors
+
+
+def measure_size(size, args):
+    """Loads `size` rows into a fresh database and times every operation on it."""
+    import multiprocessing
+
+    path = use_database(f"suite_{size}.db")
+    start = time.perf_counter()
+    fill_database(size)
+    load_seconds = time.perf_counter() - start
+    rng = random.Random(args.seed)
+    ops = min(args.ops, size)
+    # Lookups, updates and deletes hit existing rows; inserts use rows after them
+    ids = rng.sample(range(1, size + 1), ops)
+    new_rows = list(generate_rows(ops, first=size))
+    operations = {}
+
+    def uncached(func):
+        def call(*call_args):
+            repository.reservation_cache.clear()  # Measure the database, not the result cache
+            return func(*call_args)
+        return call
+
+    operations["insert"] = timed(repository.add_reservation, new_rows)
+    operations["lookup"] = timed(uncached(repository.get_reservation_by_id), [(rid,) for rid in ids])
+
+    # The app never loads every row at once; a full listing pages through them in ID order
+    list_samples = []
+    for _ in range(args.list_runs):
+        repository.reservation_cache.clear()
+        start = time.perf_counter()
+        after_id = 0
+        while True:
+            page = repository.get_reservations_page(after_id=after_id, limit=1000)
+            if not page:
+                break
+            after_id = page[-1].id
+        list_samples.append(time.perf_counter() - start)
+    operations["full list"] = list_samples
+
+    queries = list(search_queries(rng).values())
+    operations["search"] = timed(uncached(lambda filters: repository.search_reservations(limit=200, **filters)),
+                                 [(rng.choice(queries)(),) for _ in range(ops)])
+    operations["update"] = timed(repository.update_reservation,
+                                 [(rid, "Jane Doe") + repository.get_reservation_by_id(rid)[2:] for rid in ids])
+    operations["delete"] = timed(repository.delete_reservation, [(rid,) for rid in ids])
+    repository.close_connections()
+
+    result = {
+        "rows": size,
+        "load": {"seconds": load_seconds, "rows_per_sec": size / load_seconds if load_seconds else 0.0},
+        "operations": {name: throughput(samples) for name, samples in operations.items()},
+    }
+    if args.writers:
+        # Each process books its own rows, continuing after the inserts above
+        work = [(path, list(generate_rows(ops, first=size + ops * (writer + 1)))) for writer in range(args.writers)]
+        start = time.perf_counter()
+        with multiprocessing.Pool(args.writers) as pool:
+            outcomes = pool.starmap(run_writer, work)
+        elapsed = time.perf_counter() - start
+        samples = [sample for writer_samples, _ in outcomes for sample in writer_samples]
+        concurrent = throughput(samples)
+        # Wall-clock throughput of all writers together, not per writer
+        concurrent["ops_per_sec"] = len(samples) / elapsed
+        concurrent["writers"] = args.writers
+        concurrent["errors"] = sum(errors for _, errors in outcomes)
+        result["concurrent insert"] = concurrent
+    os.remove(path)
+    return result
+
+
+def compare_results(results, baseline, tolerance):
+    """
+    Lists the operations that got slower than in a baseline run: p50 latency up
+    or throughput down by more than `tolerance` (a fraction).
+    """
+    regressions = []
+    previous = {entry["rows"]: entry for entry in baseline["results"]}
+    for entry in results["results"]:
+        old_entry = previous.get(entry["rows"])
+        if old_entry is None:
+            continue
+        pairs = [(name, stats, old_entry["operations"].get(name)) for name, stats in entry["operations"].items()]
+        old_concurrent = old_entry.get("concurrent insert")
+        if "concurrent insert" in entry and old_concurrent and \
+                old_concurrent["writers"] == entry["concurrent insert"]["writers"]:
+            pairs.append(("concurrent insert", entry["concurrent insert"], old_concurrent))
+        for name, stats, old in pairs:
+            if old is None:
+                continue
+            if stats["p50_ms"] > old["p50_ms"] * (1 + tolerance):
+                regressions.append(f"{entry['rows']} rows, {name}: p50 {old['p50_ms']:.3f} -> {stats['p50_ms']:.3f} ms")
+            if stats["ops_per_sec"] < old["ops_per_sec"] * (1 - tolerance):
+                regressions.append(f"{entry['rows']} rows, {name}: {old['ops_per_sec']:.1f} -> "
+                                   f"{stats['ops_per_sec']:.1f} ops/s")
+    return regressions
+
+
+def bench_suite(args):
+    """
+    Times insert, lookup, full list, search, update and delete at each table
+    size, optionally with concurrent writer processes, and writes the results
+    as JSON for comparison between releases.
+    """
+    import json
+    import platform
+
+    results = {
+        "generated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "ops": args.ops,
+        "results": [],
+    }
+    for size in args.sizes:
+        entry = measure_size(size, args)
+        results["results"].append(entry)
+        print(f"{size} rows, loaded in {entry['load']['seconds']:.1f}s "
+              f"({entry['load']['rows_per_sec']:.0f} rows/s; latencies in milliseconds)")
+        print(f"{'operation':<20}{'count':>7}{'ops/s':>11}{'p50':>9}{'p99':>9}{'max':>9}")
+        stats = dict(entry["operations"])
+        if "concurrent insert" in entry:
+            stats[f"{args.writers} writers insert"] = entry["concurrent insert"]
+        for name, summary in stats.items():
+            print(f"{name:<20}{summary['count']:>7}{summary['ops_per_sec']:>11.1f}{summary['p50_ms']:>9.2f}"
+                  f"{summary['p99_ms']:>9.2f}{summary['max_ms']:>9.2f}")
+        if entry.get("concurrent insert", {}).get("errors"):
+            print(f"  {entry['concurrent insert']['errors']} concurrent inserts failed")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+        print(f"Results written to {args.json}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            regressions = compare_results(results, json.load(handle), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            raise SystemExit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="FlightyReserveMate database benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    pool = subparsers.add_parser("pool", help="connection-per-call vs pooled connections")
+    pool.add_argument("--ops", type=int, default=1000, help="operations per CRUD step")
+    pool.set_defaults(func=bench_pool)
+
+    batch = subparsers.add_parser("batch", help="per-row writes vs batched transactions")
+    batch.add_argument("--rows", type=int, default=2000, help="rows to insert and delete")
+    batch.set_defaults(func=bench_batch)
+
+    search = subparsers.add_parser("search", help="indexed search latency on a large table")
+    search.add_argument("--rows", type=int, default=1000000, help="synthetic reservations to load")
+    search.add_argument("--queries", type=int, default=200, help="queries per search type")
+    search.set_defaults(func=bench_search)
+
+    cache = subparsers.add_parser("cache", help="cached vs uncached reservation lookups")
+    cache.add_argument("--rows", type=int, default=100000, help="synthetic reservations to load")
+    cache.add_argument("--queries", type=int, default=1000, help="lookups per kind")
+    cache.set_defaults(func=bench_cache)
+
+    transfer_parser = subparsers.add_parser("transfer", help="CSV/JSON Lines import and export throughput")
+    transfer_parser.add_argument("--rows", type=int, default=100000, help="rows per file")
+    transfer_parser.set_defaults(func=bench_transfer)
+
+    schema = subparsers.add_parser("schema", help="file size and scan time before/after the flights table")
+    schema.add_argument("--rows", type=int, default=1000000, help="synthetic reservations to load")
+    schema.set_defaults(func=bench_schema)
+
+    migrate = subparsers.add_parser("migrate", help="chunked schema upgrade with a concurrent client")
+    migrate.add_argument("--rows", type=int, default=1000000, help="synthetic reservations to load")
+    migrate.add_argument("--chunk-size", type=int, default=5000, help="rows per migration chunk")
+    migrate.set_defaults(func=bench_migrate)
+
+    dashboard = subparsers.add_parser("dashboard", help="summary tables vs GROUP BY for the statistics page")
+    dashboard.add_argument("--rows", type=int, default=1000000, help="synthetic reservations to load")
+    dashboard.add_argument("--queries", type=int, default=20, help="loads to time per source")
+    dashboard.set_defaults(func=bench_dashboard)
+
+    archive_parser = subparsers.add_parser("archive", help="archive past reservations while a client keeps booking")
+    archive_parser.add_argument("--rows", type=int, default=1000000, help="synthetic reservations to load")
+    archive_parser.add_argument("--fraction", type=float, default=0.5, help="share of the rows in the past")
+    archive_parser.set_defaults(func=bench_archive)
+
+    backup_parser = subparsers.add_parser("backup", help="online backup and export while a client keeps booking")
+    backup_parser.add_argument("--rows", type=int, default=1000000, help="synthetic reservations to load")
+    backup_parser.add_argument("--pages", type=lambda text: [int(pages) for pages in text.split(",")],
+                               default=[64, 256, 1024, -1], help="pages per backup step to compare (-1: all at once)")
+    backup_parser.set_defaults(func=bench_backup)
+
+    validate = subparsers.add_parser("validate", help="reservation validation, per row vs batched, cached vs not")
+    validate.add_argument("--rows", type=int, default=200000, help="synthetic reservations to validate")
+    validate.set_defaults(func=bench_validate)
+
+    suite = subparsers.add_parser("suite", help="every operation at several table sizes, with JSON output")
+    suite.add_argument("--sizes", type=lambda text: [int(size) for size in text.split(",")],
+                       default=[1000, 10000, 100000, 1000000], help="comma-separated table sizes to measure")
+    suite.add_argument("--ops", type=int, default=1000, help="calls timed per operation and size")
+    suite.add_argument("--list-runs", type=int, default=3, help="full listings timed per size")
+    suite.add_argument("--writers", type=int, default=4, help="concurrent writer processes (0 to skip)")
+    suite.add_argument("--seed", type=int, default=7, help="seed for the choice of rows and queries")
+    suite.add_argument("--json", help="write the results to this file")
+    suite.add_argument("--baseline", help="earlier --json output; exit with status 1 on regressions")
+    suite.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against the baseline")
+    suite.set_defaults(func=bench_suite)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
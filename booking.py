@@ -1,6 +1,10 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
-from database import add_reservation
+from tkinter import ttk
+import dialogs
+import outbox
+from repository import SeatUnavailableError, RouteConflictError, InvalidReservationError
+from seats import inventory
+from form_errors import FieldErrors
 
 class BookingPage(ttk.Frame):
     def __init__(self, parent, controller):
@@ -23,14 +27,17 @@ class BookingPage(ttk.Frame):
             entry = ttk.Entry(form_frame, width=40, font=('Helvetica', 11))
             entry.grid(row=i, column=1, sticky="ew", pady=10, padx=5)
             self.entries[field] = entry
-        
+
+        # Problems are shown next to the fields they concern
+        self.field_errors = FieldErrors(form_frame, [self.entries[field] for field in fields])
+
         # Frame for buttons
         button_frame = ttk.Frame(self)
         button_frame.pack(pady=30)
 
         # Submit Button
-        submit_btn = ttk.Button(button_frame, text="Submit Reservation", command=self.submit, style='Accent.TButton')
-        submit_btn.pack(side="left", padx=10, ipadx=10, ipady=5)
+        self.submit_btn = ttk.Button(button_frame, text="Submit Reservation", command=self.submit, style='Accent.TButton')
+        self.submit_btn.pack(side="left", padx=10, ipadx=10, ipady=5)
 
         # Go Home Button
         home_btn = ttk.Button(button_frame, text="Go Home", command=lambda: controller.show_frame("HomePage"))
@@ -39,36 +46,68 @@ class BookingPage(ttk.Frame):
     def submit(self):
         """
         Collects data from input fields, validates it, and adds a new reservation to the database.
-        Provides user feedback via messagebox.
+        Problems with the fields are shown next to them; the outcome via dialogs.
         """
-        name = self.entries["Name"].get().strip()
-        flight_number = self.entries["Flight Number"].get().strip()
-        departure = self.entries["Departure"].get().strip()
-        destination = self.entries["Destination"].get().strip()
-        date = self.entries["Date (YYYY-MM-DD)"].get().strip()
-        seat_number = self.entries["Seat Number"].get().strip()
-
-        # Basic input validation
-        if not all([name, flight_number, departure, destination, date, seat_number]):
-            messagebox.showerror("Input Error", "All fields are required! Please fill out all the information.")
+        # Same rules as bulk import, see validation.py
+        if not self.field_errors.check():
             return
+        name, flight_number, departure, destination, date, seat_number = self.field_errors.values()
+
+        # Check the seat and book it on the database worker so the window stays responsive
+        self._set_busy(True)
+        self.controller.db_worker.submit(
+            _book, name, flight_number, departure, destination, date, seat_number,
+            on_done=self._on_booked, on_error=self._on_book_error)
 
-        # Simple date format validation (can be improved with regex or a date picker)
-        if not (len(date) == 10 and date[4] == '-' and date[7] == '-'):
-             messagebox.showerror("Input Error", "Please use YYYY-MM-DD format for the date.")
-             return
-
-        # Add reservation to the database
-        if add_reservation(name, flight_number, departure, destination, date, seat_number):
-            messagebox.showinfo("Success", "Reservation booked successfully! 🎉")
-            # Clear input fields after successful booking
-            for entry in self.entries.values():
-                entry.delete(0, tk.END)
-            self.controller.show_frame("HomePage") # Navigate back to home page
+    def _on_booked(self, reservation_id):
+        """Reports a successful booking once the database worker is done."""
+        self._set_busy(False)
+        if reservation_id is outbox.QUEUED:
+            dialogs.showinfo("Saved for Later", outbox.QUEUED_MESSAGE)
         else:
-            messagebox.showerror("Error", "Failed to book reservation. Please try again.")
+            dialogs.showinfo("Success", "Reservation booked successfully! 🎉")
+        # Clear input fields after successful booking
+        for entry in self.entries.values():
+            entry.delete(0, tk.END)
+        self.field_errors.clear()
+        self.controller.show_frame("HomePage") # Navigate back to home page
+
+    def _on_book_error(self, error):
+        self._set_busy(False)
+        if isinstance(error, SeatUnavailableError):
+            self.field_errors.show({"seat_number": f"{error} Please choose another seat."})
+            return
+        if isinstance(error, RouteConflictError):
+            self.field_errors.show({"flight_number": str(error)})
+            return
+        if isinstance(error, InvalidReservationError):
+            dialogs.showerror(error.title, str(error))
+            return
+        dialogs.showerror(getattr(error, "title", "Error"), f"Failed to book reservation. Please try again.\n\n{error}")
+
+    def _set_busy(self, busy):
+        """Disables the submit button while a booking is in progress."""
+        self.submit_btn.config(state="disabled" if busy else "normal",
+                               text="Booking…" if busy else "Submit Reservation")
 
     def set_data(self, data=None):
         # This page doesn't receive data, but the method is here for consistency
         # when called by controller.show_frame
         pass
+
+
+def _book(name, flight_number, departure, destination, date, seat_number):
+    """
+    Runs on the database worker. Rejects taken seats straight from the in-memory
+    seat inventory, otherwise books the seat (or queues the booking while
+    another program keeps the database locked).
+
+    Returns:
+        int: The ID of the new reservation, or outbox.QUEUED.
+
+    Raises:
+        SeatUnavailableError: If the seat is already taken.
+    """
+    if not inventory.is_available(flight_number, date, seat_number):
+        raise SeatUnavailableError(flight_number, date, seat_number)
+    return outbox.write("add_reservation", name, flight_number, departure, destination, date, seat_number)
@@ -0,0 +1,148 @@
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+
+# Default size bounds of the reservation cache; None means unbounded
+ROW_CACHE_SIZE = 10000
+PAGE_CACHE_SIZE = 128
+
+# A page that ran out of rows covers every ID above its cursor, including
+# reservations that have not been inserted yet
+OPEN_END = float("inf")
+
+
+class LRUCache:
+    """
+    A mapping with an optional size bound that evicts the least recently used
+    entry, and counts lookups that hit or missed. Not thread-safe on its own.
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """Returns the cached value, marking it as recently used, or default."""
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if self.maxsize is not None:
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        self._data.pop(key, None)
+
+    def items(self):
+        return list(self._data.items())
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self):
+        """Returns hits, misses, current size and size bound as a dict."""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize}
+
+
+class ReservationCache:
+    """
+    In-process cache of reservation rows by ID and of whole result pages of
+    list and search queries, used by repository.py.
+
+    Every cached page remembers the range of IDs it covers, (low, high], so a
+    change to one reservation only drops the pages whose range contains it: a
+    row can only enter, leave or change a keyset page inside that range.
+
+    Entries are tagged with the cache version current when their query started.
+    Any invalidation bumps the version, so a result read before a concurrent
+    write is never stored after that write has invalidated it.
+    """
+
+    def __init__(self, max_rows=ROW_CACHE_SIZE, max_pages=PAGE_CACHE_SIZE):
+        self.rows = LRUCache(max_rows)
+        self.pages = LRUCache(max_pages)
+        # Database file and change-log watermark the cached entries are current with
+        self.database = None
+        self.watermark = None
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self._version
+
+    def get_row(self, reservation_id):
+        """Returns the cached reservation tuple, or None."""
+        with self._lock:
+            return self.rows.get(reservation_id)
+
+    def put_rows(self, rows, version):
+        """Caches reservation tuples read while the cache was at `version`."""
+        with self._lock:
+            if version != self._version:
+                return
+            for row in rows:
+                self.rows.put(row[0], row)
+
+    def get_page(self, key):
+        """Returns a copy of a cached result page, or None."""
+        with self._lock:
+            entry = self.pages.get(key)
+        return None if entry is None else list(entry[2])
+
+    def put_page(self, key, rows, low, high, version):
+        """
+        Caches a result page covering reservation IDs in (low, high], read while
+        the cache was at `version`. Its rows are cached individually too.
+        """
+        with self._lock:
+            if version != self._version:
+                return
+            self.pages.put(key, (low, high, tuple(rows)))
+            for row in rows:
+                self.rows.put(row[0], row)
+
+    def invalidate(self, reservation_ids):
+        """Forgets the given reservations and every cached page that could include them."""
+        reservation_ids = sorted(int(reservation_id) for reservation_id in reservation_ids)
+        if not reservation_ids:
+            return
+        with self._lock:
+            self._version += 1
+            for reservation_id in reservation_ids:
+                self.rows.pop(reservation_id)
+            for key, (low, high, _) in self.pages.items():
+                # Is there an ID in (low, high]?
+                index = bisect_right(reservation_ids, low)
+                if index < len(reservation_ids) and reservation_ids[index] <= high:
+                    self.pages.pop(key)
+
+    def clear(self):
+        """Forgets everything; statistics are kept."""
+        with self._lock:
+            self._version += 1
+            self.rows.clear()
+            self.pages.clear()
+            self.watermark = None
+
+    def stats(self):
+        """
+        Returns the row and page caches' hit/miss counters and sizes, e.g.
+        {"rows": {"hits": 10, "misses": 2, "size": 2, "maxsize": 10000}, "pages": {...}}.
+        """
+        with self._lock:
+            return {"rows": self.rows.stats(), "pages": self.pages.stats()}
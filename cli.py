@@ -0,0 +1,321 @@
+"""
+Command-line entry point for working with the reservations database without the GUI.
+
+Usage:
+    python cli.py add NAME FLIGHT DEPARTURE DESTINATION DATE SEAT
+    python cli.py list [--after ID] [--limit N]
+    python cli.py search [--name PREFIX | --fuzzy WORDS] [--flight F] [--from CITY] [--to CITY]
+                         [--date-from DATE] [--date-to DATE] [--archived] [--after ID] [--limit N]
+    python cli.py delete ID [ID ...]
+    python cli.py deleted [--after ID] [--limit N]
+    python cli.py restore ID [ID ...]
+    python cli.py archive [--before DATE]
+    python cli.py import FILE [--format csv|jsonl]
+    python cli.py export FILE [--format csv|jsonl]
+    python cli.py migrate
+    python cli.py outbox
+    python cli.py backup [FILE] [--if-due]
+    python cli.py backups
+    python cli.py restore-backup FILE
+
+Use --db PATH to work on a database other than flights.db.
+
+Only repository.py is used, never Tkinter, so a command starts in a few tens of
+milliseconds. Listings are tab-separated with a header row, ready for cut/awk.
+Exit status is 0 on success, 1 if some rows were rejected or not found, and 2
+on errors.
+"""
+import argparse
+import sys
+import time
+
+import archive
+import backup
+import migrations
+import outbox
+import repository
+import transfer
+from validation import validate_reservation
+
+COLUMNS = ("id",) + transfer.FIELDS
+
+
+def print_rows(rows):
+    """Writes reservations as tab-separated lines under a header row."""
+    lines = ["\t".join(COLUMNS)]
+    lines.extend("\t".join(str(value) for value in row) for row in rows)
+    print("\n".join(lines))
+
+
+def show_migration_progress(report):
+    """Shows how far a database upgrade has got on a terminal's stderr."""
+    if not sys.stderr.isatty():
+        return
+    percent = 100 * report.done // report.total if report.total else 100
+    print(f"\rUpgrading database to version {report.version}: {report.step} {percent}%\033[K",
+          end="", file=sys.stderr, flush=True)
+
+
+def cmd_add(args):
+    fields = (args.name, args.flight_number, args.departure, args.destination, args.date, args.seat_number)
+    fields = tuple(field.strip() for field in fields)
+    error = validate_reservation(*fields)
+    if error:
+        print(f"error: {error}", file=sys.stderr)
+        return 1
+    try:
+        print(repository.add_reservation(*fields))
+    except repository.SeatUnavailableError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def cmd_list(args):
+    print_rows(repository.get_reservations_page(after_id=args.after, limit=args.limit))
+    return 0
+
+
+def cmd_search(args):
+    filters = {
+        "name": args.name,
+        "fuzzy_name": args.fuzzy,
+        "flight_number": args.flight,
+        "departure": args.departure,
+        "destination": args.destination,
+        "date_from": args.date_from,
+        "date_to": args.date_to,
+    }
+    print_rows(repository.search_reservations(after_id=args.after, limit=args.limit,
+                                              include_archived=args.archived, **filters))
+    return 0
+
+
+def cmd_delete(args):
+    status = 0
+    for result in repository.delete_reservations(args.ids):
+        if result.ok:
+            print(f"deleted {result.reservation_id}")
+        else:
+            print(f"{result.reservation_id}: {result.error}", file=sys.stderr)
+            status = 1
+    return status
+
+
+def cmd_deleted(args):
+    lines = ["\t".join(COLUMNS + ("deleted_at",))]
+    for deleted in repository.get_deleted_reservations(after_id=args.after, limit=args.limit):
+        lines.append("\t".join(str(value) for value in deleted.reservation + (deleted.deleted_at,)))
+    print("\n".join(lines))
+    return 0
+
+
+def cmd_restore(args):
+    status = 0
+    for reservation_id in args.ids:
+        try:
+            repository.restore_reservation(reservation_id)
+            print(f"restored {reservation_id}")
+        except (repository.ReservationNotFoundError, repository.SeatUnavailableError,
+                repository.RouteConflictError) as e:
+            print(f"{reservation_id}: {e}", file=sys.stderr)
+            status = 1
+    return status
+
+
+def cmd_archive(args):
+    start = time.perf_counter()
+
+    def show_progress(report):
+        if sys.stderr.isatty():
+            print(f"\r{report.done} of {report.total} reservation(s) archived\033[K", end="", file=sys.stderr, flush=True)
+
+    report = archive.archive_past(args.before, progress=show_progress)
+    if sys.stderr.isatty():
+        print("\r\033[K", end="", file=sys.stderr)
+    print(f"Archived {report.reservations} reservation(s) and {report.deleted} deleted one(s), "
+          f"removed {report.flights} past flight(s), in {time.perf_counter() - start:.1f}s "
+          f"(archive: {repository.archive_path()})")
+    return 0
+
+
+def cmd_import(args):
+    start = time.perf_counter()
+
+    def show_progress(imported, rejected):
+        if sys.stderr.isatty():
+            print(f"\r{imported} imported, {rejected} rejected\033[K", end="", file=sys.stderr, flush=True)
+
+    report = transfer.import_reservations(args.file, args.format, progress=show_progress)
+    if sys.stderr.isatty():
+        print("\r\033[K", end="", file=sys.stderr)
+    for line_number, message in report.errors:
+        print(f"line {line_number}: {message}", file=sys.stderr)
+    if report.rejected > len(report.errors):
+        print(f"... and {report.rejected - len(report.errors)} more rejected row(s)", file=sys.stderr)
+    elapsed = time.perf_counter() - start
+    print(f"Imported {report.imported} reservation(s), rejected {report.rejected}, in {elapsed:.1f}s")
+    return 0 if report.rejected == 0 else 1
+
+
+def cmd_migrate(args):
+    # main() has already applied any pending migrations
+    print(f"{args.db} is at schema version {migrations.schema_version()}")
+    return 0
+
+
+def cmd_outbox(args):
+    report = outbox.drain()
+    for entry in report.rejected:
+        print(f"{outbox.describe(entry)} (queued {entry.queued_at}): {entry.error}", file=sys.stderr)
+    outbox.discard(entry.id for entry in report.rejected)
+    print(f"Made {report.applied} queued write(s); {report.pending} still waiting, {len(report.rejected)} rejected")
+    return 0 if report.pending == 0 and not report.rejected else 1
+
+
+def show_backup_progress(report):
+    """Shows how much of the database a backup has copied on a terminal's stderr."""
+    if sys.stderr.isatty():
+        print(f"\rBacking up: {100 * report.done // report.total if report.total else 100}%\033[K",
+              end="", file=sys.stderr, flush=True)
+
+
+def cmd_backup(args):
+    start = time.perf_counter()
+    try:
+        if args.file:
+            snapshot = backup.backup_database(args.file, progress=show_backup_progress)
+        elif args.if_due and not backup.snapshot_due():
+            print("No snapshot due yet")
+            return 0
+        else:
+            snapshot = backup.take_snapshot(progress=show_backup_progress)
+    finally:
+        if sys.stderr.isatty():
+            print("\r\033[K", end="", file=sys.stderr)
+    print(f"Backed up {snapshot.rows} reservations to {snapshot.path} ({snapshot.size / 1e6:.1f} MB) "
+          f"in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+def cmd_backups(args):
+    lines = ["path\ttaken_at\tsize"]
+    lines.extend(f"{snapshot.path}\t{snapshot.taken_at.isoformat(timespec='seconds')}\t{snapshot.size}"
+                 for snapshot in backup.list_snapshots())
+    print("\n".join(lines))
+    return 0
+
+
+def cmd_restore_backup(args):
+    before = backup.restore_database(args.file)
+    print(f"Restored {args.file}; the database as it was is saved in {before.path}")
+    return 0
+
+
+def cmd_export(args):
+    start = time.perf_counter()
+    count = transfer.export_reservations(args.file, args.format)
+    print(f"Exported {count} reservation(s) to {args.file} in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+def _add_paging(parser):
+    parser.add_argument("--after", type=int, default=0, metavar="ID", help="only reservations with a greater ID")
+    parser.add_argument("--limit", type=int, default=50, help="maximum number of rows (default: %(default)s)")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="FlightyReserveMate command-line tools")
+    parser.add_argument("--db", default=repository.DATABASE_NAME, help="database file (default: %(default)s)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    add_parser = subparsers.add_parser("add", help="book a reservation and print its ID")
+    for field in transfer.FIELDS:
+        add_parser.add_argument(field)
+    add_parser.set_defaults(func=cmd_add)
+
+    list_parser = subparsers.add_parser("list", help="list reservations in ID order")
+    _add_paging(list_parser)
+    list_parser.set_defaults(func=cmd_list)
+
+    search_parser = subparsers.add_parser("search", help="list reservations matching every given filter")
+    names = search_parser.add_mutually_exclusive_group()
+    names.add_argument("--name", help="passenger name prefix")
+    names.add_argument("--fuzzy", metavar="WORDS", help="words found anywhere in the passenger name")
+    search_parser.add_argument("--flight", help="flight number")
+    search_parser.add_argument("--from", dest="departure", metavar="CITY", help="departure location")
+    search_parser.add_argument("--to", dest="destination", metavar="CITY", help="destination location")
+    search_parser.add_argument("--date-from", metavar="DATE", help="earliest flight date (YYYY-MM-DD)")
+    search_parser.add_argument("--date-to", metavar="DATE", help="latest flight date (YYYY-MM-DD)")
+    search_parser.add_argument("--archived", action="store_true", help="also search archived past reservations")
+    _add_paging(search_parser)
+    search_parser.set_defaults(func=cmd_search)
+
+    delete_parser = subparsers.add_parser("delete", help="delete reservations by ID")
+    delete_parser.add_argument("ids", nargs="+", type=int, metavar="ID")
+    delete_parser.set_defaults(func=cmd_delete)
+
+    deleted_parser = subparsers.add_parser("deleted", help="list deleted reservations that can still be restored")
+    _add_paging(deleted_parser)
+    deleted_parser.set_defaults(func=cmd_deleted)
+
+    restore_parser = subparsers.add_parser("restore", help="bring back deleted reservations by ID")
+    restore_parser.add_argument("ids", nargs="+", type=int, metavar="ID")
+    restore_parser.set_defaults(func=cmd_restore)
+
+    archive_parser = subparsers.add_parser("archive", help="move reservations of past flights to the archive")
+    archive_parser.add_argument("--before", metavar="DATE", help="archive flights before this date (default: today)")
+    archive_parser.set_defaults(func=cmd_archive)
+
+    import_parser = subparsers.add_parser("import", help="load reservations from a CSV or JSON Lines file")
+    import_parser.add_argument("file")
+    import_parser.add_argument("--format", choices=transfer.FORMATS, help="file format (default: from extension)")
+    import_parser.set_defaults(func=cmd_import)
+
+    export_parser = subparsers.add_parser("export", help="write all reservations to a CSV or JSON Lines file")
+    export_parser.add_argument("file")
+    export_parser.add_argument("--format", choices=transfer.FORMATS, help="file format (default: from extension)")
+    export_parser.set_defaults(func=cmd_export)
+
+    migrate_parser = subparsers.add_parser("migrate", help="upgrade the database schema and print its version")
+    migrate_parser.set_defaults(func=cmd_migrate)
+
+    outbox_parser = subparsers.add_parser("outbox", help="make writes the GUI queued while the database was busy")
+    outbox_parser.set_defaults(func=cmd_outbox)
+
+    backup_parser = subparsers.add_parser("backup", help="back up the database while it stays in use")
+    backup_parser.add_argument("file", nargs="?",
+                               help="file to write (default: a new snapshot, keeping the newest "
+                                    f"{backup.SNAPSHOT_RETENTION})")
+    backup_parser.add_argument("--if-due", action="store_true",
+                               help="only take a snapshot if the newest is a day old (for cron)")
+    backup_parser.set_defaults(func=cmd_backup)
+
+    backups_parser = subparsers.add_parser("backups", help="list the snapshots, newest first")
+    backups_parser.set_defaults(func=cmd_backups)
+
+    restore_backup_parser = subparsers.add_parser("restore-backup", help="replace the database with a backup")
+    restore_backup_parser.add_argument("file")
+    restore_backup_parser.set_defaults(func=cmd_restore_backup)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    repository.DATABASE_NAME = args.db
+    try:
+        try:
+            repository.create_table(show_migration_progress)
+        except repository.DuplicateSeatsError as e:
+            print(f"warning: {e}", file=sys.stderr)
+        finally:
+            if sys.stderr.isatty():
+                print("\r\033[K", end="", file=sys.stderr)
+        return args.func(args)
+    except (OSError, ValueError, repository.RepositoryError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+from tkinter import ttk
+from repository import FLIGHT_CAPACITY, get_dashboard
+from tables import make_table
+
+class DashboardPage(ttk.Frame):
+    """
+    Booking statistics for managers: bookings per flight date, the busiest
+    routes and the load factor of upcoming flights. The figures come from
+    counts the database keeps up to date on every booking, so the page opens
+    just as fast on a large database as on a small one.
+    """
+    def __init__(self, parent, controller):
+        ttk.Frame.__init__(self, parent)
+        self.controller = controller
+
+        ttk.Label(self, text="Booking Statistics", font=("Helvetica", 20, "bold"), foreground="#00567a").pack(pady=20)
+
+        self.summary_label = ttk.Label(self, text="", font=("Helvetica", 12))
+        self.summary_label.pack(pady=(0, 10))
+
+        # Bookings per day and top routes side by side, upcoming flights below
+        top_frame = ttk.Frame(self)
+        top_frame.pack(fill="both", expand=True, padx=20)
+        top_frame.columnconfigure(0, weight=1)
+        top_frame.columnconfigure(1, weight=1)
+        top_frame.rowconfigure(1, weight=1)
+
+        ttk.Label(top_frame, text="Bookings per day", font=("Helvetica", 12, "bold")).grid(row=0, column=0, sticky="w", padx=5)
+        self.days_tree = make_table(top_frame, [("Date", 100, "center"), ("Bookings", 80, "center")])
+        self.days_tree.master.grid(row=1, column=0, sticky="nsew", padx=5, pady=5)
+
+        ttk.Label(top_frame, text="Top routes", font=("Helvetica", 12, "bold")).grid(row=0, column=1, sticky="w", padx=5)
+        self.routes_tree = make_table(top_frame, [("Route", 220, "w"), ("Bookings", 80, "center")])
+        self.routes_tree.master.grid(row=1, column=1, sticky="nsew", padx=5, pady=5)
+
+        ttk.Label(self, text=f"Upcoming flights (load factor out of {FLIGHT_CAPACITY} seats)",
+                  font=("Helvetica", 12, "bold")).pack(anchor="w", padx=25, pady=(10, 0))
+        self.flights_tree = make_table(self, [("Flight", 80, "center"), ("Date", 100, "center"),
+                                              ("Departure", 140, "w"), ("Destination", 140, "w"),
+                                              ("Booked", 70, "center"), ("Load factor", 90, "center")])
+        self.flights_tree.master.pack(fill="both", expand=True, padx=25, pady=5)
+
+        # Busy/status line shown while the figures are being read
+        self.status_label = ttk.Label(self, text="", font=("Helvetica", 10, "italic"), foreground="#555")
+        self.status_label.pack(anchor="w", padx=20)
+
+        button_frame = ttk.Frame(self)
+        button_frame.pack(pady=15)
+        ttk.Button(button_frame, text="🔄 Refresh", command=self.refresh).pack(side="left", padx=10, ipadx=10, ipady=5)
+        ttk.Button(button_frame, text="🏠 Go Home", command=lambda: controller.show_frame("HomePage")).pack(side="left", padx=10, ipadx=10, ipady=5)
+
+    def on_show_page(self):
+        """Reloads the figures every time the page is shown."""
+        self.refresh()
+
+    def refresh(self):
+        """Reads the figures on the database worker so the window stays responsive."""
+        self.status_label.config(text="Loading statistics…")
+        self.controller.db_worker.submit(get_dashboard, key=("dashboard", "load"),
+                                         on_done=self._show, on_error=self._on_error)
+
+    def _show(self, dashboard):
+        self.summary_label.config(text=f"Total bookings: {dashboard.total_booked}    "
+                                       f"Upcoming: {dashboard.upcoming_booked}")
+        _fill(self.days_tree, [(day.date, day.booked) for day in dashboard.days])
+        _fill(self.routes_tree, [(f"{route.departure} → {route.destination}", route.booked) for route in dashboard.routes])
+        _fill(self.flights_tree, [(flight.flight_number, flight.date, flight.departure, flight.destination,
+                                   flight.booked, f"{flight.load_factor:.0%}") for flight in dashboard.flights])
+        self.status_label.config(text="")
+
+    def _on_error(self, error):
+        self.status_label.config(text=f"Could not load statistics: {error}")
+
+
+def _fill(tree, rows):
+    """Replaces every row of a Treeview."""
+    tree.delete(*tree.get_children())
+    for values in rows:
+        tree.insert('', 'end', values=values)
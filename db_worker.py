@@ -0,0 +1,127 @@
+import queue
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import dialogs
+from instrumentation import span
+
+# How often (in milliseconds) the Tk main loop checks for finished database calls
+POLL_INTERVAL_MS = 15
+
+
+class _Job:
+    """One queued call. Fields may be replaced while the job is still waiting (coalescing)."""
+    __slots__ = ("func", "args", "kwargs", "on_done", "on_error", "key")
+
+    def __init__(self, func, args, kwargs, on_done, on_error, key):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.on_done = on_done
+        self.on_error = on_error
+        self.key = key
+
+
+class DBWorker:
+    """
+    Runs database calls on background threads so slow disks or lock contention
+    never freeze the Tk main loop.
+
+    Callbacks are never run on the worker threads: results are queued and picked
+    up by a poll scheduled with after(), so on_done/on_error always run on the Tk
+    thread and may touch widgets freely.
+    """
+
+    def __init__(self, max_workers=2):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db-worker")
+        self._results = queue.SimpleQueue()
+        self._waiting = {}  # Coalescing key -> job that has not started yet
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._root = None
+        self.busy_callback = None
+
+    def attach(self, root):
+        """Starts delivering results on the Tk main loop of `root`."""
+        self._root = root
+        self._root.after(POLL_INTERVAL_MS, self._poll)
+
+    @property
+    def busy(self):
+        """True while any submitted call has not delivered its result yet."""
+        return self._in_flight > 0
+
+    def submit(self, func, *args, on_done=None, on_error=None, key=None, **kwargs):
+        """
+        Queues func(*args, **kwargs) to run on a worker thread.
+
+        Args:
+            func (callable): The database call to run. It must not touch Tk widgets.
+            on_done (callable): Called on the Tk thread with the return value.
+            on_error (callable): Called on the Tk thread with the exception if func
+                                 raises. Defaults to showing an error dialog.
+            key (hashable): Coalescing key. If a call with the same key is still
+                            waiting to start, it is replaced by this one instead of
+                            queueing a second query, so a burst of identical
+                            refreshes runs once with the latest arguments.
+        """
+        with self._lock:
+            job = self._waiting.get(key) if key is not None else None
+            if job is not None:
+                job.func, job.args, job.kwargs = func, args, kwargs
+                job.on_done, job.on_error = on_done, on_error
+                return
+            job = _Job(func, args, kwargs, on_done, on_error, key)
+            if key is not None:
+                self._waiting[key] = job
+        self._set_in_flight(1)
+        self._executor.submit(self._run, job)
+
+    def shutdown(self):
+        """Stops accepting work; calls already running are allowed to finish."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job):
+        with self._lock:
+            if job.key is not None and self._waiting.get(job.key) is job:
+                del self._waiting[job.key]
+            func, args, kwargs = job.func, job.args, job.kwargs
+            on_done, on_error = job.on_done, job.on_error
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self._results.put((on_error or _show_error, e))
+        else:
+            self._results.put((on_done, result))
+
+    def _poll(self):
+        """Runs the callbacks of finished calls, then reschedules itself."""
+        try:
+            while True:
+                callback, value = self._results.get_nowait()
+                self._set_in_flight(-1)
+                if callback is not None:
+                    try:
+                        # Shows which callback held up the main loop, when diagnostics are on
+                        with span(getattr(callback, "__qualname__", "callback")):
+                            callback(value)
+                    except Exception:
+                        self._root.report_callback_exception(*sys.exc_info())
+        except queue.Empty:
+            pass
+        self._root.after(POLL_INTERVAL_MS, self._poll)
+
+    def _set_in_flight(self, delta):
+        with self._lock:
+            was_busy = self._in_flight > 0
+            self._in_flight += delta
+            is_busy = self._in_flight > 0
+        if was_busy != is_busy and self.busy_callback is not None and self._root is not None:
+            # Submit is called on the Tk thread and _poll runs there too, so this is safe
+            self.busy_callback(is_busy)
+
+
+def _show_error(error):
+    """Default on_error: report the failure in a dialog."""
+    dialogs.showerror(getattr(error, "title", "Error"), str(error))
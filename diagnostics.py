@@ -0,0 +1,100 @@
+import tkinter as tk
+from tkinter import ttk, filedialog
+import dialogs
+import instrumentation
+from tables import make_table
+
+class DiagnosticsPage(ttk.Frame):
+    """
+    Hidden page (Ctrl+Shift+D) showing where the time went: how often each
+    database call, page switch, table refresh and dialog ran and how long it
+    took, and the slowest SQL statements with their query plans. Recording
+    can be switched on here, or from the start with FLIGHTY_TRACE=1.
+    """
+    def __init__(self, parent, controller):
+        ttk.Frame.__init__(self, parent)
+        self.controller = controller
+
+        ttk.Label(self, text="Diagnostics", font=("Helvetica", 20, "bold"), foreground="#00567a").pack(pady=(20, 5))
+
+        self.enabled_var = tk.BooleanVar(value=instrumentation.is_enabled())
+        ttk.Checkbutton(self, text="Record timings", variable=self.enabled_var,
+                        command=self.toggle_recording).pack()
+
+        ttk.Label(self, text="Timings (milliseconds)", font=("Helvetica", 12, "bold")).pack(anchor="w", padx=25, pady=(10, 0))
+        self.counters_tree = make_table(self, [("Name", 330, "w"), ("Calls", 70, "center"), ("Total", 90, "center"),
+                                               ("Mean", 80, "center"), ("Max", 80, "center")])
+        self.counters_tree.master.pack(fill="both", expand=True, padx=25, pady=5)
+
+        ttk.Label(self, text=f"Statements that may have taken over {instrumentation.SLOW_STATEMENT_MS} ms",
+                  font=("Helvetica", 12, "bold")).pack(anchor="w", padx=25, pady=(10, 0))
+        self.slow_tree = make_table(self, [("Up to ms", 70, "center"), ("During", 200, "w"), ("SQL", 400, "w")])
+        self.slow_tree.master.pack(fill="both", expand=True, padx=25, pady=5)
+        self.slow_tree.config(selectmode="browse")
+        self.slow_tree.bind("<<TreeviewSelect>>", self.show_plan)
+
+        # Query plan of the selected slow statement
+        self.plan_text = tk.Text(self, height=5, font=("Courier", 10), state="disabled")
+        self.plan_text.pack(fill="x", padx=25, pady=5)
+
+        button_frame = ttk.Frame(self)
+        button_frame.pack(pady=10)
+        ttk.Button(button_frame, text="🔄 Refresh", command=self.refresh).pack(side="left", padx=10, ipadx=10, ipady=5)
+        ttk.Button(button_frame, text="🧹 Reset", command=self.reset).pack(side="left", padx=10, ipadx=10, ipady=5)
+        ttk.Button(button_frame, text="💾 Export Trace…", command=self.export_trace).pack(side="left", padx=10, ipadx=10, ipady=5)
+        ttk.Button(button_frame, text="🏠 Go Home", command=lambda: controller.show_frame("HomePage")).pack(side="left", padx=10, ipadx=10, ipady=5)
+
+        self._slow_statements = []
+
+    def on_show_page(self):
+        self.enabled_var.set(instrumentation.is_enabled())
+        self.refresh()
+
+    def toggle_recording(self):
+        if self.enabled_var.get():
+            instrumentation.enable()
+        else:
+            instrumentation.disable()
+
+    def refresh(self):
+        """Shows the figures recorded so far."""
+        self.counters_tree.delete(*self.counters_tree.get_children())
+        for counter in instrumentation.counters():
+            self.counters_tree.insert('', 'end', values=(
+                counter.name, counter.count, f"{counter.total * 1e3:.1f}",
+                f"{counter.total / counter.count * 1e3:.2f}", f"{counter.max * 1e3:.1f}"))
+
+        self._slow_statements = instrumentation.slow_statements()
+        self.slow_tree.delete(*self.slow_tree.get_children())
+        for index, statement in enumerate(self._slow_statements):
+            self.slow_tree.insert('', 'end', iid=str(index), values=(
+                f"{statement.duration * 1e3:.1f}", statement.span, " ".join(statement.sql.split())))
+        self._set_plan("")
+
+    def show_plan(self, event=None):
+        selected = self.slow_tree.selection()
+        if selected:
+            self._set_plan(self._slow_statements[int(selected[0])].plan or "(no query plan for this statement)")
+
+    def _set_plan(self, text):
+        self.plan_text.config(state="normal")
+        self.plan_text.delete("1.0", "end")
+        self.plan_text.insert("1.0", text)
+        self.plan_text.config(state="disabled")
+
+    def reset(self):
+        instrumentation.reset()
+        self.refresh()
+
+    def export_trace(self):
+        """Saves the recorded spans as a trace file for chrome://tracing or Perfetto."""
+        path = filedialog.asksaveasfilename(
+            title="Export Trace", defaultextension=".json", filetypes=[("Trace files", "*.json")])
+        if not path:
+            return
+        try:
+            count = instrumentation.export_trace(path)
+        except OSError as e:
+            dialogs.showerror("Export Failed", f"Could not write the trace file: {e}")
+            return
+        dialogs.showinfo("Trace Exported", f"{count} spans written to {path}.")
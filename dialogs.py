@@ -0,0 +1,15 @@
+"""
+The message boxes the pages show. They block the main loop until they are
+dismissed, so each one is timed as a "dialog.<name>" span, like any other stall,
+when diagnostics are on (see instrumentation.py). Pages use these rather than
+tkinter.messagebox directly; the tkinter module itself is left as it is.
+"""
+from tkinter import messagebox
+
+from instrumentation import traced
+
+showinfo = traced("dialog.showinfo")(messagebox.showinfo)
+showwarning = traced("dialog.showwarning")(messagebox.showwarning)
+showerror = traced("dialog.showerror")(messagebox.showerror)
+askyesno = traced("dialog.askyesno")(messagebox.askyesno)
+askyesnocancel = traced("dialog.askyesnocancel")(messagebox.askyesnocancel)
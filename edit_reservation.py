@@ -1,12 +1,22 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
-from database import update_reservation, get_reservation_by_id
+from tkinter import ttk
+import dialogs
+import outbox
+from repository import (get_versioned_reservation, SeatUnavailableError, RouteConflictError,
+                        InvalidReservationError, ReservationConflictError)
+from seats import inventory
+from form_errors import FieldErrors
+
+FIELDS = ["Name", "Flight Number", "Departure", "Destination", "Date (YYYY-MM-DD)", "Seat Number"]
 
 class EditReservationPage(ttk.Frame):
     def __init__(self, parent, controller):
         ttk.Frame.__init__(self, parent)
         self.controller = controller
         self.reservation_id = None # To store the ID of the reservation being edited
+        self.original_seat = None # (flight_number, date, seat_number) the reservation held when editing started
+        self.loaded = None # The reservation as read from the database, before any edits
+        self.version = None # Its version, checked when saving so concurrent edits are not overwritten
         
         ttk.Label(self, text="Edit Reservation", font=("Helvetica", 20, "bold"), foreground="#00567a").pack(pady=30)
         
@@ -15,22 +25,24 @@ class EditReservationPage(ttk.Frame):
         form_frame.pack(fill="both", expand=False, padx=50, pady=20)
         form_frame.columnconfigure(1, weight=1)
 
-        fields = ["Name", "Flight Number", "Departure", "Destination", "Date (YYYY-MM-DD)", "Seat Number"]
         self.entries = {} # Dictionary to hold Tkinter Entry widgets
 
-        for i, field in enumerate(fields):
+        for i, field in enumerate(FIELDS):
             ttk.Label(form_frame, text=f"{field}:", font=("Helvetica", 12)).grid(row=i, column=0, sticky="w", pady=10, padx=5)
             entry = ttk.Entry(form_frame, width=40, font=('Helvetica', 11))
             entry.grid(row=i, column=1, sticky="ew", pady=10, padx=5)
             self.entries[field] = entry
 
+        # Problems are shown next to the fields they concern
+        self.field_errors = FieldErrors(form_frame, [self.entries[field] for field in FIELDS])
+
         # Frame for buttons
         button_frame = ttk.Frame(self)
         button_frame.pack(pady=30)
 
         # Update Button
-        update_btn = ttk.Button(button_frame, text="Update Reservation", command=self.update_reservation, style='Accent.TButton')
-        update_btn.pack(side="left", padx=10, ipadx=10, ipady=5)
+        self.update_btn = ttk.Button(button_frame, text="Update Reservation", command=self.update_reservation, style='Accent.TButton')
+        self.update_btn.pack(side="left", padx=10, ipadx=10, ipady=5)
 
         # Go Back Button
         back_btn = ttk.Button(button_frame, text="↩️ Go Back", command=lambda: controller.show_frame("ReservationsPage"))
@@ -42,15 +54,51 @@ class EditReservationPage(ttk.Frame):
         This method is called when navigating to this page with specific reservation data.
         """
         if data:
-            self.reservation_id = data[0] # Store the ID for updating
-            fields = ["Name", "Flight Number", "Departure", "Destination", "Date (YYYY-MM-DD)", "Seat Number"]
-            
-            # Clear and insert data into entry fields
-            for i, field_name in enumerate(fields):
-                entry_widget = self.entries[field_name]
-                entry_widget.delete(0, tk.END)
-                # Data indices: 0=id, 1=name, 2=flight_number, 3=departure, 4=destination, 5=date, 6=seat_number
-                entry_widget.insert(0, data[i+1]) # +1 because data[0] is ID
+            self.reservation_id = int(data[0]) # Store the ID for updating
+            self.loaded = self.version = None
+            self.field_errors.clear()
+            self._fill_form(data)
+            # The table row may be out of date; re-read it with its version. Saving waits for it.
+            self._set_busy(True, "Loading…")
+            reservation_id = self.reservation_id
+            self.controller.db_worker.submit(
+                get_versioned_reservation, reservation_id, key=("edit", "load"),
+                on_done=lambda result: self._on_loaded(reservation_id, data, result),
+                on_error=lambda error: self._on_load_error(reservation_id, error))
+
+    def _fill_form(self, data):
+        """Shows a reservation tuple in the form fields."""
+        self.original_seat = (data[2].upper(), data[5], data[6].upper())
+        # Data indices: 0=id, 1=name, 2=flight_number, 3=departure, 4=destination, 5=date, 6=seat_number
+        self._show_values(data[1:7])
+
+    def _show_values(self, values):
+        """Puts the six field values, in FIELDS order, into the entry fields."""
+        for field_name, value in zip(FIELDS, values):
+            entry_widget = self.entries[field_name]
+            entry_widget.delete(0, tk.END)
+            entry_widget.insert(0, value)
+
+    def _on_loaded(self, reservation_id, shown, result):
+        """Refreshes the form if the stored reservation differs from the row it was opened from."""
+        if reservation_id != self.reservation_id:
+            return  # Another reservation was opened meanwhile
+        self._set_busy(False)
+        if result is None:
+            dialogs.showwarning("Reservation Not Found", f"Reservation ID {reservation_id} no longer exists.")
+            self.controller.show_frame("ReservationsPage")
+            return
+        current, self.version = result
+        self.loaded = current
+        if tuple(str(value) for value in current[1:]) != tuple(str(value) for value in shown[1:7]):
+            self._fill_form(current)
+
+    def _on_load_error(self, reservation_id, error):
+        if reservation_id != self.reservation_id:
+            return
+        self._set_busy(False)
+        dialogs.showerror(getattr(error, "title", "Error"),
+                          f"Could not reload the reservation; saving will overwrite any changes made meanwhile.\n\n{error}")
 
     def update_reservation(self):
         """
@@ -58,33 +106,116 @@ class EditReservationPage(ttk.Frame):
         to modify the reservation. Provides user feedback.
         """
         if self.reservation_id is None:
-            messagebox.showerror("Error", "No reservation selected for editing.")
+            dialogs.showerror("Error", "No reservation selected for editing.")
+            return
+
+        # Same rules as bulk import, see validation.py
+        if not self.field_errors.check():
             return
+        self._save(self.field_errors.values())
+
+    def _save(self, values):
+        """Saves the six field values, provided nobody has changed the reservation since it was loaded."""
+        name, flight_number, departure, destination, date, seat_number = values
+        # Only a move to a different seat needs checking; the reservation already holds its own
+        check_seat = (flight_number.upper(), date, seat_number.upper()) != self.original_seat
 
-        name = self.entries["Name"].get().strip()
-        flight_number = self.entries["Flight Number"].get().strip()
-        departure = self.entries["Departure"].get().strip()
-        destination = self.entries["Destination"].get().strip()
-        date = self.entries["Date (YYYY-MM-DD)"].get().strip()
-        seat_number = self.entries["Seat Number"].get().strip()
+        # Check the seat and save on the database worker so the window stays responsive
+        self._set_busy(True)
+        reservation_id = self.reservation_id
+        self.controller.db_worker.submit(
+            _save, reservation_id, name, flight_number, departure, destination, date, seat_number, check_seat,
+            self.version,
+            on_done=lambda version: self._on_saved(reservation_id, version),
+            on_error=lambda error: self._on_save_error(error, values))
 
-        # Basic input validation
-        if not all([name, flight_number, departure, destination, date, seat_number]):
-            messagebox.showerror("Input Error", "All fields are required! Please fill out all the information.")
+    def _on_saved(self, reservation_id, version):
+        """Reports a successful update once the database worker is done."""
+        self._set_busy(False)
+        if version is outbox.QUEUED:
+            dialogs.showinfo("Saved for Later", outbox.QUEUED_MESSAGE)
+        else:
+            dialogs.showinfo("Success", f"Reservation ID {reservation_id} updated successfully! ✨")
+        self.controller.show_frame("ReservationsPage") # Go back to reservation list
+
+    def _on_save_error(self, error, values):
+        self._set_busy(False)
+        if isinstance(error, ReservationConflictError):
+            self._resolve_conflict(error, values)
             return
-        
-        # Simple date format validation
-        if not (len(date) == 10 and date[4] == '-' and date[7] == '-'):
-             messagebox.showerror("Input Error", "Please use YYYY-MM-DD format for the date.")
-             return
-
-        # Call database update function
-        if update_reservation(self.reservation_id, name, flight_number, departure, destination, date, seat_number):
-            messagebox.showinfo("Success", f"Reservation ID {self.reservation_id} updated successfully! ✨")
-            self.controller.show_frame("ReservationsPage") # Go back to reservation list
+        if isinstance(error, SeatUnavailableError):
+            self.field_errors.show({"seat_number": f"{error} Please choose another seat."})
+            return
+        if isinstance(error, RouteConflictError):
+            self.field_errors.show({"flight_number": str(error)})
+            return
+        if isinstance(error, InvalidReservationError):
+            dialogs.showerror(error.title, str(error))
+            return
+        dialogs.showerror(getattr(error, "title", "Error"), f"Failed to update reservation. Please try again.\n\n{error}")
+
+    def _resolve_conflict(self, error, mine):
+        """
+        Someone else saved the reservation while it was being edited. Shows what
+        they changed and lets the user save their own changes on top (fields
+        they did not touch keep the other edits), reload the stored reservation,
+        or keep editing. Nothing is locked while the question is open; a save
+        that meets yet another edit asks again.
+        """
+        base = [str(value) for value in self.loaded[1:]]
+        theirs = [str(value) for value in error.current[1:]]
+        changed = [i for i in range(len(FIELDS)) if theirs[i] != base[i]]
+        merged = tuple(theirs[i] if mine[i] == base[i] else mine[i] for i in range(len(FIELDS)))
+        self.loaded, self.version = error.current, error.version
+        self.original_seat = (theirs[1].upper(), theirs[4], theirs[5].upper())
+        if not changed:
+            # Only something the form does not show changed, such as the flight's route
+            self._save(merged)
+            return
+
+        lines = "\n".join(f"{FIELDS[i]}: {base[i]} → {theirs[i]}" for i in changed)
+        message = f"{error}\n\nTheir changes:\n{lines}\n\n"
+        clashes = [FIELDS[i] for i in changed if mine[i] not in (base[i], theirs[i])]
+        if clashes:
+            message += f"You changed {', '.join(clashes)} as well; saving keeps your value.\n\n"
+        message += ("Yes: save your changes on top of theirs\n"
+                    "No: discard your changes and show theirs\n"
+                    "Cancel: keep editing")
+        answer = dialogs.askyesnocancel(error.title, message)
+        if answer is None:
+            return  # The next save is checked against their version
+        if answer:
+            self._show_values(merged)
+            self._save(merged)
         else:
-            messagebox.showerror("Error", "Failed to update reservation. Please try again.")
+            self._fill_form(error.current)
+
+    def _set_busy(self, busy, text="Saving…"):
+        """Disables the update button while the reservation is loading or being saved."""
+        self.update_btn.config(state="disabled" if busy else "normal",
+                               text=text if busy else "Update Reservation")
 
     def on_show_page(self):
         # This page doesn't need to refresh its data automatically, as data is passed via set_data
         pass
+
+
+def _save(reservation_id, name, flight_number, departure, destination, date, seat_number, check_seat, version):
+    """
+    Runs on the database worker. Rejects a move to a taken seat straight from the
+    in-memory seat inventory, otherwise saves the changes if the reservation is
+    still at `version` (or queues the update while another program keeps the
+    database locked; it is then checked against `version` when it is made).
+
+    Returns:
+        int: The reservation's new version, or outbox.QUEUED.
+
+    Raises:
+        SeatUnavailableError: If the new seat is already taken.
+        ReservationConflictError: If someone else changed the reservation since `version`.
+        ReservationNotFoundError: If the reservation was deleted meanwhile.
+    """
+    if check_seat and not inventory.is_available(flight_number, date, seat_number):
+        raise SeatUnavailableError(flight_number, date, seat_number)
+    return outbox.write("update_reservation", reservation_id, name, flight_number, departure, destination, date,
+                        seat_number, version)
@@ -0,0 +1,55 @@
+from tkinter import ttk
+from validation import FIELDS, check_reservation
+
+class FieldErrors:
+    """
+    Shows validation problems next to the fields of a reservation form instead
+    of in a dialog. Nothing is flagged while the form is first filled in; once
+    a save has shown problems, every keystroke checks the form again, so each
+    message goes away as soon as its field is corrected.
+    """
+    def __init__(self, form_frame, entries):
+        """
+        Args:
+            form_frame (ttk.Frame): The form, with its entries gridded in column 1.
+            entries (list): The six Entry widgets, in validation.FIELDS order.
+        """
+        self.entries = dict(zip(FIELDS, entries))
+        self.labels = {}
+        for field, entry in self.entries.items():
+            label = ttk.Label(form_frame, text="", foreground="#b00020", font=("Helvetica", 9), wraplength=220)
+            label.grid(row=entry.grid_info()["row"], column=2, sticky="w", padx=5)
+            self.labels[field] = label
+            entry.bind("<KeyRelease>", self._recheck, add="+")
+
+    def values(self):
+        """The six field values, stripped, in FIELDS order."""
+        return tuple(self.entries[field].get().strip() for field in FIELDS)
+
+    def check(self):
+        """
+        Checks the form and shows every problem next to its field, focusing the
+        first field with one.
+
+        Returns:
+            bool: True if the form is valid.
+        """
+        errors = check_reservation(*self.values())
+        self.show(errors)
+        for field in FIELDS:
+            if field in errors:
+                self.entries[field].focus_set()
+                break
+        return not errors
+
+    def show(self, errors):
+        """Shows the given messages ({field: message}) and clears the other fields' ones."""
+        for field, label in self.labels.items():
+            label.config(text=errors.get(field, ""))
+
+    def clear(self):
+        self.show({})
+
+    def _recheck(self, event=None):
+        if any(label.cget("text") for label in self.labels.values()):
+            self.show(check_reservation(*self.values()))
@@ -25,6 +25,14 @@ class HomePage(ttk.Frame):
         view_btn = ttk.Button(button_frame, text="📄 View All Reservations", command=lambda: controller.show_frame("ReservationsPage"), style='TButton')
         view_btn.pack(pady=15, ipadx=20, ipady=10)
 
+        # Booking Statistics Button
+        stats_btn = ttk.Button(button_frame, text="📊 Booking Statistics", command=lambda: controller.show_frame("DashboardPage"), style='TButton')
+        stats_btn.pack(pady=15, ipadx=20, ipady=10)
+
+        # Backups Button
+        backups_btn = ttk.Button(button_frame, text="🗄️ Backups", command=lambda: controller.show_frame("BackupsPage"), style='TButton')
+        backups_btn.pack(pady=15, ipadx=20, ipady=10)
+
         # Custom button style for accent
         self.controller.style.configure('Accent.TButton', background='#007bbd', foreground='white', font=('Helvetica', 12, 'bold'))
         self.controller.style.map('Accent.TButton', background=[('active', '#00567a')])
@@ -0,0 +1,279 @@
+"""
+Timing spans, counters and slow-statement logging, for finding out where the
+time goes when the app stalls.
+
+Functions wrapped with traced() or trace_functions() record a span (name,
+start, duration, thread) each time they run, and add to a per-name counter.
+While a span is open, every SQL statement its thread runs is noted through
+sqlite3's trace callback; a statement that may have taken longer than
+SLOW_STATEMENT_MS is logged to the "flighty.slow" logger together with its
+EXPLAIN QUERY PLAN. The callback sees statements with their parameters filled
+in, so literal values are put back as ? before a statement is logged or
+explained: passenger names stay out of the log, and each statement is
+explained once rather than once per set of values. The callback only tells when
+a statement starts, so its duration is an upper bound: it runs until the
+thread's next statement, nested span or the end of its span, and includes
+whatever Python did with the rows (or slept, retrying a busy write) meanwhile.
+Spans and slow statements can be exported as a Chrome trace file,
+which chrome://tracing and https://ui.perfetto.dev open as a timeline.
+
+Nothing is recorded until enable() is called, or the app is started with
+FLIGHTY_TRACE=1 in the environment. Until then a traced function costs one
+extra call and a flag check, and no trace callback is installed.
+
+Does not import Tkinter or (at import time) repository, so either can use it.
+"""
+import functools
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque, namedtuple
+from contextlib import contextmanager
+
+TRACE_ENV = "FLIGHTY_TRACE"
+
+# Statements that take longer than this, in milliseconds, are logged with their query plan
+SLOW_STATEMENT_MS = 50
+
+# The newest spans and slow statements kept in memory; older ones are dropped
+MAX_SPANS = 50000
+MAX_SLOW_STATEMENTS = 200
+
+# Query plans remembered, by statement text, so a repeated slow statement is not explained again
+MAX_PLANS = 256
+
+# String, blob and numeric literals in a statement; digits inside names such as t1 are not literals
+_LITERAL = re.compile(r"\b[xX]'[0-9a-fA-F]*'|'(?:[^']|'')*'|(?<![\w.])\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+
+# start is time.perf_counter() seconds and duration is in seconds; depth is 0
+# for a span that is not inside another one on the same thread
+Span = namedtuple("Span", ["name", "start", "duration", "thread", "depth"])
+# Totals per span name, durations in seconds
+Counter = namedtuple("Counter", ["name", "count", "total", "max"])
+# span is the innermost span the statement ran in; start is time.perf_counter()
+# seconds, as for spans; duration is an upper bound, the time until the next
+# statement, nested span or end of the span
+SlowStatement = namedtuple("SlowStatement", ["sql", "start", "duration", "span", "thread", "plan"])
+
+logger = logging.getLogger("flighty.slow")
+
+_enabled = bool(os.environ.get(TRACE_ENV))
+_lock = threading.Lock()
+_spans = deque(maxlen=MAX_SPANS)
+_counters = {}  # name -> [count, total, max]
+_slow_statements = deque(maxlen=MAX_SLOW_STATEMENTS)
+_local = threading.local()  # .stack: open spans on this thread, as [name, start, statements]
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable():
+    """Starts recording spans and watching SQL statements on every pooled connection."""
+    global _enabled
+    _enabled = True
+    _set_trace_callbacks(_on_statement)
+
+
+def disable():
+    """Stops recording; what was recorded so far is kept until reset()."""
+    global _enabled
+    _enabled = False
+    _set_trace_callbacks(None)
+
+
+def reset():
+    """Forgets every recorded span, counter and slow statement."""
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+        _slow_statements.clear()
+
+
+def attach(conn):
+    """Called by repository.get_connection() for each new connection while enabled."""
+    conn.set_trace_callback(_on_statement)
+
+
+def _set_trace_callbacks(callback):
+    import repository  # Imports this module, so it cannot be imported at the top
+
+    with repository._pool_lock:
+        connections = list(repository._pool)
+    for conn in connections:
+        conn.set_trace_callback(callback)
+
+
+@contextmanager
+def span(name):
+    """Records the enclosed block as a span called `name` (if enabled)."""
+    if not _enabled:
+        yield
+        return
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    frame = [name, time.perf_counter(), []]
+    if stack:
+        # The enclosing span's last statement is over by now
+        stack[-1][2].append((None, frame[1]))
+    stack.append(frame)
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        stack.pop()
+        _record(name, frame[1], end, len(stack))
+        if frame[2]:
+            _check_statements(name, frame[2], end)
+
+
+def traced(name):
+    """Decorator that records every call of the function as a span called `name`."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def trace_functions(namespace, prefix, names=None, exclude=()):
+    """
+    Replaces functions in a module namespace (such as globals()) with traced
+    versions named "<prefix>.<function name>". By default every public function
+    defined in that module is wrapped; `names` picks them instead.
+
+    Modules that import a function by name keep whatever was there when they
+    imported it, so call this before they do (at the end of the module).
+    """
+    module = namespace.get("__name__")
+    if names is None:
+        names = [name for name, value in namespace.items()
+                 if callable(value) and not isinstance(value, type) and not name.startswith("_")
+                 and getattr(value, "__module__", None) == module]
+    for name in names:
+        if name not in exclude:
+            namespace[name] = traced(f"{prefix}.{name}")(namespace[name])
+
+
+def _record(name, start, end, depth):
+    duration = end - start
+    with _lock:
+        _spans.append(Span(name, start, duration, threading.get_ident(), depth))
+        counter = _counters.get(name)
+        if counter is None:
+            _counters[name] = [1, duration, duration]
+        else:
+            counter[0] += 1
+            counter[1] += duration
+            if duration > counter[2]:
+                counter[2] = duration
+
+
+def _on_statement(sql):
+    """sqlite3 trace callback: notes when each statement starts, in the innermost open span."""
+    stack = getattr(_local, "stack", None)
+    if not stack or getattr(_local, "explaining", False):
+        return
+    statements = stack[-1][2]
+    # Statements run by triggers are reported as the statement that fired them again
+    if statements and statements[-1][0] == sql:
+        return
+    statements.append((sql, time.perf_counter()))
+
+
+def _check_statements(span_name, statements, end):
+    """
+    Logs the statements of a finished span that may have been slow. A statement
+    is taken to last until the next one or a nested span starts (entries with
+    no SQL), or until the span ends.
+    """
+    for index, (sql, start) in enumerate(statements):
+        finish = statements[index + 1][1] if index + 1 < len(statements) else end
+        duration = finish - start
+        if sql is None or duration * 1e3 < SLOW_STATEMENT_MS:
+            continue
+        sql = _without_literals(sql)
+        plan = _explain(sql)
+        with _lock:
+            _slow_statements.append(SlowStatement(sql, start, duration, span_name, threading.get_ident(), plan))
+        logger.warning("up to %.1f ms in %s: %s\n%s", duration * 1e3, span_name, sql, plan)
+
+
+def _without_literals(sql):
+    """A traced statement with its literal values replaced by ?, as it was written."""
+    return _LITERAL.sub("?", sql)
+
+
+@functools.lru_cache(maxsize=MAX_PLANS)
+def _explain(sql):
+    """Returns the EXPLAIN QUERY PLAN of a statement as indented lines, or why there is none."""
+    if not sql.lstrip().upper().startswith(("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")):
+        return ""
+    import repository
+
+    _local.explaining = True
+    try:
+        # Every ? left is a parameter; the plan does not depend on their values
+        rows = repository.get_connection().execute("EXPLAIN QUERY PLAN " + sql, [None] * sql.count("?")).fetchall()
+    except Exception as e:  # The plan is only a diagnostic aid; never fail the traced call over it
+        plan = f"(no plan: {e})"
+    else:
+        depths = {0: -1}
+        lines = []
+        for node_id, parent, _, detail in rows:
+            depths[node_id] = depths.get(parent, -1) + 1
+            lines.append("  " * depths[node_id] + detail)
+        plan = "\n".join(lines)
+    finally:
+        _local.explaining = False
+    return plan
+
+
+def counters():
+    """Returns a Counter per span name, the most total time first."""
+    with _lock:
+        items = [Counter(name, *values) for name, values in _counters.items()]
+    return sorted(items, key=lambda counter: counter.total, reverse=True)
+
+
+def slow_statements():
+    """Returns the logged slow statements, newest first."""
+    with _lock:
+        return list(reversed(_slow_statements))
+
+
+def spans():
+    """Returns the recorded spans, oldest first."""
+    with _lock:
+        return list(_spans)
+
+
+def export_trace(path):
+    """
+    Writes the recorded spans to `path` in the Chrome trace event format, with
+    each slow statement as an instant event where it started, on its thread.
+
+    Returns:
+        int: The number of spans written.
+    """
+    recorded = spans()
+    pid = os.getpid()
+    events = [{"name": item.name, "ph": "X", "ts": item.start * 1e6, "dur": item.duration * 1e6,
+               "pid": pid, "tid": item.thread} for item in recorded]
+    events.extend({"name": "slow statement", "ph": "i", "s": "t", "ts": item.start * 1e6,
+                   "pid": pid, "tid": item.thread,
+                   "args": {"sql": item.sql, "ms": round(item.duration * 1e3, 3), "span": item.span,
+                            "plan": item.plan}}
+                  for item in slow_statements())
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, handle)
+    return len(recorded)
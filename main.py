@@ -1,12 +1,32 @@
+import os
+import time
 import tkinter as tk
 from tkinter import ttk # Import ttk for themed widgets
+import dialogs
+import backup
+import outbox
 from database import create_table # Ensure database is set up on app start
+from db_worker import DBWorker
 
 # Import all page modules
 from home import HomePage
 from booking import BookingPage
 from reservations import ReservationsPage
 from edit_reservation import EditReservationPage
+from dashboard import DashboardPage
+from diagnostics import DiagnosticsPage
+from backups import BackupsPage
+from instrumentation import traced
+from startup_timing import STARTUP_PROBE_ENV, report_first_paint
+
+# Seconds a database upgrade may take before its progress is shown
+UPGRADE_NOTICE_DELAY = 0.5
+
+# How often (in milliseconds) writes queued while the database was busy are retried
+OUTBOX_DRAIN_INTERVAL_MS = 5000
+
+# How often (in milliseconds) the app checks whether a scheduled snapshot is due
+SNAPSHOT_CHECK_INTERVAL_MS = 60 * 60 * 1000
 
 class FlightApp(tk.Tk):
     def __init__(self, *args, **kwargs):
@@ -32,25 +52,56 @@ class FlightApp(tk.Tk):
         container.grid_rowconfigure(0, weight=1)
         container.grid_columnconfigure(0, weight=1)
 
-        create_table() # Ensure the database table exists when the app starts
+        self.upgrade_started = None
+        self.upgrade_status = None
+        self.protocol("WM_DELETE_WINDOW", lambda: None) # Closing mid-upgrade would only delay it to the next start
+        create_table(progress=self.show_upgrade_progress) # Ensure the database schema exists; cheap once it is up to date
+        if self.upgrade_status is not None:
+            self.upgrade_status.destroy()
+
+        # Database calls from the pages run here, off the Tk main thread
+        self.db_worker = DBWorker()
+        self.db_worker.busy_callback = self.on_db_busy
+        self.db_worker.attach(self)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
 
+        # Writes queued by this or an earlier session are made once the database is free
+        self.outbox_pending = True
+        self.outbox_mtime = None
+        self.drain_outbox()
+
+        # A snapshot is taken now if the newest one is older than backup.SNAPSHOT_INTERVAL
+        self.snapshot_error_shown = False
+        self.take_scheduled_snapshot()
+
+        self.container = container
+        # Pages are built the first time they are shown, so startup only pays for the home page
+        self.page_classes = {F.__name__: F for F in (HomePage, BookingPage, ReservationsPage, EditReservationPage, DashboardPage,
+                                                  BackupsPage, DiagnosticsPage)}
         self.frames = {}
-        # Instantiate each page and store it in the frames dictionary
-        for F in (HomePage, BookingPage, ReservationsPage, EditReservationPage):
-            page_name = F.__name__
-            frame = F(parent=container, controller=self)
+
+        # The diagnostics page has no button; it is opened with Ctrl+Shift+D
+        self.bind_all("<Control-Shift-D>", lambda event: self.show_frame("DiagnosticsPage"))
+
+        self.show_frame("HomePage")
+
+    def get_frame(self, page_name):
+        """Returns the page frame for page_name, building it on first use."""
+        frame = self.frames.get(page_name)
+        if frame is None:
+            frame = self.page_classes[page_name](parent=self.container, controller=self)
             self.frames[page_name] = frame
             # Place all frames on top of each other
             frame.grid(row=0, column=0, sticky="nsew")
+        return frame
 
-        self.show_frame("HomePage")
-
+    @traced("FlightApp.show_frame")
     def show_frame(self, page_name, data=None):
         """
         Raises the requested page frame to the top, making it visible.
         Optionally passes data to the target frame (e.g., for editing a reservation).
         """
-        frame = self.frames[page_name]
+        frame = self.get_frame(page_name)
         if hasattr(frame, 'set_data') and data is not None:
             # If the frame has a set_data method, call it with the provided data
             frame.set_data(data)
@@ -59,6 +110,82 @@ class FlightApp(tk.Tk):
             frame.on_show_page()
         frame.tkraise()
 
+    def show_upgrade_progress(self, report):
+        """
+        Shows how far a database upgrade has got; called by create_table() while
+        one runs. Upgrades that finish within UPGRADE_NOTICE_DELAY never show it.
+        """
+        if self.upgrade_started is None:
+            self.upgrade_started = time.perf_counter()
+        if time.perf_counter() - self.upgrade_started < UPGRADE_NOTICE_DELAY:
+            return
+        if self.upgrade_status is None:
+            self.upgrade_status = ttk.Frame(self)
+            self.upgrade_status.place(relx=0.5, rely=0.5, anchor="center")
+            self.upgrade_label = ttk.Label(self.upgrade_status)
+            self.upgrade_label.pack(pady=10)
+            self.upgrade_bar = ttk.Progressbar(self.upgrade_status, length=400, maximum=1.0)
+            self.upgrade_bar.pack()
+        self.upgrade_label.config(text=f"Upgrading database: {report.description} ({report.step})")
+        self.upgrade_bar["value"] = report.done / report.total if report.total else 1.0
+        self.update() # Nothing else runs the event loop until the upgrade is done
+
+    def drain_outbox(self):
+        """
+        Replays queued writes on the database worker, then checks again after
+        OUTBOX_DRAIN_INTERVAL_MS. Only a queue file that exists and has changed,
+        or still had writes waiting last time, is looked at.
+        """
+        path = outbox.outbox_path()
+        if os.path.exists(path):
+            mtime = os.path.getmtime(path)
+            if self.outbox_pending or mtime != self.outbox_mtime:
+                self.outbox_mtime = mtime
+                # A queue that cannot be read right now is simply tried again next time
+                self.db_worker.submit(outbox.drain, key=("outbox", "drain"),
+                                      on_done=self.on_outbox_drained, on_error=lambda error: None)
+        self.after(OUTBOX_DRAIN_INTERVAL_MS, self.drain_outbox)
+
+    def on_outbox_drained(self, report):
+        """Tells the user about queued writes that could not be made after all."""
+        self.outbox_pending = report.pending > 0
+        if report.rejected:
+            lines = "\n".join(f"• {outbox.describe(entry)}: {entry.error}" for entry in report.rejected)
+            dialogs.showwarning("Queued Changes Not Saved",
+                                f"These changes were saved while the database was busy, "
+                                f"but could not be made afterwards:\n\n{lines}")
+            self.db_worker.submit(outbox.discard, [entry.id for entry in report.rejected],
+                                  on_error=lambda error: None)
+        if report.applied and "ReservationsPage" in self.frames:
+            self.frames["ReservationsPage"].refresh_table()
+
+    def take_scheduled_snapshot(self):
+        """
+        Backs the database up on the database worker if a snapshot is due, then
+        checks again after SNAPSHOT_CHECK_INTERVAL_MS. Writers are not held up
+        while it runs.
+        """
+        self.db_worker.submit(backup.take_snapshot_if_due, key=("backup", "scheduled"),
+                              on_error=self.on_snapshot_failed)
+        self.after(SNAPSHOT_CHECK_INTERVAL_MS, self.take_scheduled_snapshot)
+
+    def on_snapshot_failed(self, error):
+        """Tells the user once per session that scheduled backups are failing."""
+        if not self.snapshot_error_shown:
+            self.snapshot_error_shown = True
+            dialogs.showwarning("Scheduled Backup Failed", f"{error}\n\nThe next try is in an hour.")
+
+    def on_db_busy(self, busy):
+        """Shows a busy cursor while any database call is running in the background."""
+        self.config(cursor="watch" if busy else "")
+
+    def on_close(self):
+        """Stops the database worker before closing the window."""
+        self.db_worker.shutdown()
+        self.destroy()
+
 if __name__ == "__main__":
     app = FlightApp()
+    if os.environ.get(STARTUP_PROBE_ENV): # Set by startup_timing.py to time the launch
+        report_first_paint(app)
     app.mainloop()
@@ -0,0 +1,73 @@
+# -*- mode: python ; coding: utf-8 -*-
+#
+# Release build tuned for launch time: `pyinstaller main_onedir.spec` writes
+# dist/FlightyReserveMate/, a folder to ship as a whole, with the
+# FlightyReserveMate executable inside. Unlike main.spec's single file, nothing
+# is unpacked to a temporary directory on each launch. Compare the two with
+# `python startup_timing.py --compare`.
+import os
+
+# Standard library packages the app never imports (cli.py, api_server.py and
+# benchmark.py are not part of the GUI build). Check `python startup_timing.py
+# --compare` still reaches first paint after adding to this list.
+EXCLUDES = [
+    'asyncio', 'bz2', 'ctypes.test', 'curses', 'decimal', 'distutils', 'doctest', 'email', 'ftplib',
+    'html', 'http', 'idlelib', 'lib2to3', 'lzma', 'multiprocessing', 'pdb', 'pydoc', 'pydoc_data',
+    'ssl', 'tarfile', 'test', 'tkinter.test', 'turtle', 'turtledemo', 'unittest', 'urllib',
+    'xml', 'xmlrpc',
+]
+
+# Tcl/Tk data the app has no use for: Tcl's time zone database (only Tcl's
+# clock command reads it) and Tk's demo scripts and sample images
+UNUSED_DATA = ('_tcl_data/tzdata/', '_tk_data/demos/', '_tk_data/images/')
+
+
+def is_used(entry):
+    return not entry[0].replace(os.sep, '/').startswith(UNUSED_DATA)
+
+
+a = Analysis(
+    ['main.py'],
+    pathex=[],
+    binaries=[],
+    datas=[],
+    hiddenimports=[],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=EXCLUDES,
+    noarchive=False,
+    # Bytecode without asserts or docstrings; nothing in the app reads __doc__
+    optimize=2,
+)
+a.datas = [entry for entry in a.datas if is_used(entry)]
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='FlightyReserveMate',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    # UPX-packed libraries are decompressed on every load, which costs more
+    # launch time than the disk space it saves
+    upx=False,
+    console=False,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+)
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='FlightyReserveMate',
+)
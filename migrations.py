@@ -0,0 +1,695 @@
+"""
+Versioned schema migrations for the reservations database.
+
+PRAGMA user_version holds the version of the last migration applied to a
+database file. repository.create_table() calls migrate() at startup, which
+applies every newer migration in MIGRATIONS, in order. A new database starts at
+version 0 and is brought up to date the same way.
+
+A migration is a list of steps. A plain Step runs in one short transaction. A
+ChunkedStep (a backfill, a table copy or an index build) works through the
+rows CHUNK_SIZE at a time, each chunk in its own transaction that also records
+how far it got. Other connections can read and write between chunks, so even a
+database with millions of rows stays usable while it is upgraded, and an
+upgrade that is interrupted resumes from the last committed chunk on the next
+start. Progress is recorded in the migration_progress table until the
+migration's version is stored in user_version.
+"""
+import sqlite3
+import time
+from collections import namedtuple
+
+from repository import SEAT_INDEX_SQL, MigrationError, RepositoryError, get_connection, transaction
+
+# Rows handled per chunk; each chunk holds the write lock for a few tens of
+# milliseconds.
+CHUNK_SIZE = 5000
+
+# After every chunk or step the migration stays off the write lock for as long
+# as it held it, up to MAX_PAUSE seconds. Writers that were blocked retry from
+# SQLite's busy handler at intervals of up to 100 ms, and without the pause the
+# next chunk would take the lock first every time.
+MAX_PAUSE = 0.1
+
+# One schema version. check(conn), if given, runs before the steps and raises
+# MigrationError if the existing data cannot be migrated; it only reads.
+Migration = namedtuple("Migration", ["version", "description", "check", "steps"])
+
+# apply(conn) runs inside a transaction together with recording that the step is done.
+Step = namedtuple("Step", ["name", "apply"])
+
+# Works through rows in keyset order by an integer position:
+#   start(conn) sets up the step and returns False if there is nothing to do;
+#   count(conn, position) returns how many rows are left after position;
+#   chunk(conn, position, limit) handles up to limit rows after position and
+#       returns (new_position, rows_handled); once there are no rows left it
+#       returns position unchanged;
+#   finish(conn) runs in the transaction of the last chunk.
+# start runs in the same transaction that records position 0, so an
+# interrupted step never sets itself up twice.
+ChunkedStep = namedtuple("ChunkedStep", ["name", "start", "count", "chunk", "finish"])
+
+# Passed to the progress callback of migrate(). done and total count rows for a
+# chunked step and are 0 and 1 (then 1 and 1) for a plain step.
+MigrationProgress = namedtuple("MigrationProgress", ["version", "description", "step", "done", "total"])
+
+# day of a YYYY-MM-DD date, as stored in flights.day
+_DAY_SQL = "CAST(julianday({}) - 2440587.5 AS INTEGER)"
+
+
+def _table_exists(conn, name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+
+def _has_legacy_layout(conn):
+    """Tells whether the reservations table still has the flight details on every row."""
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(reservations)')}
+    return 'flight_number' in columns
+
+
+def _position_sql(version, step):
+    """A scalar subquery for how far a chunked step has got, for use in triggers."""
+    return f"(SELECT position FROM migration_progress WHERE version = {version} AND step = '{step}')"
+
+
+# --- Version 1: the original single reservations table ---
+
+def _create_reservations_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS reservations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            flight_number TEXT NOT NULL,
+            departure TEXT NOT NULL,
+            destination TEXT NOT NULL,
+            date TEXT NOT NULL,
+            seat_number TEXT NOT NULL
+        )
+    ''')
+    # op is 'I' (insert), 'U' (update) or 'D' (delete)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS reservation_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            reservation_id INTEGER NOT NULL,
+            op TEXT NOT NULL
+        )
+    ''')
+
+
+# --- Version 2: flights table, reservations point at their flight ---
+
+def _check_legacy_rows(conn):
+    """
+    Raises:
+        MigrationError: If a date is not a valid YYYY-MM-DD date, or one flight
+                        number flies different routes on the same date.
+    """
+    if not _has_legacy_layout(conn):
+        return
+    # date() passes impossible days such as 2031-02-30 through unchanged, while
+    # julianday() rolls them into the next month, so compare the round trip
+    bad_dates = conn.execute(
+        'SELECT id, date FROM reservations WHERE date(julianday(date)) IS NOT date ORDER BY id LIMIT 5').fetchall()
+    if bad_dates:
+        listed = ", ".join(f"ID {reservation_id} ('{date}')" for reservation_id, date in bad_dates)
+        raise MigrationError(f"Some reservations have dates that are not valid YYYY-MM-DD dates: {listed}. "
+                             "Correct them and start the app again.")
+    conflicts = conn.execute('''
+        SELECT flight_number, date FROM reservations
+        GROUP BY flight_number COLLATE NOCASE, date
+        HAVING COUNT(DISTINCT departure COLLATE NOCASE) > 1 OR COUNT(DISTINCT destination COLLATE NOCASE) > 1
+        LIMIT 5
+    ''').fetchall()
+    if conflicts:
+        listed = ", ".join(f"{flight_number} on {date}" for flight_number, date in conflicts)
+        raise MigrationError(f"Some flights have reservations with different routes on the same date: {listed}. "
+                             "Give each of them a single route and start the app again.")
+
+
+def _start_flights_copy(conn):
+    """
+    Creates the flights table and the new reservations table, under the name
+    reservations_new until the copy is done. Triggers on the old table carry
+    over changes to rows that have already been copied.
+    """
+    # flight_number is NOCASE, so the unique key treats "fr12" and "FR12" as one flight
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS flights (
+            id INTEGER PRIMARY KEY,
+            flight_number TEXT NOT NULL COLLATE NOCASE,
+            day INTEGER NOT NULL,
+            departure TEXT NOT NULL,
+            destination TEXT NOT NULL
+        )
+    ''')
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_flights_number ON flights (flight_number, day)')
+    if not _has_legacy_layout(conn):
+        return False
+    conn.execute('''
+        CREATE TABLE reservations_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            flight_id INTEGER NOT NULL REFERENCES flights (id),
+            seat_number TEXT NOT NULL
+        )
+    ''')
+    # Indexes made now, while the tables are empty, are filled in a chunk at a
+    # time by the copy; built afterwards, each would hold the write lock for as
+    # long as a whole CREATE INDEX takes. The old table's name index goes so
+    # that the new one can take its name; until the swap only name searches by
+    # the previous app version get slower.
+    conn.execute('DROP INDEX IF EXISTS idx_reservations_name')
+    _create_search_indexes(conn, 'reservations_new')
+    # The old seat index has the same key (flight number without case, date
+    # and seat), so the copy cannot clash with this one. Without it there are
+    # double bookings, and create_table() reports them after the upgrade.
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_reservations_seat'").fetchone():
+        conn.execute(f'CREATE UNIQUE INDEX {SEAT_INDEX_SQL.format("reservations_new")}')
+    copied = _position_sql(2, 'copy')
+    day = _DAY_SQL.format('NEW.date')
+    new_flight = f'''
+        INSERT OR IGNORE INTO flights (flight_number, day, departure, destination)
+        VALUES (NEW.flight_number, {day}, NEW.departure, NEW.destination);
+    '''
+    flight_id = f'(SELECT id FROM flights WHERE flight_number = NEW.flight_number AND day = {day})'
+    conn.execute(f'''
+        CREATE TRIGGER migrate_reservations_insert AFTER INSERT ON reservations WHEN NEW.id <= {copied}
+        BEGIN
+            {new_flight}
+            INSERT INTO reservations_new (id, name, flight_id, seat_number)
+            VALUES (NEW.id, NEW.name, {flight_id}, NEW.seat_number);
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER migrate_reservations_update AFTER UPDATE ON reservations WHEN NEW.id <= {copied}
+        BEGIN
+            {new_flight}
+            UPDATE reservations_new SET name = NEW.name, flight_id = {flight_id}, seat_number = NEW.seat_number
+            WHERE id = NEW.id;
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER migrate_reservations_delete AFTER DELETE ON reservations WHEN OLD.id <= {copied}
+        BEGIN
+            DELETE FROM reservations_new WHERE id = OLD.id;
+        END
+    ''')
+    return True
+
+
+def _count_uncopied(conn, position):
+    return conn.execute('SELECT COUNT(*) FROM reservations WHERE id > ?', (position,)).fetchone()[0]
+
+
+def _copy_reservations(conn, position, limit):
+    last = conn.execute('SELECT MAX(id) FROM (SELECT id FROM reservations WHERE id > ? ORDER BY id LIMIT ?)',
+                        (position, limit)).fetchone()[0]
+    if last is None:
+        return position, 0
+    # Rows are taken in ID order, so a flight gets the route of its earliest reservation
+    conn.execute(f'''
+        INSERT OR IGNORE INTO flights (flight_number, day, departure, destination)
+        SELECT flight_number, {_DAY_SQL.format('date')}, departure, destination
+        FROM reservations WHERE id > ? AND id <= ? ORDER BY id
+    ''', (position, last))
+    cursor = conn.execute(f'''
+        INSERT INTO reservations_new (id, name, flight_id, seat_number)
+        SELECT l.id, l.name, f.id, l.seat_number
+        FROM reservations l
+        JOIN flights f ON f.flight_number = l.flight_number AND f.day = {_DAY_SQL.format('l.date')}
+        WHERE l.id > ? AND l.id <= ?
+    ''', (position, last))
+    return last, cursor.rowcount
+
+
+def _swap_reservations(conn):
+    """
+    Puts the copy in place of the old reservations table, which is kept as
+    reservations_old for the next step to empty and drop: dropping a large
+    table in one statement would hold the write lock for as long as it takes
+    to free all of its pages.
+    """
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'reservations'").fetchone()
+    last_id = row[0] if row else 0
+    # Change log, FTS and copy triggers; the change log moves to the new table
+    # in this same transaction, so no change goes unrecorded
+    triggers = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'reservations'").fetchall()
+    for (trigger,) in triggers:
+        conn.execute(f'DROP TRIGGER {trigger}')
+    conn.execute('ALTER TABLE reservations RENAME TO reservations_old')
+    # The FTS index belongs to the old table; a later step builds a new one
+    if _table_exists(conn, 'reservations_fts'):
+        conn.execute('ALTER TABLE reservations_fts RENAME TO reservations_old_fts')
+    conn.execute('ALTER TABLE reservations_new RENAME TO reservations')
+    _create_change_triggers(conn)
+    # Never hand out the IDs of reservations deleted before the migration again
+    conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'reservations'", (last_id,))
+    if last_id and not conn.execute("SELECT 1 FROM sqlite_sequence WHERE name = 'reservations'").fetchone():
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('reservations', ?)", (last_id,))
+
+
+def _start_dropping_old_table(conn):
+    """
+    Drops the old FTS index, which is one statement however large it is, and
+    leaves the old table to be emptied in chunks. Returns False if there is no
+    old table.
+    """
+    conn.execute('DROP TABLE IF EXISTS reservations_old_fts')
+    return _table_exists(conn, 'reservations_old')
+
+
+def _count_old_rows(conn, position):
+    return conn.execute('SELECT COUNT(*) FROM reservations_old WHERE id > ?', (position,)).fetchone()[0]
+
+
+def _delete_old_rows(conn, position, limit):
+    last = conn.execute('SELECT MAX(id) FROM (SELECT id FROM reservations_old WHERE id > ? ORDER BY id LIMIT ?)',
+                        (position, limit)).fetchone()[0]
+    if last is None:
+        return position, 0
+    cursor = conn.execute('DELETE FROM reservations_old WHERE id > ? AND id <= ?', (position, last))
+    return last, cursor.rowcount
+
+
+def _drop_old_table(conn):
+    conn.execute('DROP TABLE reservations_old')
+
+
+def _create_change_triggers(conn):
+    """Creates the triggers that record every reservation change in reservation_changes."""
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS reservations_log_insert AFTER INSERT ON reservations
+        BEGIN
+            INSERT INTO reservation_changes (reservation_id, op) VALUES (NEW.id, 'I');
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS reservations_log_update AFTER UPDATE ON reservations
+        BEGIN
+            INSERT INTO reservation_changes (reservation_id, op) VALUES (NEW.id, 'U');
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS reservations_log_delete AFTER DELETE ON reservations
+        BEGIN
+            INSERT INTO reservation_changes (reservation_id, op) VALUES (OLD.id, 'D');
+        END
+    ''')
+    # A corrected route changes how every reservation on the flight reads
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS flights_log_update AFTER UPDATE ON flights
+        BEGIN
+            INSERT INTO reservation_changes (reservation_id, op)
+            SELECT id, 'U' FROM reservations WHERE flight_id = NEW.id;
+        END
+    ''')
+    conn.execute('''
+        CREATE VIEW IF NOT EXISTS reservation_details AS
+        SELECT r.id, r.name, f.flight_number, f.departure, f.destination,
+               date(f.day * 86400, 'unixepoch') AS date, r.seat_number
+        FROM reservations r JOIN flights f ON f.id = r.flight_id
+    ''')
+
+
+def _create_search_indexes(conn, table='reservations'):
+    """
+    Creates the secondary indexes backing search_reservations(). Text filters
+    are case-insensitive, so the indexes use the same NOCASE collation.
+    """
+    conn.execute(f'CREATE INDEX IF NOT EXISTS idx_reservations_name ON {table} (name COLLATE NOCASE)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_flights_route '
+                 'ON flights (departure COLLATE NOCASE, destination COLLATE NOCASE, day)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_flights_destination ON flights (destination COLLATE NOCASE, day)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_flights_day ON flights (day)')
+
+
+def _create_fts_triggers(conn, indexed=None):
+    """
+    Creates the triggers that keep reservations_fts in sync with reservations.
+    While the index is being built, `indexed` is SQL for the highest ID indexed
+    so far, and only changes to those rows are applied.
+    """
+    new_guard = f'WHEN NEW.id <= {indexed}' if indexed else ''
+    old_guard = f'WHEN OLD.id <= {indexed}' if indexed else ''
+    conn.execute(f'''
+        CREATE TRIGGER reservations_fts_insert AFTER INSERT ON reservations {new_guard}
+        BEGIN
+            INSERT INTO reservations_fts (rowid, name) VALUES (NEW.id, NEW.name);
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER reservations_fts_delete AFTER DELETE ON reservations {old_guard}
+        BEGIN
+            INSERT INTO reservations_fts (reservations_fts, rowid, name) VALUES ('delete', OLD.id, OLD.name);
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER reservations_fts_update AFTER UPDATE OF name ON reservations {old_guard}
+        BEGIN
+            INSERT INTO reservations_fts (reservations_fts, rowid, name) VALUES ('delete', OLD.id, OLD.name);
+            INSERT INTO reservations_fts (rowid, name) VALUES (NEW.id, NEW.name);
+        END
+    ''')
+
+
+def _start_name_index(conn):
+    """
+    Creates the FTS5 trigram table for fuzzy passenger name search. Returns
+    False, leaving fuzzy search on the slower LIKE fallback, if it already
+    exists or this SQLite build lacks FTS5 or the trigram tokenizer.
+    """
+    if _table_exists(conn, 'reservations_fts'):
+        return False
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE reservations_fts
+            USING fts5(name, content='reservations', content_rowid='id', tokenize='trigram')
+        ''')
+    except sqlite3.OperationalError:
+        return False
+    _create_fts_triggers(conn, indexed=_position_sql(2, 'name_index'))
+    return True
+
+
+def _count_unindexed(conn, position):
+    return conn.execute('SELECT COUNT(*) FROM reservations WHERE id > ?', (position,)).fetchone()[0]
+
+
+def _index_names(conn, position, limit):
+    last = conn.execute('SELECT MAX(id) FROM (SELECT id FROM reservations WHERE id > ? ORDER BY id LIMIT ?)',
+                        (position, limit)).fetchone()[0]
+    if last is None:
+        return position, 0
+    cursor = conn.execute('INSERT INTO reservations_fts (rowid, name) SELECT id, name FROM reservations '
+                          'WHERE id > ? AND id <= ?', (position, last))
+    return last, cursor.rowcount
+
+
+def _finish_name_index(conn):
+    for trigger in ('reservations_fts_insert', 'reservations_fts_delete', 'reservations_fts_update'):
+        conn.execute(f'DROP TRIGGER {trigger}')
+    _create_fts_triggers(conn)
+
+
+# --- Version 3: row versions for optimistic concurrency ---
+
+def _add_version_column(conn):
+    """
+    Adds the version that update_reservation() compares and increments. A
+    column with a constant default is added without rewriting any rows.
+    """
+    conn.execute('ALTER TABLE reservations ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+
+
+# --- Version 4: booking counts for the dashboard ---
+
+def _create_booking_count_triggers(conn, counted=None):
+    """
+    Creates the triggers that keep flight_bookings, day_bookings and
+    route_bookings in step with reservations. While the counts are being
+    backfilled, `counted` is SQL for the highest ID counted so far, and only
+    changes to those rows are applied.
+    """
+    new_guard = f'WHEN NEW.id <= {counted}' if counted else ''
+    old_guard = f'WHEN OLD.id <= {counted}' if counted else ''
+    moved = 'OLD.flight_id IS NOT NEW.flight_id' + (f' AND NEW.id <= {counted}' if counted else '')
+    count_new = '''
+        INSERT INTO flight_bookings (flight_id, booked) VALUES (NEW.flight_id, 1)
+        ON CONFLICT (flight_id) DO UPDATE SET booked = booked + 1;
+        INSERT INTO day_bookings (day, booked) SELECT day, 1 FROM flights WHERE id = NEW.flight_id
+        ON CONFLICT (day) DO UPDATE SET booked = booked + 1;
+        INSERT INTO route_bookings (departure, destination, booked)
+        SELECT departure, destination, 1 FROM flights WHERE id = NEW.flight_id
+        ON CONFLICT (departure, destination) DO UPDATE SET booked = booked + 1;
+    '''
+    uncount_old = '''
+        UPDATE flight_bookings SET booked = booked - 1 WHERE flight_id = OLD.flight_id;
+        UPDATE day_bookings SET booked = booked - 1 WHERE day = (SELECT day FROM flights WHERE id = OLD.flight_id);
+        UPDATE route_bookings SET booked = booked - 1
+        WHERE (departure, destination) = (SELECT departure, destination FROM flights WHERE id = OLD.flight_id);
+    '''
+    conn.execute(f'''
+        CREATE TRIGGER reservations_count_insert AFTER INSERT ON reservations {new_guard}
+        BEGIN {count_new} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER reservations_count_delete AFTER DELETE ON reservations {old_guard}
+        BEGIN {uncount_old} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER reservations_count_update AFTER UPDATE OF flight_id ON reservations
+        WHEN {moved}
+        BEGIN {uncount_old} {count_new} END
+    ''')
+
+
+def _start_booking_counts(conn):
+    """
+    Creates the summary tables the dashboard reads, so it never has to count
+    reservations: bookings per flight, per flight date and per route. Rows are
+    kept when their count drops to 0.
+    """
+    conn.execute('''
+        CREATE TABLE flight_bookings (
+            flight_id INTEGER PRIMARY KEY REFERENCES flights (id),
+            booked INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE day_bookings (
+            day INTEGER PRIMARY KEY,
+            booked INTEGER NOT NULL
+        )
+    ''')
+    # One row per route, however its cities are capitalised
+    conn.execute('''
+        CREATE TABLE route_bookings (
+            departure TEXT NOT NULL COLLATE NOCASE,
+            destination TEXT NOT NULL COLLATE NOCASE,
+            booked INTEGER NOT NULL,
+            PRIMARY KEY (departure, destination)
+        )
+    ''')
+    # A corrected route takes the flight's bookings along
+    conn.execute('''
+        CREATE TRIGGER flights_count_route AFTER UPDATE OF departure, destination ON flights
+        BEGIN
+            UPDATE route_bookings SET booked = booked - COALESCE((SELECT booked FROM flight_bookings WHERE flight_id = NEW.id), 0)
+            WHERE departure = OLD.departure AND destination = OLD.destination;
+            INSERT INTO route_bookings (departure, destination, booked)
+            SELECT NEW.departure, NEW.destination, booked FROM flight_bookings WHERE flight_id = NEW.id
+            ON CONFLICT (departure, destination) DO UPDATE SET booked = booked + excluded.booked;
+        END
+    ''')
+    _create_booking_count_triggers(conn, counted=_position_sql(4, 'booking_counts'))
+    return True
+
+
+def _count_uncounted(conn, position):
+    return conn.execute('SELECT COUNT(*) FROM reservations WHERE id > ?', (position,)).fetchone()[0]
+
+
+def _count_bookings(conn, position, limit):
+    last = conn.execute('SELECT MAX(id) FROM (SELECT id FROM reservations WHERE id > ? ORDER BY id LIMIT ?)',
+                        (position, limit)).fetchone()[0]
+    if last is None:
+        return position, 0
+    conn.execute('''
+        INSERT INTO flight_bookings (flight_id, booked)
+        SELECT flight_id, COUNT(*) FROM reservations WHERE id > ? AND id <= ? GROUP BY flight_id
+        ON CONFLICT (flight_id) DO UPDATE SET booked = booked + excluded.booked
+    ''', (position, last))
+    conn.execute('''
+        INSERT INTO day_bookings (day, booked)
+        SELECT f.day, COUNT(*) FROM reservations r JOIN flights f ON f.id = r.flight_id
+        WHERE r.id > ? AND r.id <= ? GROUP BY f.day
+        ON CONFLICT (day) DO UPDATE SET booked = booked + excluded.booked
+    ''', (position, last))
+    conn.execute('''
+        INSERT INTO route_bookings (departure, destination, booked)
+        SELECT f.departure, f.destination, COUNT(*) FROM reservations r JOIN flights f ON f.id = r.flight_id
+        WHERE r.id > ? AND r.id <= ? GROUP BY f.departure, f.destination
+        ON CONFLICT (departure, destination) DO UPDATE SET booked = booked + excluded.booked
+    ''', (position, last))
+    counted = conn.execute('SELECT COUNT(*) FROM reservations WHERE id > ? AND id <= ?', (position, last)).fetchone()[0]
+    return last, counted
+
+
+def _finish_booking_counts(conn):
+    for trigger in ('reservations_count_insert', 'reservations_count_delete', 'reservations_count_update'):
+        conn.execute(f'DROP TRIGGER {trigger}')
+    _create_booking_count_triggers(conn)
+
+
+# --- Version 5: deleted reservations are kept so they can be restored ---
+
+def _create_deleted_table(conn):
+    """
+    Deleted reservations move here, with their flight's details copied in, so
+    they can be restored and no query on reservations ever has to skip them.
+    The seat they held is free again straight away.
+    """
+    conn.execute('''
+        CREATE TABLE deleted_reservations (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            flight_number TEXT NOT NULL,
+            departure TEXT NOT NULL,
+            destination TEXT NOT NULL,
+            day INTEGER NOT NULL,
+            seat_number TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            deleted_at TEXT NOT NULL
+        )
+    ''')
+    # Archiving looks deleted reservations up by flight date
+    conn.execute('CREATE INDEX idx_deleted_reservations_day ON deleted_reservations (day)')
+
+
+MIGRATIONS = [
+    Migration(1, "Create the reservations table", None, [
+        Step("tables", _create_reservations_table),
+    ]),
+    Migration(2, "Move flight details into a flights table", _check_legacy_rows, [
+        ChunkedStep("copy", _start_flights_copy, _count_uncopied, _copy_reservations, _swap_reservations),
+        ChunkedStep("drop_old_table", _start_dropping_old_table, _count_old_rows, _delete_old_rows, _drop_old_table),
+        # These two only do anything if there was nothing to copy
+        Step("change_log", _create_change_triggers),
+        Step("indexes", _create_search_indexes),
+        ChunkedStep("name_index", _start_name_index, _count_unindexed, _index_names, _finish_name_index),
+    ]),
+    Migration(3, "Add a version to every reservation", None, [
+        Step("version_column", _add_version_column),
+    ]),
+    Migration(4, "Count bookings per flight, day and route", None, [
+        ChunkedStep("booking_counts", _start_booking_counts, _count_uncounted, _count_bookings, _finish_booking_counts),
+    ]),
+    Migration(5, "Keep deleted reservations for restoring", None, [
+        Step("deleted_table", _create_deleted_table),
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+
+def schema_version(conn=None):
+    """Returns the version recorded in the database's PRAGMA user_version."""
+    conn = conn or get_connection()
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(progress=None):
+    """
+    Brings the database at repository.DATABASE_NAME up to SCHEMA_VERSION,
+    resuming a migration that was interrupted. Several processes may call this
+    at once; each step is only applied by one of them.
+
+    Args:
+        progress (callable): Called with a MigrationProgress before and after
+                             each step and after every chunk.
+
+    Returns:
+        int: The number of migrations applied.
+
+    Raises:
+        MigrationError: If the data cannot be migrated; steps already applied
+                        are kept, and the migration resumes once it is fixed.
+        RepositoryError: If a step fails for any other reason.
+    """
+    try:
+        conn = get_connection()
+        current = schema_version(conn)
+        pending = [migration for migration in MIGRATIONS if migration.version > current]
+        if not pending:
+            return 0
+        with transaction(immediate=True):
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS migration_progress (
+                    version INTEGER NOT NULL,
+                    step TEXT NOT NULL,
+                    position INTEGER NOT NULL DEFAULT 0,
+                    done INTEGER NOT NULL DEFAULT 0,
+                    finished INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (version, step)
+                )
+            ''')
+        for migration in pending:
+            if migration.check is not None:
+                migration.check(conn)
+            for step in migration.steps:
+                if isinstance(step, ChunkedStep):
+                    _run_chunked_step(conn, migration, step, progress)
+                else:
+                    _run_step(conn, migration, step, progress)
+            with transaction(immediate=True):
+                if schema_version(conn) < migration.version:
+                    conn.execute(f'PRAGMA user_version = {migration.version}')
+                conn.execute('DELETE FROM migration_progress WHERE version = ?', (migration.version,))
+        return len(pending)
+    except sqlite3.Error as e:
+        raise RepositoryError(f"Failed to migrate the database: {e}") from e
+
+
+def _step_state(conn, migration, step):
+    """Returns (position, done, finished) of a step, or None if it has not started."""
+    return conn.execute('SELECT position, done, finished FROM migration_progress WHERE version = ? AND step = ?',
+                        (migration.version, step.name)).fetchone()
+
+
+def _record_step(conn, migration, step, position, done, finished):
+    conn.execute('INSERT OR REPLACE INTO migration_progress (version, step, position, done, finished) '
+                 'VALUES (?, ?, ?, ?, ?)', (migration.version, step.name, position, done, int(finished)))
+
+
+def _report(progress, migration, step, done, total):
+    if progress is not None:
+        progress(MigrationProgress(migration.version, migration.description, step.name, done, total))
+
+
+def _pause(since):
+    """Lets other connections write after holding the write lock since `since`."""
+    time.sleep(min(time.perf_counter() - since, MAX_PAUSE))
+
+
+def _run_step(conn, migration, step, progress):
+    _report(progress, migration, step, 0, 1)
+    start = time.perf_counter()
+    with transaction(immediate=True):
+        state = _step_state(conn, migration, step)
+        if state is None or not state[2]:
+            step.apply(conn)
+            _record_step(conn, migration, step, 0, 0, True)
+    _report(progress, migration, step, 1, 1)
+    _pause(start)
+
+
+def _run_chunked_step(conn, migration, step, progress):
+    with transaction(immediate=True):
+        state = _step_state(conn, migration, step)
+        if state is None:
+            started = step.start(conn)
+            state = (0, 0, not started)
+            _record_step(conn, migration, step, *state)
+    position, done, finished = state
+    total = 0 if finished else done + step.count(conn, position)
+    _report(progress, migration, step, done, total)
+
+    while not finished:
+        start = time.perf_counter()
+        with transaction(immediate=True):
+            # Another process may be running the same migration
+            position, done, finished = _step_state(conn, migration, step)
+            if finished:
+                break
+            last_position = position
+            position, handled = step.chunk(conn, position, CHUNK_SIZE)
+            done += handled
+            if position == last_position:
+                step.finish(conn)
+                finished = True
+            _record_step(conn, migration, step, position, done, finished)
+        # Rows added meanwhile can take the count past the first estimate
+        total = max(total, done)
+        _report(progress, migration, step, done, total)
+        _pause(start)
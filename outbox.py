@@ -0,0 +1,256 @@
+"""
+Durable queue for writes the database refused because it stayed busy.
+
+When another copy of the app or a batch job keeps flights.db locked through
+every retry (see repository._retry_when_busy), write() stores the call in a
+small SQLite file next to the database instead of failing, and drain() replays
+the queued calls in order once the database is free again. The GUI drains the
+queue in the background; `python cli.py outbox` does it from the command line.
+
+Replaying is safe to repeat: a booking that turns out to be stored already (the
+app stopped between writing it and removing it from the queue) counts as
+applied rather than as a double booking. Calls that can no longer be made, such
+as a seat someone else booked meanwhile, are kept with the reason and reported.
+
+Does not import Tkinter, so it works from cli.py and worker processes.
+"""
+import datetime
+import json
+import os
+import sqlite3
+import time
+from collections import namedtuple
+
+import repository
+from repository import (DatabaseBusyError, RepositoryError, ReservationConflictError, ReservationNotFoundError,
+                        SeatUnavailableError)
+
+# The writes that can be queued, by name. Their arguments must be JSON values.
+OPERATIONS = ("add_reservation", "update_reservation", "delete_reservation", "delete_reservations")
+
+# Seconds to wait for another process using the queue file. Every transaction
+# on it is a single short statement, so this only runs out if something is wrong.
+OUTBOX_BUSY_TIMEOUT = 30.0
+
+# Seconds after which an entry claimed by a drain that never finished (its
+# process died) is replayed by the next one
+CLAIM_TIMEOUT = 300
+
+# Returned by write() in place of the call's result when the call was queued
+QUEUED = object()
+
+# What the GUI tells the user about a queued write
+QUEUED_MESSAGE = ("The database is being used by another program right now, so this change was saved "
+                  "on this computer and will be written automatically as soon as the database is free.")
+
+# error is None while the write is waiting, and the reason once it was rejected
+QueuedWrite = namedtuple("QueuedWrite", ["id", "operation", "args", "queued_at", "attempts", "error"])
+# applied: writes made by this drain; rejected: QueuedWrites given up on, by this
+# drain or an earlier one, until they are discard()ed; pending: writes still
+# waiting because the database was busy again
+DrainReport = namedtuple("DrainReport", ["applied", "rejected", "pending"])
+
+
+def outbox_path():
+    """The queue file belonging to repository.DATABASE_NAME, e.g. flights.outbox.db."""
+    return os.path.splitext(repository.DATABASE_NAME)[0] + ".outbox.db"
+
+
+def _connect():
+    conn = sqlite3.connect(outbox_path(), timeout=OUTBOX_BUSY_TIMEOUT, isolation_level=None)
+    conn.execute("PRAGMA synchronous = FULL")  # A queued write must survive a power cut
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            operation TEXT NOT NULL,
+            args TEXT NOT NULL,
+            queued_at TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            claimed_at REAL
+        )
+    ''')
+    return conn
+
+
+def write(operation, *args):
+    """
+    Calls repository.<operation>(*args), queueing the call if the database is busy.
+
+    Args:
+        operation (str): One of OPERATIONS.
+
+    Returns:
+        The call's result, or QUEUED if it was queued to be made later.
+
+    Raises:
+        RepositoryError: Whatever the call raises other than DatabaseBusyError.
+    """
+    try:
+        return getattr(repository, operation)(*args)
+    except DatabaseBusyError:
+        enqueue(operation, *args)
+        return QUEUED
+
+
+def enqueue(operation, *args):
+    """
+    Stores a write to be made by a later drain().
+
+    Returns:
+        int: The queue entry's ID.
+
+    Raises:
+        RepositoryError: If the queue file cannot be written.
+    """
+    if operation not in OPERATIONS:
+        raise ValueError(f"{operation} cannot be queued")
+    try:
+        conn = _connect()
+        try:
+            cursor = conn.execute('INSERT INTO outbox (operation, args, queued_at) VALUES (?, ?, ?)',
+                                  (operation, json.dumps(args),
+                                   datetime.datetime.now().isoformat(timespec="seconds")))
+            return cursor.lastrowid
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        raise RepositoryError(f"Failed to save the write for later: {e}") from e
+
+
+def pending():
+    """Returns the writes waiting to be made, oldest first."""
+    return _entries("error IS NULL")
+
+
+def rejected():
+    """Returns the writes that were given up on, oldest first."""
+    return _entries("error IS NOT NULL")
+
+
+def discard(entry_ids):
+    """Removes queue entries, typically rejected ones the user has seen."""
+    try:
+        conn = _connect()
+        try:
+            conn.executemany('DELETE FROM outbox WHERE id = ?', [(int(entry_id),) for entry_id in entry_ids])
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        raise RepositoryError(f"Failed to update the write queue: {e}") from e
+
+
+def describe(entry):
+    """A one-line description of a queued write for the user."""
+    args = entry.args
+    if entry.operation == "add_reservation":
+        return f"Booking {args[0]} on flight {args[1]} ({args[4]}), seat {args[5]}"
+    if entry.operation == "update_reservation":
+        return f"Changes to reservation ID {args[0]}"
+    if entry.operation == "delete_reservation":
+        return f"Deleting reservation ID {args[0]}"
+    return f"Deleting reservation IDs {', '.join(str(reservation_id) for reservation_id in args[0])}"
+
+
+def _entries(condition):
+    if not os.path.exists(outbox_path()):
+        return []
+    try:
+        conn = _connect()
+        try:
+            rows = conn.execute(f'SELECT id, operation, args, queued_at, attempts, error FROM outbox '
+                                f'WHERE {condition} ORDER BY id').fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        raise RepositoryError(f"Failed to read the write queue: {e}") from e
+    return [QueuedWrite(row[0], row[1], json.loads(row[2]), row[3], row[4], row[5]) for row in rows]
+
+
+def drain():
+    """
+    Makes the queued writes in the order they were queued, stopping at the first
+    one the database is still too busy for. Each entry is claimed before it is
+    replayed, so copies of the app sharing the queue never replay the same one;
+    a claim left by a process that died is taken over after CLAIM_TIMEOUT.
+
+    Returns:
+        DrainReport: What was applied, rejected and is still pending.
+
+    Raises:
+        RepositoryError: If the queue file cannot be read or updated.
+    """
+    applied = 0
+    if not os.path.exists(outbox_path()):
+        return DrainReport(applied, [], 0)
+    try:
+        conn = _connect()
+        try:
+            while True:
+                entry = _claim_next(conn)
+                if entry is None:
+                    break
+                try:
+                    _replay(entry.operation, entry.args)
+                except DatabaseBusyError:
+                    conn.execute('UPDATE outbox SET attempts = attempts + 1, claimed_at = NULL WHERE id = ?',
+                                 (entry.id,))
+                    break
+                except RepositoryError as e:
+                    conn.execute('UPDATE outbox SET attempts = attempts + 1, claimed_at = NULL, error = ? WHERE id = ?',
+                                 (str(e), entry.id))
+                else:
+                    conn.execute('DELETE FROM outbox WHERE id = ?', (entry.id,))
+                    applied += 1
+            remaining = conn.execute('SELECT COUNT(*) FROM outbox WHERE error IS NULL').fetchone()[0]
+            # Writes rejected by earlier drains whose report nobody saw are reported again
+            rejected_writes = [QueuedWrite(row[0], row[1], json.loads(row[2]), row[3], row[4], row[5])
+                               for row in conn.execute('SELECT id, operation, args, queued_at, attempts, error '
+                                                       'FROM outbox WHERE error IS NOT NULL ORDER BY id')]
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        raise RepositoryError(f"Failed to update the write queue: {e}") from e
+    return DrainReport(applied, rejected_writes, remaining)
+
+
+def _claim_next(conn):
+    """Marks the oldest unclaimed waiting entry as being replayed by us and returns it, or None."""
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute('SELECT id, operation, args, queued_at, attempts FROM outbox '
+                           'WHERE error IS NULL AND (claimed_at IS NULL OR claimed_at < ?) '
+                           'ORDER BY id LIMIT 1', (now - CLAIM_TIMEOUT,)).fetchone()
+        if row is not None:
+            conn.execute('UPDATE outbox SET claimed_at = ? WHERE id = ?', (now, row[0]))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    if row is None:
+        return None
+    return QueuedWrite(row[0], row[1], json.loads(row[2]), row[3], row[4], None)
+
+
+def _replay(operation, args):
+    """Makes one queued write, treating one that is already stored as done."""
+    try:
+        getattr(repository, operation)(*args)
+    except SeatUnavailableError:
+        if operation != "add_reservation" or not _is_booked(*args):
+            raise
+    except ReservationNotFoundError:
+        if operation != "delete_reservation":
+            raise
+    except ReservationConflictError as e:
+        # Our own update, applied before the app stopped, also moved the version on
+        if [str(value) for value in e.current[1:]] != [str(value) for value in args[1:7]]:
+            raise
+
+
+def _is_booked(name, flight_number, departure, destination, date, seat_number):
+    """True if the seat is booked on that flight under this passenger's name."""
+    matches = repository.search_reservations(name=name, flight_number=flight_number,
+                                             date_from=date, date_to=date)
+    return any(res.name == name and res.seat_number.upper() == seat_number.upper() for res in matches)
@@ -0,0 +1,1416 @@
+"""
+Pure-Python data access for reservations.
+
+Nothing here imports Tkinter or talks to the user: failures are raised as
+RepositoryError subclasses and it is up to the caller (db_worker.py and the
+pages for the GUI, cli.py for the command line) to report them. Importing this
+module does not touch the database file; call create_table() once before first
+use.
+
+Every function below raises RepositoryError (or one of the more specific
+subclasses documented on it) when the underlying SQLite call fails. Writes wait
+for other connections and processes to release the database, retry with
+backoff, and raise DatabaseBusyError if it is still locked after that.
+"""
+import atexit
+import datetime
+import functools
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+import instrumentation
+from cache import OPEN_END, ReservationCache
+
+DATABASE_NAME = "flights.db"
+
+# Pragmas applied once to every pooled connection.
+# WAL lets readers keep going while a writer commits, and synchronous=NORMAL is
+# still crash-safe in WAL mode while avoiding an fsync on every commit.
+CONNECTION_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -16000),      # negative means KiB, so ~16 MB of page cache
+    ("mmap_size", 268435456),    # map up to 256 MB of the file into memory
+    ("temp_store", "MEMORY"),
+    ("foreign_keys", "ON"),      # reservations.flight_id must name an existing flight
+)
+
+# Seconds a statement waits for another connection (or another copy of the app)
+# to release its lock before giving up with "database is locked".
+BUSY_TIMEOUT = 5.0
+
+# Writes that still find the database locked are tried again this many times,
+# after RETRY_DELAY seconds, doubling up to MAX_RETRY_DELAY, each wait randomised
+# so competing processes do not retry in lockstep. A retry only waits
+# RETRY_BUSY_TIMEOUT for the lock, so a write gives up with DatabaseBusyError
+# after at most BUSY_TIMEOUT + WRITE_RETRIES * RETRY_BUSY_TIMEOUT plus the
+# pauses (0.35 s at most): about 6.1 s, rather than BUSY_TIMEOUT per attempt.
+WRITE_RETRIES = 3
+RETRY_DELAY = 0.05
+MAX_RETRY_DELAY = 1.0
+RETRY_BUSY_TIMEOUT = 0.25
+
+# Number of prepared statements sqlite3 keeps compiled per connection.
+# Statements are looked up by their SQL text, so every query below uses a fixed
+# string with ? placeholders and is only compiled once per connection.
+STATEMENT_CACHE_SIZE = 128
+
+# Batch writes are applied in chunks of this many rows inside one transaction,
+# which keeps each executemany() call and the IN (...) lookups well below
+# SQLite's bound-parameter limit.
+BATCH_CHUNK_SIZE = 500
+
+# Outcome of one row in a batch call, reported in the same order as the input.
+# reservation_id is the new ID for inserts and the targeted ID otherwise;
+# error holds a human-readable reason when ok is False.
+BatchResult = namedtuple("BatchResult", ["ok", "reservation_id", "error"])
+
+# One reservation as returned by every query, with its flight's details joined
+# in and the date as YYYY-MM-DD text. Being a tuple, it still unpacks and
+# indexes in this column order.
+Reservation = namedtuple("Reservation", ["id", "name", "flight_number", "departure", "destination", "date", "seat_number"])
+
+# Columns and joins that build a Reservation; flights.day is turned back into
+# a date string by _reservation() and _reservations()
+_RESERVATION_COLUMNS = 'r.id, r.name, f.flight_number, f.departure, f.destination, f.day, r.seat_number'
+_RESERVATION_SOURCE = 'reservations r JOIN flights f ON f.id = r.flight_id'
+
+# Flight dates are stored as whole days since 1970-01-01
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+# Triggers record every insert, update and delete of a reservation in the
+# reservation_changes log so views can refresh incrementally. Only the newest
+# CHANGE_LOG_RETENTION entries are kept; readers that fall further behind simply
+# reload everything.
+CHANGE_LOG_RETENTION = 10000
+
+# The unique index that rules out double-booked seats, formatted with the table
+# name. Databases upgraded before it got its own name have it as
+# idx_reservations_seat, the name the single-table layout used for its own.
+SEAT_INDEX_SQL = 'idx_reservations_flight_seat ON {} (flight_id, seat_number COLLATE NOCASE)'
+
+# A reservation in deleted_reservations, with when it was deleted (ISO 8601 text)
+DeletedReservation = namedtuple("DeletedReservation", ["reservation", "deleted_at"])
+
+# Copies a reservation into deleted_reservations just before it is deleted, so it can be restored
+_KEEP_DELETED_SQL = ('INSERT OR REPLACE INTO deleted_reservations '
+                     '(id, name, flight_number, departure, destination, day, seat_number, version, deleted_at) '
+                     'SELECT r.id, r.name, f.flight_number, f.departure, f.destination, f.day, r.seat_number, '
+                     'r.version, ? FROM reservations r JOIN flights f ON f.id = r.flight_id WHERE r.id = ?')
+
+# Reservations of past flights are moved out of the live tables into this
+# database (see archive.py), attached to a connection under ARCHIVE_SCHEMA
+# when a search asks for archived reservations too.
+ARCHIVE_SCHEMA = "archive"
+
+# Flights carry no aircraft details, so load factors assume every flight has
+# this many seats.
+FLIGHT_CAPACITY = 180
+
+# What the dashboard shows, from the booking counts kept by triggers (see
+# migrations.py) rather than by counting reservations:
+#   total_booked / upcoming_booked: reservations overall / from date_from on;
+#   days: DayBookings for the flight dates from date_from on;
+#   routes: RouteBookings, busiest first;
+#   flights: FlightLoad for the flights from date_from on, in date order.
+Dashboard = namedtuple("Dashboard", ["total_booked", "upcoming_booked", "days", "routes", "flights"])
+DayBookings = namedtuple("DayBookings", ["date", "booked"])
+RouteBookings = namedtuple("RouteBookings", ["departure", "destination", "booked"])
+FlightLoad = namedtuple("FlightLoad", ["flight_number", "date", "departure", "destination", "booked", "load_factor"])
+
+# Set by create_table() once the FTS5 trigram index over passenger names exists.
+# Without it (SQLite built without FTS5), fuzzy name search falls back to LIKE.
+_fts_available = False
+
+# Rows and result pages served without touching the database. Writes made here
+# invalidate it directly; writes by other connections or processes are picked up
+# from the change log before each cached read. More pending changes than this
+# clear the whole cache instead.
+reservation_cache = ReservationCache()
+CACHE_SYNC_LIMIT = 1000
+_cache_sync_lock = threading.Lock()
+
+_local = threading.local()
+_pool_lock = threading.Lock()
+_pool = []  # Every connection handed out, so close_connections() can reach them all
+
+
+class RepositoryError(Exception):
+    """
+    A repository call failed. The message is meant for the user; `title` is a
+    short heading for it, used as the dialog title by the GUI.
+    """
+    title = "Database Error"
+
+
+class SeatUnavailableError(RepositoryError):
+    """The seat is already booked on that flight and date."""
+    title = "Seat Unavailable"
+
+    def __init__(self, flight_number, date, seat_number):
+        super().__init__(f"Seat {seat_number} on flight {flight_number} ({date}) is already booked.")
+        self.flight_number = flight_number
+        self.date = date
+        self.seat_number = seat_number
+
+
+class ReservationNotFoundError(RepositoryError):
+    """No reservation has the given ID (it may have been deleted meanwhile)."""
+    title = "Reservation Not Found"
+
+    def __init__(self, reservation_id):
+        super().__init__(f"Reservation ID {reservation_id} does not exist.")
+        self.reservation_id = reservation_id
+
+
+class InvalidReservationError(RepositoryError):
+    """A reservation field cannot be stored as given, such as a date that does not exist."""
+    title = "Input Error"
+
+
+class RouteConflictError(RepositoryError):
+    """The flight already flies a different route on that date."""
+    title = "Route Conflict"
+
+    def __init__(self, flight_number, date, departure, destination):
+        super().__init__(f"Flight {flight_number} on {date} already flies {departure} → {destination}.")
+        self.flight_number = flight_number
+        self.date = date
+        self.departure = departure
+        self.destination = destination
+
+
+class ReservationConflictError(RepositoryError):
+    """
+    The reservation was changed by someone else since the version the caller
+    read. `current` is the reservation as now stored and `version` its version.
+    """
+    title = "Reservation Changed"
+
+    def __init__(self, reservation_id, current, version):
+        super().__init__(f"Reservation ID {reservation_id} was changed by someone else since it was opened.")
+        self.reservation_id = reservation_id
+        self.current = current
+        self.version = version
+
+
+class DatabaseBusyError(RepositoryError):
+    """
+    Another connection kept the database locked through every retry of a write.
+    Nothing was written; the same call can be made again later (see outbox.py).
+    """
+    title = "Database Busy"
+
+
+class MigrationError(RepositoryError):
+    """Existing data cannot be migrated to the current schema until it is corrected."""
+    title = "Migration Failed"
+
+
+class BackupError(RepositoryError):
+    """A backup could not be made or restored; the live database is unchanged."""
+    title = "Backup Failed"
+
+
+class DuplicateSeatsError(RepositoryError):
+    """
+    Raised by create_table() when existing reservations book the same seat twice,
+    so the unique seat index could not be created. The rest of the schema is ready.
+    """
+    title = "Double Bookings Found"
+
+
+def get_connection():
+    """
+    Returns the calling thread's long-lived connection to DATABASE_NAME,
+    opening and tuning it on first use.
+
+    Connections are kept per thread (sqlite3 connections should not be shared
+    between threads) and reused for every call, so the cost of opening the file,
+    applying pragmas and compiling statements is paid only once.
+
+    Returns:
+        sqlite3.Connection: A connection in autocommit mode; use transaction()
+                            to group statements.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        if _local.database == DATABASE_NAME:
+            return conn
+        # DATABASE_NAME was pointed somewhere else; drop the stale connection
+        _discard_connection(conn)
+
+    conn = sqlite3.connect(
+        DATABASE_NAME,
+        timeout=BUSY_TIMEOUT,
+        isolation_level=None,  # We manage transactions explicitly
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=False,  # Only so close_connections() can close it at exit
+    )
+    for name, value in CONNECTION_PRAGMAS:
+        conn.execute(f"PRAGMA {name} = {value}")
+
+    if instrumentation.is_enabled():
+        instrumentation.attach(conn)
+
+    _local.conn = conn
+    _local.database = DATABASE_NAME
+    with _pool_lock:
+        _pool.append(conn)
+    return conn
+
+
+def _discard_connection(conn):
+    """Closes a pooled connection and forgets about it."""
+    with _pool_lock:
+        if conn in _pool:
+            _pool.remove(conn)
+    conn.close()
+    if getattr(_local, "conn", None) is conn:
+        _local.conn = None
+        _local.database = None
+
+
+def close_connections():
+    """
+    Closes every pooled connection, in all threads.
+    Registered to run at interpreter exit so the WAL is checkpointed cleanly.
+    """
+    with _pool_lock:
+        connections = list(_pool)
+        _pool.clear()
+    for conn in connections:
+        try:
+            # Refresh planner statistics for the search indexes where SQLite thinks it is worthwhile
+            conn.execute("PRAGMA optimize")
+            conn.close()
+        except sqlite3.Error:
+            pass
+    _local.conn = None
+    _local.database = None
+
+
+atexit.register(close_connections)
+
+
+@contextmanager
+def transaction(immediate=False):
+    """
+    Runs the enclosed statements in a single transaction on the pooled connection.
+    Commits on success and rolls back if an exception escapes. Nested use
+    becomes a savepoint, so an inner failure only undoes the inner work.
+
+    Args:
+        immediate (bool): Take the write lock up front (BEGIN IMMEDIATE) instead of
+                          on the first write, which avoids lock upgrade failures.
+
+    Yields:
+        sqlite3.Connection: The connection to run statements on.
+    """
+    conn = get_connection()
+    if conn.in_transaction:
+        conn.execute("SAVEPOINT nested")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK TO nested")
+            conn.execute("RELEASE nested")
+            raise
+        else:
+            conn.execute("RELEASE nested")
+        return
+
+    conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        # A failed COMMIT (such as a busy database) leaves the transaction open
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+
+
+@contextmanager
+def read_snapshot():
+    """
+    Makes every read in the enclosed block, on this thread, see the database as
+    it was when the block started, however long the block runs. In WAL mode
+    other connections keep writing meanwhile; their changes are simply not seen.
+    The reservation cache is bypassed, as it always is inside a transaction.
+
+    Yields:
+        sqlite3.Connection: The connection the snapshot is held on.
+    """
+    with transaction() as conn:
+        # BEGIN alone takes no snapshot; the first read does
+        conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone()
+        yield conn
+
+
+def _is_busy(error):
+    """True if a sqlite3 error means another connection holds a lock we need."""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    code = getattr(error, "sqlite_errorcode", None)  # Python 3.11+
+    if code is not None:
+        return code & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    return "locked" in str(error) or "busy" in str(error)
+
+
+def _retry_when_busy(func):
+    """
+    Makes a write try again, with exponential backoff, while the database is
+    locked by someone else, and raise DatabaseBusyError once WRITE_RETRIES
+    retries have failed too. A failed attempt has been rolled back, so trying
+    again cannot write twice. Inside a caller's transaction nothing is retried,
+    as the caller's earlier statements were rolled back with it.
+
+    Retries wait RETRY_BUSY_TIMEOUT rather than BUSY_TIMEOUT for the lock, which
+    bounds the whole call to about 6 s (see WRITE_RETRIES).
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        delay = RETRY_DELAY
+        conn = None
+        try:
+            for attempt in range(WRITE_RETRIES + 1):
+                try:
+                    return func(*args, **kwargs)
+                except RepositoryError as e:
+                    if not _is_busy(e.__cause__):
+                        raise
+                    if attempt == WRITE_RETRIES or get_connection().in_transaction:
+                        raise DatabaseBusyError(
+                            "The database is in use by another program and could not be written to. "
+                            "Please try again in a moment.") from e
+                time.sleep(random.uniform(0, delay))
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+                conn = get_connection()
+                conn.execute(f"PRAGMA busy_timeout = {int(min(RETRY_BUSY_TIMEOUT, BUSY_TIMEOUT) * 1000)}")
+        finally:
+            if conn is not None:
+                conn.execute(f"PRAGMA busy_timeout = {int(BUSY_TIMEOUT * 1000)}")
+    return wrapper
+
+
+def create_table(progress=None):
+    """
+    Creates the database schema if it doesn't already exist, or upgrades it by
+    applying any pending migrations from migrations.py.
+    This ensures the database structure is ready on application startup.
+
+    Each flight number's route on a given date is stored once, in the flights
+    table, and reservations point at their flight by ID. Dates are stored as
+    whole days since 1970-01-01. The reservation_details view joins the two
+    back into the original columns for ad-hoc SQL. Every reservation change is
+    recorded in the reservation_changes log, which is pruned here down to
+    CHANGE_LOG_RETENTION entries.
+
+    An up-to-date database only costs a pragma read and the log pruning, so this
+    is cheap to call on every startup.
+
+    Args:
+        progress (callable): Passed on to migrations.migrate() to report the
+                             progress of a long upgrade.
+
+    Raises:
+        MigrationError: If existing reservations cannot be migrated.
+        DuplicateSeatsError: If seats are already double-booked, so new bookings
+                             cannot be checked for conflicts until they are fixed.
+        RepositoryError: If the schema could not be created.
+    """
+    global _fts_available
+    import migrations  # Imports this module, so it cannot be imported at the top
+
+    migrations.migrate(progress)
+    try:
+        with transaction() as conn:
+            _prune_change_log(conn)
+        _fts_available = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reservations_fts'").fetchone() is not None
+        seat_index = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND tbl_name = 'reservations' "
+            "AND name IN ('idx_reservations_seat', 'idx_reservations_flight_seat')").fetchone()
+    except sqlite3.Error as e:
+        raise RepositoryError(f"Failed to open database: {e}") from e
+    if seat_index is None:
+        # Retried on every start until the double bookings are fixed
+        seat_index_error = _create_seat_index()
+        if seat_index_error:
+            raise seat_index_error
+
+def _prune_change_log(conn):
+    """Drops all but the newest CHANGE_LOG_RETENTION entries of the change log."""
+    conn.execute('DELETE FROM reservation_changes WHERE seq <= (SELECT MAX(seq) FROM reservation_changes) - ?',
+                 (CHANGE_LOG_RETENTION,))
+
+def _create_seat_index():
+    """
+    Creates the unique (flight, seat_number) index that makes a double-booked
+    seat impossible, whichever process or thread writes it. It also serves
+    lookups of the reservations on a flight.
+
+    Returns:
+        RepositoryError: The problem to raise once the rest of the schema is
+                         ready, or None if the index exists.
+    """
+    try:
+        with transaction() as conn:
+            conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS {SEAT_INDEX_SQL.format("reservations")}')
+    except sqlite3.IntegrityError:
+        return DuplicateSeatsError(
+            "Some seats are already booked more than once. Seat conflicts will only be "
+            "enforced for new bookings once those reservations are corrected.")
+    except sqlite3.Error as e:
+        return RepositoryError(f"Failed to create seat index: {e}")
+    return None
+
+def _is_seat_conflict(error):
+    """Tells whether an IntegrityError came from the unique seat index."""
+    return isinstance(error, sqlite3.IntegrityError) and "seat_number" in str(error)
+
+def nocase(text):
+    """Folds text the way SQLite's NOCASE collation does: ASCII letters only."""
+    return "".join(c.lower() if "A" <= c <= "Z" else c for c in text)
+
+def parse_day(date):
+    """
+    Converts a YYYY-MM-DD date to the day number stored in flights.day.
+
+    Raises:
+        InvalidReservationError: If date is not an existing date in that exact format.
+    """
+    try:
+        parsed = datetime.date.fromisoformat(date)
+    except (TypeError, ValueError):
+        parsed = None
+    if parsed is None or parsed.isoformat() != date:
+        raise InvalidReservationError(f"'{date}' is not a valid date. Please use YYYY-MM-DD format for the date.")
+    return parsed.toordinal() - EPOCH_ORDINAL
+
+@functools.lru_cache(maxsize=4096)
+def _from_day(day):
+    """Converts a stored day number back to YYYY-MM-DD text."""
+    return datetime.date.fromordinal(day + EPOCH_ORDINAL).isoformat()
+
+def _reservation(row):
+    """Builds a Reservation from a row selected with _RESERVATION_COLUMNS."""
+    return Reservation(row[0], row[1], row[2], row[3], row[4], _from_day(row[5]), row[6])
+
+def _reservations(cursor):
+    """Builds a list of Reservations from rows selected with _RESERVATION_COLUMNS."""
+    # tuple.__new__ skips the namedtuple's Python-level __new__, a quarter of the cost per row
+    new = tuple.__new__
+    return [new(Reservation, (reservation_id, name, flight_number, departure, destination, _from_day(day), seat))
+            for reservation_id, name, flight_number, departure, destination, day, seat in cursor]
+
+def _flight_id(conn, flight_number, day, departure, destination, reservation_id=None, claimed=()):
+    """
+    Returns the ID of the flight a reservation is booked on, creating the flight
+    on its first booking.
+
+    A flight flies one route, so a different departure or destination is refused
+    while other reservations are on the flight. If there are none, apart from
+    reservation_id itself, the flight's route is corrected instead.
+
+    Args:
+        reservation_id (int): The reservation being updated, if any.
+        claimed (set): Flights already given to other rows of the same batch,
+                       which count as having reservations.
+
+    Raises:
+        RouteConflictError: If the flight already flies a different route.
+    """
+    row = conn.execute('SELECT id, departure, destination FROM flights WHERE flight_number = ? AND day = ?',
+                       (flight_number, day)).fetchone()
+    if row is None:
+        return conn.execute('INSERT INTO flights (flight_number, day, departure, destination) VALUES (?, ?, ?, ?)',
+                            (flight_number, day, departure, destination)).lastrowid
+    flight_id, current_departure, current_destination = row
+    if nocase(current_departure) == nocase(departure) and nocase(current_destination) == nocase(destination):
+        return flight_id
+    if flight_id in claimed or conn.execute('SELECT 1 FROM reservations WHERE flight_id = ? AND id IS NOT ? LIMIT 1',
+                                            (flight_id, reservation_id)).fetchone():
+        raise RouteConflictError(flight_number, _from_day(day), current_departure, current_destination)
+    conn.execute('UPDATE flights SET departure = ?, destination = ? WHERE id = ?', (departure, destination, flight_id))
+    return flight_id
+
+@_retry_when_busy
+def add_reservation(name, flight_number, departure, destination, date, seat_number):
+    """
+    Inserts a new reservation record into the database.
+
+    Args:
+        name (str): Passenger's name.
+        flight_number (str): Flight number.
+        departure (str): Departure location.
+        destination (str): Destination location.
+        date (str): Date of the flight.
+        seat_number (str): Seat number.
+
+    Returns:
+        int: The ID of the new reservation.
+
+    Raises:
+        SeatUnavailableError: If the seat is already booked on that flight.
+        RouteConflictError: If the flight already flies a different route that day.
+        InvalidReservationError: If the date is not a valid YYYY-MM-DD date.
+    """
+    day = parse_day(date)
+    try:
+        with transaction(immediate=True) as conn:
+            flight_id = _flight_id(conn, flight_number, day, departure, destination)
+            cursor = conn.execute('INSERT INTO reservations (name, flight_id, seat_number) VALUES (?, ?, ?)',
+                                  (name, flight_id, seat_number))
+        reservation_cache.invalidate([cursor.lastrowid])
+        return cursor.lastrowid
+    except sqlite3.Error as e:
+        if _is_seat_conflict(e):
+            raise SeatUnavailableError(flight_number, date, seat_number) from e
+        raise RepositoryError(f"Failed to add reservation: {e}") from e
+
+def get_all_reservations():
+    """
+    Retrieves all reservation records from the database.
+
+    Returns:
+        list: A list of Reservation records.
+    """
+    try:
+        cursor = get_connection().execute(f'SELECT {_RESERVATION_COLUMNS} FROM {_RESERVATION_SOURCE}')
+        return _reservations(cursor)
+    except sqlite3.Error as e:
+        raise RepositoryError(f"Failed to retrieve reservations: {e}") from e
+
+def get_reservations_page(after_id=0, limit=200, before_id=None):
+    """
+    Retrieves one page of reservations ordered by ID using keyset pagination.
+
+    Seeking on the primary key means every page costs the same no matter how deep
+    into the table it is, unlike LIMIT/OFFSET which rescans all skipped rows.
+
+    Args:
+        after_id (int): Return reservations with an ID greater than this.
+        limit (int): Maximum number of reservations to return.
+        before_id (int): If given, return the page immediately before this ID
+                         instead (after_id is ignored). Rows are still in
+                         ascending ID order.
+
+    Returns:
+        list: A list of Reservation records.
+    """
+    try:
+        conn = get_connection()
+        cache_key = ('page', after_id, before_id, limit)
+        version = _cache_version(conn)
+        if version is not None:
+            rows = reservation_cache.get_page(cache_key)
+            if rows is not None:
+                return rows
+        if before_id is not None:
+            cursor = conn.execute(f'SELECT {_RESERVATION_COLUMNS} FROM {_RESERVATION_SOURCE} '
+                                  'WHERE r.id < ? ORDER BY r.id DESC LIMIT ?', (before_id, limit))
+            rows = _reservations(cursor)
+            rows.reverse()
+        else:
+            cursor = conn.execute(f'SELECT {_RESERVATION_COLUMNS} FROM {_RESERVATION_SOURCE} '
+                                  'WHERE r.id > ? ORDER BY r.id LIMIT ?', (after_id, limit))
+            rows = _reservations(cursor)
+        _cache_page(cache_key, rows, after_id, before_id, limit, version)
+        return rows
+    except sqlite3.Error as e:
+        raise RepositoryError(f"Failed to retrieve reservations: {e}") from e
+
+def _prefix_range(prefix):
+    """
+    Returns (low, high) bounds such that, under NOCASE collation, every string
+    starting with prefix sorts in [low, high). NOCASE only folds ASCII letters,
+    so the prefix is folded the same way before bumping its last character.
+    """
+    low = nocase(prefix)
+    if ord(low[-1]) == 0x10FFFF:
+        return low, low + "\U0010FFFF"
+    return low, low[:-1] + chr(ord(low[-1]) + 1)
+
+def _like_pattern(word):
+    """A LIKE pattern (with ESCAPE '\\') matching `word` anywhere in the text."""
+    return "%" + word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+def search_reservations(name=None, flight_number=None, departure=None, destination=None,
+                        date_from=None, date_to=None, fuzzy_name=None, reservation_ids=None,
+                        after_id=0, limit=200, before_id=None, include_archived=False):
+    """
+    Retrieves one page of reservations matching every given filter, ordered by ID.
+    Filters left as None (or empty) are ignored. Text filters are case-insensitive
+    and each one is served by a secondary index on reservations or flights.
+
+    Args:
+        name (str): Passenger name prefix.
+        flight_number (str): Exact flight number.
+        departure (str): Exact departure location.
+        destination (str): Exact destination location.
+        date_from (str): Earliest flight date (YYYY-MM-DD), inclusive.
+        date_to (str): Latest flight date (YYYY-MM-DD), inclusive.
+        fuzzy_name (str): Words that must all appear anywhere in the passenger name,
+                          matched through the FTS5 trigram index.
+        reservation_ids (iterable): Only consider these reservation IDs.
+        after_id (int): Keyset cursor; return reservations with a greater ID.
+        limit (int): Maximum number of reservations to return.
+        before_id (int): If given, return the page immediately before this ID instead.
+        include_archived (bool): Also search the reservations of past flights that
+                                 were moved to the archive (see archive.py), which
+                                 are otherwise left out. Deleted ones never match.
+
+    Returns:
+        list: A list of Reservation records.
+
+    Raises:
+        InvalidReservationError: If date_from or date_to is not a valid YYYY-MM-DD date.
+    """
+    cache_key = None
+    if reservation_ids is None and not include_archived:
+        cache_key = ('search', name, flight_number, departure, destination, date_from, date_to, fuzzy_name,
+                     after_id, before_id, limit)
+    clauses = []
+    params = []
+    source = 'reservations r'
+    key = 'r.id'
+    if name:
+        clauses.append('r.name >= ? COLLATE NOCASE AND r.name < ? COLLATE NOCASE')
+        params += list(_prefix_range(name))
+    if flight_number:
+        clauses.append('f.flight_number = ? COLLATE NOCASE')
+        params.append(flight_number)
+    if departure:
+        clauses.append('f.departure = ? COLLATE NOCASE')
+        params.append(departure)
+    if destination:
+        clauses.append('f.destination = ? COLLATE NOCASE')
+        params.append(destination)
+    if date_from:
+        clauses.append('f.day >= ?')
+        params.append(parse_day(date_from))
+    if date_to:
+        clauses.append('f.day <= ?')
+        params.append(parse_day(date_to))
+    if fuzzy_name:
+        words = fuzzy_name.split()
+        # Trigram matching needs at least three characters per word
+        if _fts_available and all(len(word) >= 3 for word in words):
+            # Drive the query from the FTS index, which yields matches in rowid order
+            source = 'reservations_fts x JOIN reservations r ON r.id = x.rowid'
+            key = 'x.rowid'
+            clauses.append('reservations_fts MATCH ?')
+            params.append(" AND ".join('"' + word.replace('"', '""') + '"' for word in words))
+        else:
+            for word in words:
+                clauses.append("r.name LIKE ? ESCAPE '\\'")
+                params.append(_like_pattern(word))
+    if reservation_ids is not None:
+        reservation_ids = [int(reservation_id) for reservation_id in reservation_ids]
+        if not reservation_ids:
+            return []
+        clauses.append(f'r.id IN ({",".join("?" * len(reservation_ids))})')
+        params += reservation_ids
+
+    if flight_number or departure or destination or date_from or date_to:
+        source += ' JOIN flights f ON f.id = r.flight_id'
+
+    if before_id is not None:
+        clauses.append(f'{key} < ?')
+        params.append(before_id)
+        order = 'DESC'
+    else:
+        clauses.append(f'{key} > ?')
+        params.append(after_id)
+        order = 'ASC'
+
+    # The limit is inlined rather than bound: the planner weighs it when choosing
+    # between a filter index and walking the primary key in order. Only the IDs
+    # of the page are sorted; flight details are joined in for those rows alone.
+    matches = f'SELECT {key} AS id FROM {source} WHERE {" AND ".join(clauses)} ORDER BY {key} {order} LIMIT {int(limit)}'
+    sql = (f'SELECT {_RESERVATION_COLUMNS} FROM ({matches}) m '
+           f'JOIN reservations r ON r.id = m.id JOIN flights f ON f.id = r.flight_id ORDER BY r.id {order}')
+    try:
+        conn = get_connection()
+        version = _cache_version(conn) if cache_key else None
+        if version is not None:
+            rows = reservation_cache.get_page(cache_key)
+            if rows is not None:
+                return rows
+        rows = _reservations(conn.execute(sql, params))
+        if before_id is not None:
+            rows.reverse()
+        if include_archived and attach_archive(conn):
+            archived = _search_archive(conn, name, flight_number, departure, destination, date_from, date_to,
+                                       fuzzy_name, reservation_ids, after_id, limit, before_id)
+            # Both pages are keyset pages of the same ID sequence, so merging them gives
+            # the page of the union. A reservation caught in both while it was being
+            # archived is shown once, as the live one.
+            live_ids = {res.id for res in rows}
+            rows = sorted(rows + [res for res in archived if res.id not in live_ids], key=lambda res: res.id)
+            rows = rows[-limit:] if before_id is not None else rows[:limit]
+        _cache_page(cache_key, rows, after_id, before_id, limit, version)
+        return rows
+    except sqlite3.Error as e:
+        raise RepositoryError(f"Failed to search reservations: {e}") from e
+
+def _search_archive(conn, name, flight_number, departure, destination, date_from, date_to, fuzzy_name,
+                    reservation_ids, after_id, limit, before_id):
+    """The archived counterpart of a search_reservations() page, in ascending ID order."""
+    clauses = ['deleted_at IS NULL']
+    params = []
+    if name:
+        clauses.append('name >= ? COLLATE NOCASE AND name < ? COLLATE NOCASE')
+        params += list(_prefix_range(name))
+    for column, value in (('flight_number', flight_number), ('departure', departure), ('destination', destination)):
+        if value:
+            clauses.append(f'{column} = ? COLLATE NOCASE')
+            params.append(value)
+    if date_from:
+        clauses.append('day >= ?')
+        params.append(parse_day(date_from))
+    if date_to:
+        clauses.append('day <= ?')
+        params.append(parse_day(date_to))
+    if fuzzy_name:
+        for word in fuzzy_name.split():
+            clauses.append("name LIKE ? ESCAPE '\\'")
+            params.append(_like_pattern(word))
+    if reservation_ids is not None:
+        clauses.append(f'id IN ({",".join("?" * len(reservation_ids))})')
+        params += reservation_ids
+    if before_id is not None:
+        clauses.append('id < ?')
+        params.append(before_id)
+        order = 'DESC'
+    else:
+        clauses.append('id > ?')
+        params.append(after_id)
+        order = 'ASC'
+    rows = _reservations(conn.execute(
+        f'SELECT id, name, flight_number, departure, destination, day, seat_number '
+        f'FROM {ARCHIVE_SCHEMA}.reservations WHERE {" AND ".join(clauses)} ORDER BY id {order} LIMIT {int(limit)}',
+        params))
+    if before_id is not None:
+        rows.reverse()
+    return rows
+
+def get_reservations_by_ids(reservation_ids):
+    """
+    Retrieves the reservations with the given IDs.
+
+    Args:
+        reservation_ids (iterable): IDs of the reservations to retrieve.
+
+    Returns:
+        list: Reservation records in ascending ID order. IDs that do not exist are
+              skipped.
+    """
+    reservation_ids = [int(reservation_id) for reservation_id in reservation_ids]
+    try:
+        conn = get_connection()
+        version = _cache_version(conn)
+        rows = []
+        if version is not None:
+            missing = []
+            for reservation_id in reservation_ids:
+                row = reservation_cache.get_row(reservation_id)
+                if row is None:
+                    missing.append(reservation_id)
+                else:
+                    rows.append(row)
+        else:
+            missing = reservation_ids
+        fetched = []
+        for chunk in _chunked(missing, BATCH_CHUNK_SIZE):
+            placeholders = ",".join("?" * len(chunk))
+            cursor = conn.execute(f'SELECT {_RESERVATION_COLUMNS} FROM {_RESERVATION_SOURCE} '
+                                  f'WHERE r.id IN ({placeholders})', chunk)
+            fetched.extend(_reservations(cursor))
+        if version is not None:
+            reservation_cache.put_rows(fetched, version)
+        rows.extend(fetched)
+        rows.sort()
+        return rows
+    except sqlite3.Error as e:
+        raise RepositoryError(f"Failed to retrieve reservations: {e}") from e
+
+def _cache_version(conn):
+    """
+    Brings reservation_cache up to date with every change in the change log,
+    whoever made it, and returns the cache version to tag new entries with.
+
+    Returns None when the cache must be bypassed: inside a transaction, whose
+    reads may still be rolled back.
+    """
+    if conn.in_transaction:
+        return None
+    cache = reservation_cache
+    with _cache_sync_lock:
+        if cache.database != DATABASE_NAME:
+            cache.clear()
+            cache.database = DATABASE_NAME
+        if cache.watermark is None:
+            cache.watermark = _change_watermark(conn)
+        else:
+            watermark, changes = _changes_since(conn, cache.watermark, CACHE_SYNC_LIMIT)
+            if changes is None:
+                cache.clear()
+            elif changes:
+                cache.invalidate(changes)
+            cache.watermark = watermark
+        return cache.version
+
+def _cache_page(cache_key, rows, after_id, before_id, limit, version):
+    """Caches a keyset page along with the range of IDs it covers."""
+    if version is None or cache_key is None or limit <= 0:
+        return
+    full = len(rows) >= limit
+    if before_id is not None:
+        low = rows[0][0] - 1 if full else -OPEN_END
+        high = before_id - 1
+    else:
+        low = after_id
+        high = rows[-1][0] if full else OPEN_END
+    reservation_cache.put_page(cache_key, rows, low, high, version)
+
+def _change_watermark(conn):
+    """Reads the latest change sequence number from the AUTOINCREMENT counter."""
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'reservation_changes'").fetchone()
+    return row[0] if row else 0
+
+def get_change_watermark():
+    """
+    Returns the sequence number of the most recent reservation change.
+    Cheap enough to call on every page view to see whether anything changed.
+
+    Returns:
+        int: The latest change sequence number, 0 if nothing was ever changed.
+    """
+    try:
+        return _change_watermark(get_connection())
+    except sqlite3.Error as e:
+        raise RepositoryError(f"Failed to read change log: {e}") from e
+
+def _changes_since(conn, since_seq, limit):
+    """get_changes_since() on a given connection."""
+    watermark = _change_watermark(conn)
+    if watermark == since_seq:
+        return watermark, {}
+    rows = conn.execute('SELECT seq, reservation_id, op FROM reservation_changes WHERE seq > ? ORDER BY seq LIMIT ?',
+                        (since_seq, limit + 1)).fetchall()
+    if len(rows) > limit or not rows or rows[0][0] != since_seq + 1:
+        return watermark, None
+    changes = {}
+    for seq, reservation_id, op in rows:
+        changes[reservation_id] = op
+    return rows[-1][0], changes
+
+def get_changes_since(since_seq, limit=1000):
+    """
+    Collects the reservation changes made after a given watermark.
+
+    Args:
+        since_seq (int): Watermark returned by an earlier call or by get_change_watermark().
+        limit (int): Give up and report a full reload once more than this many
+                     changes are pending.
+
+    Returns:
+        tuple: (watermark, changes) where changes maps each changed reservation ID
+               to its last operation ('I', 'U' or 'D'). changes is None when the
+               caller should reload everything instead: too many changes, or the
+               log was pruned past since_seq.
+    """
+    try:
+        return _changes_since(get_connection(), since_seq, limit)
+    except sqlite3.Error as e:
+        raise RepositoryError(f"Failed to read change log: {e}") from e
+
+def get_booked_seats(flight_number, date):
+    """
+    Retrieves the seats already booked on a flight.
+
+    Args:
+        flight_number (str): Flight number (case-insensitive).
+        date (str): Date of the flight.
+
+    Returns:
+        list: Booked seat numbers; empty if date is not a valid YYYY-MM-DD date.
+    """
+    try:
+        day = parse_day(date)
+    except InvalidReservationError:
+        return []
+    try:
+        cursor = get_connection().execute(
+            'SELECT r.seat_number FROM reservations r JOIN flights f ON f.id = r.flight_id '
+            'WHERE f.flight_number = ? AND f.day = ?', (flight_number, day))
+        return [row[0] for row in cursor]
+    except sqlite3.Error as e:
+        raise RepositoryError(f"Failed to get booked seats: {e}") from e
+
+def get_dashboard(date_from=None, days=30, routes=10, flights=100):
+    """
+    Reads the booking statistics for the dashboard in one consistent snapshot.
+    Only the precomputed counts are read, so this takes about as long on a
+    table of millions of reservations as on an empty one.
+
+    Args:
+        date_from (str): First flight date (YYYY-MM-DD) of the per-day and
+                         per-flight figures; defaults to today.
+        days (int): Maximum number of dates with bookings to return.
+        routes (int): Number of busiest routes to return.
+        flights (int): Maximum number of flights to return.
+
+    Returns:
+        Dashboard: The figures.
+
+    Raises:
+        InvalidReservationError: If date_from is not a valid YYYY-MM-DD date.
+    """
+    day = parse_day(date_from) if date_from else datetime.date.today().toordinal() - EPOCH_ORDINAL
+    try:
+        with transaction() as conn:
+            total_booked, upcoming_booked = conn.execute(
+                'SELECT COALESCE(SUM(booked), 0), COALESCE(SUM(CASE WHEN day >= ? THEN booked END), 0) FROM day_bookings',
+                (day,)).fetchone()
+            day_rows = conn.execute('SELECT day, booked FROM day_bookings WHERE day >= ? AND booked > 0 '
+                                    'ORDER BY day LIMIT ?', (day, days)).fetchall()
+            route_rows = conn.execute('SELECT departure, destination, booked FROM route_bookings WHERE booked > 0 '
+                                      'ORDER BY booked DESC LIMIT ?', (routes,)).fetchall()
+            flight_rows = conn.execute(
+                'SELECT f.flight_number, f.day, f.departure, f.destination, COALESCE(b.booked, 0) '
+                'FROM flights f LEFT JOIN flight_bookings b ON b.flight_id = f.id '
+                'WHERE f.day >= ? ORDER BY f.day, f.id LIMIT ?', (day, flights)).fetchall()
+    except sqlite3.Error as e:
+        raise RepositoryError(f"Failed to read booking statistics: {e}") from e
+    return Dashboard(
+        total_booked, upcoming_booked,
+        [DayBookings(_from_day(row_day), booked) for row_day, booked in day_rows],
+        [RouteBookings(*row) for row in route_rows],
+        [FlightLoad(flight_number, _from_day(flight_day), departure, destination, booked, booked / FLIGHT_CAPACITY)
+         for flight_number, flight_day, departure, destination, booked in flight_rows])
+
+def get_reservation_by_id(reservation_id):
+    """
+    Retrieves a single reservation record by its ID.
+
+    Args:
+        reservation_id (int): The ID of the reservation to retrieve.
+
+    Returns:
+        Reservation: The reservation record, or None if not found.
+    """
+    try:
+        conn = get_connection()
+        version = _cache_version(conn)
+        if version is not None:
+            row = reservation_cache.get_row(int(reservation_id))
+            if row is not None:
+                return row
+        row = conn.execute(f'SELECT {_RESERVATION_COLUMNS} FROM {_RESERVATION_SOURCE} WHERE r.id = ?',
+                           (reservation_id,)).fetchone()
+        if row is not None:
+            row = _reservation(row)
+        if row is not None and version is not None:
+            reservation_cache.put_rows([row], version)
+        return row
+    except sqlite3.Error as e:
+        raise RepositoryError(f"Failed to get reservation: {e}") from e
+
+
+def get_versioned_reservation(reservation_id):
+    """
+    Reads a reservation together with its version, to be passed back to
+    update_reservation() as expected_version. Always read from the database,
+    never from the cache, so the two match.
+
+    Args:
+        reservation_id (int): The ID of the reservation to retrieve.
+
+    Returns:
+        tuple: (Reservation, version), or None if not found.
+    """
+    try:
+        return _versioned_reservation(get_connection(), reservation_id)
+    except sqlite3.Error as e:
+        raise RepositoryError(f"Failed to get reservation: {e}") from e
+
+def _versioned_reservation(conn, reservation_id):
+    row = conn.execute(f'SELECT {_RESERVATION_COLUMNS}, r.version FROM {_RESERVATION_SOURCE} WHERE r.id = ?',
+                       (reservation_id,)).fetchone()
+    return None if row is None else (_reservation(row), row[7])
+
+@_retry_when_busy
+def update_reservation(reservation_id, name, flight_number, departure, destination, date, seat_number,
+                       expected_version=None):
+    """
+    Updates an existing reservation record in the database.
+
+    Every update adds one to the reservation's version. Given expected_version,
+    the update is a compare-and-swap: it only goes through if nobody changed
+    the reservation since that version was read, and no lock is held between
+    reading it and saving.
+
+    Args:
+        reservation_id (int): The ID of the reservation to update.
+        name (str): New passenger name.
+        flight_number (str): New flight number.
+        departure (str): New departure location.
+        destination (str): New destination location.
+        date (str): New flight date.
+        seat_number (str): New seat number.
+        expected_version (int): Version from get_versioned_reservation(), or
+                                None to overwrite whatever is stored.
+
+    Returns:
+        int: The reservation's new version.
+
+    Raises:
+        ReservationConflictError: If the reservation is no longer at expected_version.
+        SeatUnavailableError: If the new seat is already booked on that flight.
+        RouteConflictError: If the flight already flies a different route that day.
+        ReservationNotFoundError: If no reservation has that ID.
+        InvalidReservationError: If the date is not a valid YYYY-MM-DD date.
+    """
+    day = parse_day(date)
+    try:
+        with transaction(immediate=True) as conn:
+            row = conn.execute('SELECT version FROM reservations WHERE id = ?', (reservation_id,)).fetchone()
+            if row is None:
+                raise ReservationNotFoundError(reservation_id)
+            version = row[0] if expected_version is None else expected_version
+            flight_id = _flight_id(conn, flight_number, day, departure, destination, reservation_id)
+            cursor = conn.execute('UPDATE reservations SET name = ?, flight_id = ?, seat_number = ?, version = ? '
+                                  'WHERE id = ? AND version = ?',
+                                  (name, flight_id, seat_number, version + 1, reservation_id, version))
+            if cursor.rowcount == 0:
+                # Rolls back the flight _flight_id() may have created
+                raise ReservationConflictError(reservation_id, *_versioned_reservation(conn, reservation_id))
+    except sqlite3.Error as e:
+        if _is_seat_conflict(e):
+            raise SeatUnavailableError(flight_number, date, seat_number) from e
+        raise RepositoryError(f"Failed to update reservation: {e}") from e
+    reservation_cache.invalidate([reservation_id])
+    return version + 1
+
+@_retry_when_busy
+def delete_reservation(reservation_id):
+    """
+    Deletes a reservation record from the database by its ID. It is kept in
+    deleted_reservations and can be brought back with restore_reservation().
+
+    Args:
+        reservation_id (int): The ID of the reservation to delete.
+
+    Raises:
+        ReservationNotFoundError: If no reservation has that ID.
+    """
+    try:
+        with transaction(immediate=True) as conn:
+            conn.execute(_KEEP_DELETED_SQL, (now_timestamp(), reservation_id))
+            cursor = conn.execute('DELETE FROM reservations WHERE id = ?', (reservation_id,))
+    except sqlite3.Error as e:
+        raise RepositoryError(f"Failed to delete reservation: {e}") from e
+    reservation_cache.invalidate([reservation_id])
+    if cursor.rowcount == 0:
+        raise ReservationNotFoundError(reservation_id)
+
+def now_timestamp():
+    """The current local time as ISO 8601 text, for deleted_at and archived_at."""
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+def get_deleted_reservations(after_id=0, limit=200):
+    """
+    Retrieves one page of deleted reservations that have not been archived yet.
+
+    Args:
+        after_id (int): Keyset cursor; return reservations with a greater ID.
+        limit (int): Maximum number of reservations to return.
+
+    Returns:
+        list: DeletedReservation records in ascending ID order.
+    """
+    try:
+        cursor = get_connection().execute(
+            'SELECT id, name, flight_number, departure, destination, day, seat_number, deleted_at '
+            'FROM deleted_reservations WHERE id > ? ORDER BY id LIMIT ?', (after_id, limit))
+        return [DeletedReservation(_reservation(row), row[7]) for row in cursor]
+    except sqlite3.Error as e:
+        raise RepositoryError(f"Failed to retrieve deleted reservations: {e}") from e
+
+@_retry_when_busy
+def restore_reservation(reservation_id):
+    """
+    Brings back a deleted reservation under its old ID, provided its seat has
+    not been booked by someone else meanwhile.
+
+    Args:
+        reservation_id (int): The ID the reservation had.
+
+    Raises:
+        ReservationNotFoundError: If no deleted reservation has that ID (it may
+                                  have been archived).
+        SeatUnavailableError: If the seat has been booked again since.
+        RouteConflictError: If the flight now flies a different route that day.
+    """
+    row = None
+    try:
+        with transaction(immediate=True) as conn:
+            row = conn.execute('SELECT name, flight_number, departure, destination, day, seat_number, version '
+                               'FROM deleted_reservations WHERE id = ?', (reservation_id,)).fetchone()
+            if row is None:
+                raise ReservationNotFoundError(reservation_id)
+            name, flight_number, departure, destination, day, seat_number, version = row
+            flight_id = _flight_id(conn, flight_number, day, departure, destination)
+            # A new version, so an edit opened before the delete cannot overwrite the restored reservation
+            conn.execute('INSERT INTO reservations (id, name, flight_id, seat_number, version) VALUES (?, ?, ?, ?, ?)',
+                         (reservation_id, name, flight_id, seat_number, version + 1))
+            conn.execute('DELETE FROM deleted_reservations WHERE id = ?', (reservation_id,))
+    except sqlite3.Error as e:
+        if row is not None and _is_seat_conflict(e):
+            raise SeatUnavailableError(row[1], _from_day(row[4]), row[5]) from e
+        raise RepositoryError(f"Failed to restore reservation: {e}") from e
+    reservation_cache.invalidate([reservation_id])
+
+def archive_path():
+    """The archive database belonging to DATABASE_NAME, e.g. flights.archive.db."""
+    return os.path.splitext(DATABASE_NAME)[0] + ".archive.db"
+
+def attach_archive(conn, create=False):
+    """
+    Makes the archive database available on conn as ARCHIVE_SCHEMA. Must be
+    called outside a transaction; a connection stays attached once it is.
+
+    Args:
+        create (bool): Create the archive if it does not exist yet.
+
+    Returns:
+        bool: False if there is no archive (and create is False).
+    """
+    if any(row[1] == ARCHIVE_SCHEMA for row in conn.execute('PRAGMA database_list')):
+        return True
+    path = archive_path()
+    if not create and not os.path.exists(path):
+        return False
+    conn.execute(f'ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}', (path,))
+    conn.execute(f'PRAGMA {ARCHIVE_SCHEMA}.journal_mode = WAL')
+    # Flattened rows, so the archive needs no flights table and reads on its own;
+    # deleted_at is set for reservations that had been deleted before they were archived
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.reservations (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            flight_number TEXT NOT NULL,
+            departure TEXT NOT NULL,
+            destination TEXT NOT NULL,
+            day INTEGER NOT NULL,
+            seat_number TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            deleted_at TEXT,
+            archived_at TEXT NOT NULL
+        )
+    ''')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_archive_name '
+                 f'ON reservations (name COLLATE NOCASE)')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_archive_flight '
+                 f'ON reservations (flight_number COLLATE NOCASE, day)')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_archive_day ON reservations (day)')
+    return True
+
+def _chunked(items, size):
+    """Yields successive lists of at most `size` items."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _existing_ids(conn, reservation_ids):
+    """Returns the subset of reservation_ids that are present in the table."""
+    placeholders = ",".join("?" * len(reservation_ids))
+    cursor = conn.execute(f'SELECT id FROM reservations WHERE id IN ({placeholders})', reservation_ids)
+    return {row[0] for row in cursor}
+
+def _batch_error(error, flight_number, date, seat_number):
+    """Returns the message a BatchResult reports for a row the database rejected."""
+    if isinstance(error, sqlite3.Error) and _is_seat_conflict(error):
+        return str(SeatUnavailableError(flight_number, date, seat_number))
+    return str(error)
+
+@_retry_when_busy
+def add_reservations(rows):
+    """
+    Inserts many reservations in a single transaction.
+
+    Each row's flight is looked up (or created) first; rows with an invalid date
+    or a route that conflicts with their flight fail on their own. The rest are
+    written with executemany() in chunks of BATCH_CHUNK_SIZE. If a chunk is
+    rejected, it is retried row by row so the remaining rows still go in and
+    each failure is reported individually.
+
+    Args:
+        rows (iterable): Tuples of (name, flight_number, departure, destination, date, seat_number).
+
+    Returns:
+        list: One BatchResult per input row, in input order. For successful rows
+              reservation_id is the ID of the new reservation.
+
+    Raises:
+        RepositoryError: If the batch could not be committed at all; nothing was inserted.
+    """
+    rows = [tuple(row) for row in rows]
+    sql = 'INSERT INTO reservations (name, flight_id, seat_number) VALUES (?, ?, ?)'
+    results = [None] * len(rows)
+    claimed = set()
+    flights = {}
+    try:
+        with transaction(immediate=True) as conn:
+            for start in range(0, len(rows), BATCH_CHUNK_SIZE):
+                chunk = []
+                for index in range(start, min(start + BATCH_CHUNK_SIZE, len(rows))):
+                    name, flight_number, departure, destination, date, seat_number = rows[index]
+                    # A claimed flight's route can no longer change, so repeat lookups are skipped
+                    key = (nocase(flight_number), date, nocase(departure), nocase(destination))
+                    flight_id = flights.get(key)
+                    if flight_id is None:
+                        try:
+                            flight_id = _flight_id(conn, flight_number, parse_day(date), departure, destination,
+                                                   claimed=claimed)
+                        except (InvalidReservationError, RouteConflictError) as e:
+                            results[index] = BatchResult(False, None, str(e))
+                            continue
+                        claimed.add(flight_id)
+                        flights[key] = flight_id
+                    chunk.append((index, (name, flight_id, seat_number)))
+                try:
+                    with transaction():
+                        conn.executemany(sql, [params for _, params in chunk])
+                        last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+                except sqlite3.Error:
+                    for index, params in chunk:
+                        try:
+                            with transaction():
+                                results[index] = BatchResult(True, conn.execute(sql, params).lastrowid, None)
+                        except sqlite3.Error as e:
+                            row = rows[index]
+                            results[index] = BatchResult(False, None, _batch_error(e, row[1], row[4], row[5]))
+                else:
+                    # AUTOINCREMENT hands out consecutive IDs while we hold the write lock
+                    first_id = last_id - len(chunk) + 1
+                    for offset, (index, _) in enumerate(chunk):
+                        results[index] = BatchResult(True, first_id + offset, None)
+        reservation_cache.invalidate(result.reservation_id for result in results if result.ok)
+        return results
+    except sqlite3.Error as e:
+        raise RepositoryError(f"Failed to add reservations: {e}") from e
+
+@_retry_when_busy
+def update_reservations(rows):
+    """
+    Updates many reservations in a single transaction.
+
+    Args:
+        rows (iterable): Tuples of (reservation_id, name, flight_number, departure,
+                         destination, date, seat_number), the same order as update_reservation().
+
+    Returns:
+        list: One BatchResult per input row, in input order. A row fails if its ID
+              does not exist or the new values are rejected.
+
+    Raises:
+        RepositoryError: If the batch could not be committed at all; nothing was updated.
+    """
+    rows = [tuple(row) for row in rows]
+    sql = 'UPDATE reservations SET name = ?, flight_id = ?, seat_number = ?, version = version + 1 WHERE id = ?'
+    results = [None] * len(rows)
+    claimed = set()
+    try:
+        with transaction(immediate=True) as conn:
+            for start in range(0, len(rows), BATCH_CHUNK_SIZE):
+                indexes = range(start, min(start + BATCH_CHUNK_SIZE, len(rows)))
+                existing = _existing_ids(conn, [rows[index][0] for index in indexes])
+                chunk = []
+                for index in indexes:
+                    reservation_id, name, flight_number, departure, destination, date, seat_number = rows[index]
+                    if reservation_id not in existing:
+                        results[index] = BatchResult(False, reservation_id, "Reservation not found")
+                        continue
+                    try:
+                        flight_id = _flight_id(conn, flight_number, parse_day(date), departure, destination,
+                                               reservation_id, claimed)
+                    except (InvalidReservationError, RouteConflictError) as e:
+                        results[index] = BatchResult(False, reservation_id, str(e))
+                        continue
+                    claimed.add(flight_id)
+                    chunk.append((index, (name, flight_id, seat_number, reservation_id)))
+                try:
+                    with transaction():
+                        conn.executemany(sql, [params for _, params in chunk])
+                except sqlite3.Error:
+                    for index, params in chunk:
+                        row = rows[index]
+                        try:
+                            with transaction():
+                                conn.execute(sql, params)
+                            results[index] = BatchResult(True, row[0], None)
+                        except sqlite3.Error as e:
+                            results[index] = BatchResult(False, row[0], _batch_error(e, row[2], row[5], row[6]))
+                else:
+                    for index, _ in chunk:
+                        results[index] = BatchResult(True, rows[index][0], None)
+        reservation_cache.invalidate(row[0] for row in rows)
+        return results
+    except sqlite3.Error as e:
+        raise RepositoryError(f"Failed to update reservations: {e}") from e
+
+@_retry_when_busy
+def delete_reservations(reservation_ids):
+    """
+    Deletes many reservations in a single transaction, keeping them in
+    deleted_reservations like delete_reservation() does.
+
+    Args:
+        reservation_ids (iterable): IDs of the reservations to delete.
+
+    Returns:
+        list: One BatchResult per input ID, in input order. An ID fails if no
+              reservation with that ID exists; an ID given more than once
+              succeeds the first time only, so each success is one deletion.
+
+    Raises:
+        RepositoryError: If the batch could not be committed at all; nothing was deleted.
+    """
+    reservation_ids = [int(reservation_id) for reservation_id in reservation_ids]
+    unique_ids = list(dict.fromkeys(reservation_ids))
+    deleted = set()
+    try:
+        with transaction(immediate=True) as conn:
+            for chunk in _chunked(unique_ids, BATCH_CHUNK_SIZE):
+                existing = _existing_ids(conn, chunk)
+                now = now_timestamp()
+                conn.executemany(_KEEP_DELETED_SQL, [(now, rid) for rid in chunk])
+                conn.executemany('DELETE FROM reservations WHERE id = ?', [(rid,) for rid in chunk])
+                deleted.update(existing)
+        reservation_cache.invalidate(unique_ids)
+        results = []
+        for rid in reservation_ids:
+            if rid in deleted:
+                deleted.discard(rid)
+                results.append(BatchResult(True, rid, None))
+            else:
+                results.append(BatchResult(False, rid, "Reservation not found"))
+        return results
+    except sqlite3.Error as e:
+        raise RepositoryError(f"Failed to delete reservations: {e}") from e
+
+
+# Time every query function when diagnostics are on (see instrumentation.py).
+# cli.py, api_server.py and the pages all reach the database through these.
+instrumentation.trace_functions(globals(), "repository",
+                                exclude=("get_connection", "close_connections", "transaction", "read_snapshot",
+                                         "nocase", "parse_day", "now_timestamp"))
@@ -1,27 +1,78 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
-from database import get_all_reservations, delete_reservation, get_reservation_by_id
+from bisect import bisect_left
+from tkinter import ttk, filedialog
+import dialogs
+from instrumentation import traced
+import outbox
+from repository import (get_reservations_page, get_reservations_by_ids, search_reservations,
+                        get_change_watermark, get_changes_since)
+from transfer import import_reservations, export_reservations
+
+# The table only keeps a sliding window of rows in the Treeview. Rows are fetched
+# PAGE_SIZE at a time as the user scrolls, and once more than MAX_LOADED_ROWS are
+# loaded the rows furthest from the view are dropped again.
+PAGE_SIZE = 200
+MAX_LOADED_ROWS = 3 * PAGE_SIZE
+# Fetch the next/previous page once the view is this close (as a fraction of the
+# loaded rows) to either end of the window.
+PREFETCH_THRESHOLD = 0.15
+# Failed rows listed by name in an import or delete summary; the rest are counted
+MAX_LISTED_ERRORS = 10
 
 class ReservationsPage(ttk.Frame):
     def __init__(self, parent, controller):
         ttk.Frame.__init__(self, parent)
         self.controller = controller
+
+        # State of the loaded window of rows (see populate_table)
+        self._first_id = None
+        self._last_id = None
+        self._has_more_before = False
+        self._has_more_after = False
+        self._page_pending = False
+        # Change-log watermark the loaded rows are current with; None until first load
+        self._change_seq = None
+        # Active search filters, as keyword arguments for search_reservations()
+        self._filters = {}
+        # Bumped on every full reload so late results from an older load are ignored
+        self._generation = 0
         
-        ttk.Label(self, text="All Flight Reservations", font=("Helvetica", 20, "bold"), foreground="#00567a").pack(pady=30)
+        ttk.Label(self, text="All Flight Reservations", font=("Helvetica", 20, "bold"), foreground="#00567a").pack(pady=20)
+
+        # Search bar; every filter is optional and they are combined with AND
+        search_frame = ttk.Frame(self)
+        search_frame.pack(fill="x", padx=20)
+        search_fields = [("Name", "name"), ("Flight", "flight_number"), ("From", "departure"), ("To", "destination"),
+                         ("Date from", "date_from"), ("Date to", "date_to")]
+        self.search_entries = {}
+        for i, (label, key) in enumerate(search_fields):
+            row, column = divmod(i, 4)
+            ttk.Label(search_frame, text=f"{label}:", font=("Helvetica", 10)).grid(row=row, column=column * 2, sticky="w", padx=(5, 2), pady=3)
+            entry = ttk.Entry(search_frame, width=14, font=('Helvetica', 10))
+            entry.grid(row=row, column=column * 2 + 1, sticky="ew", pady=3)
+            entry.bind("<Return>", lambda event: self.apply_search())
+            self.search_entries[key] = entry
+        self.fuzzy_name = tk.BooleanVar(value=False)
+        ttk.Checkbutton(search_frame, text="Fuzzy name", variable=self.fuzzy_name).grid(row=1, column=4, columnspan=2, sticky="w", padx=5)
+        # Past flights moved to the archive (see archive.py) are only searched when asked for
+        self.include_archived = tk.BooleanVar(value=False)
+        ttk.Checkbutton(search_frame, text="Include archived", variable=self.include_archived).grid(row=0, column=8, columnspan=2, sticky="w", padx=5)
+        ttk.Button(search_frame, text="🔍 Search", command=self.apply_search).grid(row=1, column=6, padx=5)
+        ttk.Button(search_frame, text="Clear", command=self.clear_search).grid(row=1, column=7, padx=5)
         
         # Frame for the Treeview and its scrollbar
         tree_frame = ttk.Frame(self)
         tree_frame.pack(fill="both", expand=True, padx=20, pady=10)
 
         # Scrollbar for the Treeview
-        tree_scroll = ttk.Scrollbar(tree_frame)
-        tree_scroll.pack(side="right", fill="y")
+        self.tree_scroll = ttk.Scrollbar(tree_frame)
+        self.tree_scroll.pack(side="right", fill="y")
 
         self.tree = ttk.Treeview(tree_frame, columns=("ID", "Name", "Flight", "Departure", "Destination", "Date", "Seat"),
-                                 show="headings", yscrollcommand=tree_scroll.set, selectmode="extended") # Added selectmode="extended"
+                                 show="headings", yscrollcommand=self.on_tree_scroll, selectmode="extended") # Added selectmode="extended"
         
         # Configure scrollbar
-        tree_scroll.config(command=self.tree.yview)
+        self.tree_scroll.config(command=self.tree.yview)
 
         # Define column headings and widths
         self.tree.heading("ID", text="ID", anchor="center")
@@ -41,6 +92,10 @@ class ReservationsPage(ttk.Frame):
         self.tree.column("Seat", width=70, anchor="center")
 
         self.tree.pack(fill="both", expand=True)
+
+        # Busy/status line shown while the database is being queried
+        self.status_label = ttk.Label(self, text="", font=("Helvetica", 10, "italic"), foreground="#555")
+        self.status_label.pack(anchor="w", padx=20)
         
         # Bind double-click to edit reservation (only first selected)
         self.tree.bind("<Double-1>", self.on_double_click)
@@ -51,43 +106,256 @@ class ReservationsPage(ttk.Frame):
         
         ttk.Button(button_frame, text="✏️ Edit Selected", command=self.edit_selected_reservation).pack(side="left", padx=10, ipadx=10, ipady=5)
         ttk.Button(button_frame, text="🗑️ Delete Selected", command=self.delete_selected_reservation, style='Danger.TButton').pack(side="left", padx=10, ipadx=10, ipady=5)
+        ttk.Button(button_frame, text="⬆️ Import…", command=self.import_file).pack(side="left", padx=10, ipadx=10, ipady=5)
+        ttk.Button(button_frame, text="⬇️ Export…", command=self.export_file).pack(side="left", padx=10, ipadx=10, ipady=5)
         ttk.Button(button_frame, text="🏠 Go Home", command=lambda: controller.show_frame("HomePage")).pack(side="left", padx=10, ipadx=10, ipady=5)
         
         # Custom button style for danger action
         self.controller.style.configure('Danger.TButton', background='#dc3545', foreground='white', font=('Helvetica', 12, 'bold'))
         self.controller.style.map('Danger.TButton', background=[('active', '#c82333')])
 
-        # Populate table initially
-        self.populate_table()
+        # Rows are first loaded when the page is shown (see on_show_page), not here,
+        # so building the page never waits on the database
 
     def on_show_page(self, event=None):
         """
         This method is called by the controller when this page is brought to the front.
-        It ensures the reservation list is always up-to-date.
+        It ensures the reservation list is always up-to-date, touching only the rows
+        that changed since it was last shown. The first time, it loads the first page.
         """
-        self.populate_table()
+        self.refresh_table()
 
+    @traced("ReservationsPage.populate_table")
     def populate_table(self):
         """
-        Clears existing entries in the Treeview and populates it with fresh data
-        from the database.
+        Reloads the table from scratch: fetches the first page of reservations in
+        the background and swaps it in once it arrives. Further pages are fetched
+        on demand as the user scrolls.
         """
+        self._generation += 1
+        self._page_pending = True
+        self._set_status("Loading reservations…")
+        generation = self._generation
+        self.controller.db_worker.submit(
+            _load_first_page, dict(self._filters), key=("reservations", "load"),
+            on_done=lambda result: self._show_first_page(generation, result),
+            on_error=self._on_load_error)
+
+    @traced("ReservationsPage._show_first_page")
+    def _show_first_page(self, generation, result):
+        """Replaces the table contents with a freshly loaded first page."""
+        if generation != self._generation:
+            return  # A newer reload was requested meanwhile
+        watermark, reservations = result
+
         # Clear existing items
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        # Get all reservations from the database
-        reservations = get_all_reservations()
-        
-        # Insert each reservation into the Treeview
+        self.tree.delete(*self.tree.get_children())
+        self._first_id = self._last_id = None
+        self._has_more_before = False
+        self._has_more_after = False
+        self._change_seq = watermark
+        self._page_pending = False
+        self._set_status("")
+
         if reservations:
-            for res in reservations:
-                self.tree.insert('', 'end', values=res)
+            self._append_rows(reservations)
         else:
-            # Display a message if no reservations are found
-            self.tree.insert('', 'end', values=["", "No reservations found.", "", "", "", "", ""], tags=('no_data',))
-            self.tree.tag_configure('no_data', foreground='gray', font=('Helvetica', 10, 'italic'))
+            self._show_no_data()
+        self.tree.yview_moveto(0)
+
+    def _on_load_error(self, error):
+        """Reports a failed background load and lets the user try again."""
+        self._page_pending = False
+        self._set_status("Could not load reservations.")
+        dialogs.showerror(getattr(error, "title", "Database Error"), str(error))
+
+    def _set_status(self, text):
+        """Shows a short busy/status message under the table."""
+        self.status_label.config(text=text)
+        self.tree.config(cursor="watch" if text.endswith("…") else "")
+
+    def apply_search(self):
+        """Reloads the table showing only reservations that match the search bar."""
+        filters = {key: entry.get().strip() for key, entry in self.search_entries.items()}
+        if self.fuzzy_name.get():
+            filters["fuzzy_name"] = filters.pop("name")
+        if self.include_archived.get():
+            filters["include_archived"] = True
+        self._filters = {key: value for key, value in filters.items() if value}
+        self.populate_table()
+
+    def clear_search(self):
+        """Empties the search bar and shows all reservations again."""
+        for entry in self.search_entries.values():
+            entry.delete(0, tk.END)
+        self.fuzzy_name.set(False)
+        self.include_archived.set(False)
+        self._filters = {}
+        self.populate_table()
 
+    def refresh_table(self):
+        """
+        Brings the loaded rows up to date by applying only the inserts, updates and
+        deletes recorded in the change log since the last refresh. Each Treeview item
+        is keyed by its reservation ID, so every change is a direct lookup. Falls back
+        to populate_table() when the change log cannot cover the gap.
+
+        The change log is read in the background, and repeated refreshes issued
+        before it runs collapse into a single query.
+        """
+        if self._change_seq is None:
+            self.populate_table()
+            return
+        generation = self._generation
+        self.controller.db_worker.submit(
+            _collect_changes, self._change_seq, dict(self._filters), key=("reservations", "refresh"),
+            on_done=lambda result: self._apply_changes(generation, result))
+
+    @traced("ReservationsPage._apply_changes")
+    def _apply_changes(self, generation, result):
+        """Applies the changes gathered by _collect_changes() to the loaded rows."""
+        since, watermark, changes, matches = result
+        if generation != self._generation or since != self._change_seq:
+            return  # The table was reloaded or already refreshed past this point
+        if changes is None:
+            self.populate_table()
+            return
+        self._change_seq = watermark
+        if not changes:
+            return
+
+        removed = False
+        matched_ids = {res[0] for res in matches}
+        for reservation_id, op in changes.items():
+            # Deleted rows, and rows edited so they no longer match the search, drop out
+            if (op == 'D' or reservation_id not in matched_ids) and self.tree.exists(str(reservation_id)):
+                self.tree.delete(str(reservation_id))
+                removed = True
+
+        # Only rows that belong inside the loaded window are shown
+        for res in matches:
+            if self._in_window(res[0]):
+                self._upsert_row(res)
+
+        # The window bounds stay valid keyset cursors even if those rows were deleted,
+        # so they only need resetting once the window is empty.
+        if removed and not self.tree.get_children():
+            self._first_id = self._last_id = None
+            if self._has_more_before or self._has_more_after:
+                self.populate_table()
+            else:
+                self._show_no_data()
+
+    def _show_no_data(self):
+        """Displays a placeholder row when there are no reservations to show."""
+        self.tree.insert('', 'end', iid='no_data', values=["", "No reservations found.", "", "", "", "", ""], tags=('no_data',))
+        self.tree.tag_configure('no_data', foreground='gray', font=('Helvetica', 10, 'italic'))
+
+    def _in_window(self, reservation_id):
+        """Tells whether a reservation ID falls inside the range of loaded rows."""
+        if self.tree.exists(str(reservation_id)):
+            return True
+        after_start = self._first_id is None or reservation_id > self._first_id or not self._has_more_before
+        before_end = self._last_id is None or reservation_id < self._last_id or not self._has_more_after
+        return after_start and before_end
+
+    def _upsert_row(self, res):
+        """Updates a row in place, or inserts it at its ID-ordered position."""
+        iid = str(res[0])
+        if self.tree.exists(iid):
+            self.tree.item(iid, values=res)
+            return
+        if self.tree.exists('no_data'):
+            self.tree.delete('no_data')
+        if self._last_id is None or res[0] > self._last_id:
+            # New bookings get the highest ID, so this is the common case
+            self.tree.insert('', 'end', iid=iid, values=res)
+            self._last_id = res[0]
+            if self._first_id is None:
+                self._first_id = res[0]
+        else:
+            loaded_ids = [int(item) for item in self.tree.get_children()]
+            self.tree.insert('', bisect_left(loaded_ids, res[0]), iid=iid, values=res)
+
+    def on_tree_scroll(self, first, last):
+        """
+        Treeview scroll callback. Updates the scrollbar and, when the view nears
+        either end of the loaded window, schedules loading the adjacent page.
+        """
+        self.tree_scroll.set(first, last)
+        if self._page_pending:
+            return
+        if float(last) >= 1 - PREFETCH_THRESHOLD and self._has_more_after:
+            self._page_pending = True
+            self.after_idle(self._load_next_page)
+        elif float(first) <= PREFETCH_THRESHOLD and self._has_more_before:
+            self._page_pending = True
+            self.after_idle(self._load_previous_page)
+
+    def _append_rows(self, reservations):
+        """Adds rows after the loaded window and records the new window bounds."""
+        for res in reservations:
+            self.tree.insert('', 'end', iid=str(res[0]), values=res)
+        if self._first_id is None:
+            self._first_id = reservations[0][0]
+        self._last_id = reservations[-1][0]
+        self._has_more_after = len(reservations) == PAGE_SIZE
+
+    def _load_next_page(self):
+        """Fetches the page after the loaded window in the background."""
+        generation = self._generation
+        self.controller.db_worker.submit(
+            _fetch_page, dict(self._filters), after_id=self._last_id,
+            on_done=lambda reservations: self._show_next_page(generation, reservations),
+            on_error=self._on_load_error)
+
+    @traced("ReservationsPage._show_next_page")
+    def _show_next_page(self, generation, reservations):
+        """Appends a fetched page and trims rows from the top of the window."""
+        if generation != self._generation:
+            return
+        self._page_pending = False
+        if not reservations:
+            self._has_more_after = False
+            return
+        self._append_rows(reservations)
+
+        excess = self.tree.get_children()[:-MAX_LOADED_ROWS]
+        if excess:
+            self.tree.delete(*excess)
+            self._first_id = int(self.tree.get_children()[0])
+            self._has_more_before = True
+            # Removing rows above the view shifts it down; scroll back by as many rows
+            self.tree.yview_scroll(-len(excess), "units")
+
+    def _load_previous_page(self):
+        """Fetches the page before the loaded window in the background."""
+        generation = self._generation
+        self.controller.db_worker.submit(
+            _fetch_page, dict(self._filters), before_id=self._first_id,
+            on_done=lambda reservations: self._show_previous_page(generation, reservations),
+            on_error=self._on_load_error)
+
+    @traced("ReservationsPage._show_previous_page")
+    def _show_previous_page(self, generation, reservations):
+        """Prepends a fetched page and trims rows from the bottom of the window."""
+        if generation != self._generation:
+            return
+        self._page_pending = False
+        self._has_more_before = len(reservations) == PAGE_SIZE
+        if not reservations:
+            return
+        for index, res in enumerate(reservations):
+            self.tree.insert('', index, iid=str(res[0]), values=res)
+        self._first_id = reservations[0][0]
+        # Rows inserted above the view push it up; scroll forward to keep the same rows visible
+        self.tree.yview_scroll(len(reservations), "units")
+
+        excess = self.tree.get_children()[MAX_LOADED_ROWS:]
+        if excess:
+            self.tree.delete(*excess)
+            self._last_id = int(self.tree.get_children()[-1])
+            self._has_more_after = True
 
     def on_double_click(self, event):
         """Handles double-click event on a reservation row to initiate editing."""
@@ -101,12 +369,12 @@ class ReservationsPage(ttk.Frame):
         """
         selected_items = self.tree.selection()
         if not selected_items:
-            messagebox.showwarning("No Selection", "Please select a reservation from the list to edit.")
+            dialogs.showwarning("No Selection", "Please select a reservation from the list to edit.")
             return
 
         # For editing, we typically only allow one item at a time
         if len(selected_items) > 1:
-            messagebox.showwarning("Multiple Selection", "Please select only one reservation to edit.")
+            dialogs.showwarning("Multiple Selection", "Please select only one reservation to edit.")
             return
 
         selected_item = selected_items[0]
@@ -125,7 +393,7 @@ class ReservationsPage(ttk.Frame):
         """
         selected_items = self.tree.selection()
         if not selected_items:
-            messagebox.showwarning("No Selection", "Please select at least one reservation from the list to delete.")
+            dialogs.showwarning("No Selection", "Please select at least one reservation from the list to delete.")
             return
 
         # Filter out the "No reservations found." message if it's somehow selected
@@ -136,21 +404,122 @@ class ReservationsPage(ttk.Frame):
                 items_to_delete.append((item_id, data[0])) # Store Treeview item ID and DB reservation ID
 
         if not items_to_delete:
-            messagebox.showwarning("No Valid Selection", "No valid reservations selected for deletion.")
+            dialogs.showwarning("No Valid Selection", "No valid reservations selected for deletion.")
             return
 
-        confirm = messagebox.askyesno("Confirm Deletion", f"Are you sure you want to delete {len(items_to_delete)} reservation(s)?")
+        confirm = dialogs.askyesno("Confirm Deletion", f"Are you sure you want to delete {len(items_to_delete)} reservation(s)?")
         if confirm:
-            deleted_count = 0
-            for tree_item_id, reservation_id in items_to_delete:
-                if delete_reservation(reservation_id):
-                    deleted_count += 1
-                else:
-                    # Optionally log which item failed to delete
-                    print(f"Failed to delete reservation ID: {reservation_id}")
-
-            if deleted_count > 0:
-                messagebox.showinfo("Success", f"{deleted_count} reservation(s) deleted successfully! ✅")
-                self.populate_table() # Refresh the table after all deletions
+            # Delete everything in one batched transaction instead of one commit per row
+            self._set_status(f"Deleting {len(items_to_delete)} reservation(s)…")
+            self.controller.db_worker.submit(
+                outbox.write, "delete_reservations", [int(reservation_id) for _, reservation_id in items_to_delete],
+                on_done=self._on_deleted, on_error=self._on_delete_error)
+
+    def _on_deleted(self, results):
+        """Reports the outcome of a batched delete and refreshes the table."""
+        self._set_status("")
+        if results is outbox.QUEUED:
+            dialogs.showinfo("Saved for Later", outbox.QUEUED_MESSAGE)
+            return
+        deleted_count = sum(1 for result in results if result.ok)
+        failed = [result for result in results if not result.ok]
+        failures = ""
+        if failed:
+            failures = f"{len(failed)} reservation(s) could not be deleted:\n"
+            failures += "\n".join(f"  ID {result.reservation_id}: {result.error}"
+                                   for result in failed[:MAX_LISTED_ERRORS])
+            if len(failed) > MAX_LISTED_ERRORS:
+                failures += f"\n  …and {len(failed) - MAX_LISTED_ERRORS} more"
+
+        if deleted_count > 0:
+            message = f"{deleted_count} reservation(s) deleted successfully! ✅"
+            if failed:
+                dialogs.showwarning("Partly Deleted", message + "\n" + failures)
             else:
-                messagebox.showerror("Error", "No reservations were deleted. Please check for database errors.")
\ No newline at end of file
+                dialogs.showinfo("Success", message)
+            self.refresh_table() # Remove just the deleted rows from the table
+        else:
+            dialogs.showerror("Error", "No reservations were deleted.\n" + failures)
+
+    def _on_delete_error(self, error):
+        """Reports a batched delete that could not be committed."""
+        self._set_status("")
+        dialogs.showerror(getattr(error, "title", "Database Error"), str(error))
+
+    def import_file(self):
+        """Imports reservations from a CSV or JSON Lines file in the background."""
+        path = filedialog.askopenfilename(
+            title="Import Reservations",
+            filetypes=[("CSV files", "*.csv"), ("JSON Lines files", "*.jsonl *.ndjson"), ("All files", "*.*")])
+        if not path:
+            return
+        self._set_status("Importing reservations…")
+        self.controller.db_worker.submit(import_reservations, path,
+                                         on_done=self._on_imported, on_error=self._on_transfer_error)
+
+    def _on_imported(self, report):
+        """Summarizes an import and shows the new rows."""
+        self._set_status("")
+        message = f"{report.imported} reservation(s) imported."
+        if report.rejected:
+            message += f"\n{report.rejected} row(s) were rejected:\n"
+            message += "\n".join(f"  line {line}: {error}" for line, error in report.errors[:MAX_LISTED_ERRORS])
+            if report.rejected > MAX_LISTED_ERRORS:
+                message += "\n  …"
+            dialogs.showwarning("Import Finished", message)
+        else:
+            dialogs.showinfo("Import Finished", message + " ✅")
+        self.refresh_table()
+
+    def export_file(self):
+        """Exports all reservations to a CSV or JSON Lines file in the background."""
+        path = filedialog.asksaveasfilename(
+            title="Export Reservations", defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv"), ("JSON Lines files", "*.jsonl")])
+        if not path:
+            return
+        self._set_status("Exporting reservations…")
+        self.controller.db_worker.submit(
+            export_reservations, path,
+            on_done=lambda count: self._on_exported(path, count), on_error=self._on_transfer_error)
+
+    def _on_exported(self, path, count):
+        self._set_status("")
+        dialogs.showinfo("Export Finished", f"{count} reservation(s) exported to {path}.")
+
+    def _on_transfer_error(self, error):
+        self._set_status("")
+        dialogs.showerror(getattr(error, "title", "Error"), str(error))
+
+
+# The functions below run on the database worker thread and must not touch Tk.
+
+def _fetch_page(filters, after_id=0, before_id=None):
+    """Fetches one keyset page, applying the search filters if any."""
+    if filters:
+        return search_reservations(after_id=after_id, before_id=before_id, limit=PAGE_SIZE, **filters)
+    return get_reservations_page(after_id=after_id, before_id=before_id, limit=PAGE_SIZE)
+
+def _load_first_page(filters):
+    """Returns (watermark, first page). The watermark is read first so no change is missed."""
+    watermark = get_change_watermark()
+    return watermark, _fetch_page(filters)
+
+def _collect_changes(since_seq, filters):
+    """
+    Reads the change log since since_seq and fetches the current version of every
+    inserted or updated reservation that still matches the filters.
+
+    Returns:
+        tuple: (since_seq, watermark, changes, matching rows); changes is None
+               when a full reload is needed.
+    """
+    watermark, changes = get_changes_since(since_seq)
+    if not changes:
+        return since_seq, watermark, changes, []
+    changed_ids = [reservation_id for reservation_id, op in changes.items() if op != 'D']
+    if filters:
+        matches = search_reservations(reservation_ids=changed_ids, limit=max(len(changed_ids), 1), **filters)
+    else:
+        matches = get_reservations_by_ids(changed_ids)
+    return since_seq, watermark, changes, matches
@@ -0,0 +1,131 @@
+import re
+import threading
+from collections import OrderedDict
+
+from repository import get_booked_seats, get_change_watermark, get_changes_since, get_reservations_by_ids
+
+# Standard seat labels ("12A") map to one bit each in a per-flight bitmap.
+# Anything else ("Crew-1") is kept in a small set next to the bitmap.
+# ASCII-only, like validation.SEAT_PATTERN: with Unicode rules \d takes other
+# scripts' digits and IGNORECASE matches "ı" as "I", seats the database keeps apart
+SEAT_PATTERN = re.compile(r"(\d{1,3})([A-Z])", re.IGNORECASE | re.ASCII)
+SEATS_PER_ROW = 26
+
+# How many flights keep their occupancy in memory before the least recently
+# used one is dropped (and reloaded from the database when next needed).
+MAX_CACHED_FLIGHTS = 512
+
+
+def seat_bit(seat_number):
+    """
+    Returns the bitmap position of a standard seat label, or None if the label
+    does not look like a row number followed by a seat letter.
+    """
+    match = SEAT_PATTERN.fullmatch(seat_number.strip())
+    if not match:
+        return None
+    return int(match.group(1)) * SEATS_PER_ROW + ord(match.group(2).upper()) - ord("A")
+
+
+class FlightOccupancy:
+    """Booked seats of one flight: a bitmap of standard seats plus any odd labels."""
+    __slots__ = ("bitmap", "other_seats")
+
+    def __init__(self, seat_numbers=()):
+        self.bitmap = 0
+        self.other_seats = set()
+        for seat_number in seat_numbers:
+            self.add(seat_number)
+
+    def add(self, seat_number):
+        bit = seat_bit(seat_number)
+        if bit is None:
+            self.other_seats.add(seat_number.strip().upper())
+        else:
+            self.bitmap |= 1 << bit
+
+    def is_taken(self, seat_number):
+        bit = seat_bit(seat_number)
+        if bit is None:
+            return seat_number.strip().upper() in self.other_seats
+        return bool(self.bitmap >> bit & 1)
+
+
+class SeatInventory:
+    """
+    In-memory seat occupancy per (flight_number, date), for instant availability
+    checks while a booking is being entered.
+
+    Occupancy is loaded from the database the first time a flight is checked and
+    then kept current through the reservation change log: new bookings are folded
+    into the bitmaps, while updates or deletes (whose previous seat is unknown)
+    drop the cached flights so they reload on next use.
+
+    The inventory is only a fast pre-check. The unique seat index in the database
+    remains the authority, so a booking that races past the check still fails
+    cleanly in add_reservation().
+    """
+
+    def __init__(self, max_flights=MAX_CACHED_FLIGHTS):
+        self.max_flights = max_flights
+        self._flights = OrderedDict()
+        self._watermark = None
+        self._lock = threading.Lock()
+
+    def is_available(self, flight_number, date, seat_number):
+        """
+        Tells whether a seat is free on a flight.
+
+        Args:
+            flight_number (str): Flight number (case-insensitive).
+            date (str): Date of the flight.
+            seat_number (str): Seat to check (case-insensitive).
+
+        Returns:
+            bool: True if nobody has booked the seat, False if it is taken.
+        """
+        with self._lock:
+            self._sync()
+            return not self._occupancy(flight_number, date).is_taken(seat_number)
+
+    def clear(self):
+        """Forgets all cached occupancy."""
+        with self._lock:
+            self._flights.clear()
+            self._watermark = None
+
+    def _key(self, flight_number, date):
+        return flight_number.strip().upper(), date.strip()
+
+    def _occupancy(self, flight_number, date):
+        """Returns the cached occupancy of a flight, loading it on first use."""
+        key = self._key(flight_number, date)
+        occupancy = self._flights.get(key)
+        if occupancy is not None:
+            self._flights.move_to_end(key)
+            return occupancy
+        occupancy = FlightOccupancy(get_booked_seats(*key))
+        self._flights[key] = occupancy
+        if len(self._flights) > self.max_flights:
+            self._flights.popitem(last=False)
+        return occupancy
+
+    def _sync(self):
+        """Applies reservation changes made since the last check, by anyone."""
+        if self._watermark is None:
+            self._flights.clear()
+            self._watermark = get_change_watermark()
+            return
+        watermark, changes = get_changes_since(self._watermark)
+        if changes is None or any(op != 'I' for op in changes.values()):
+            self._flights.clear()
+        elif changes and self._flights:
+            for res in get_reservations_by_ids(changes):
+                occupancy = self._flights.get(self._key(res.flight_number, res.date))
+                if occupancy is not None:
+                    occupancy.add(res.seat_number)
+        self._watermark = watermark
+
+
+# Shared by every page so they all see the same cached occupancy
+inventory = SeatInventory()
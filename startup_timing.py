@@ -0,0 +1,162 @@
+"""
+Measures how long FlightyReserveMate takes from launch until its window is first
+painted, for the source app or for the PyInstaller build.
+
+Run with:
+    python startup_timing.py [--runs N]            # python main.py
+    python startup_timing.py --frozen [--runs N]   # the build in dist/ (pyinstaller main.spec)
+    python startup_timing.py --exe PATH [--runs N] # any other build
+    python startup_timing.py --compare [--build] [--runs N]  # every spec in SPECS, with bundle sizes
+
+Each run launches the app in a scratch directory with STARTUP_PROBE_ENV set to a
+file path. The app writes the wall-clock time of its first paint there and exits
+(see report_first_paint), so this works for windowed builds without a console.
+The first run starts from an empty database; the rest reuse it.
+"""
+import os
+import sys
+import time
+
+STARTUP_PROBE_ENV = "FLIGHTY_STARTUP_PROBE"
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# PyInstaller specs and the name of the executable each one builds in dist/
+SPECS = {
+    "main.spec": "main",                       # one file, unpacked to a temporary directory on every launch
+    "main_onedir.spec": "FlightyReserveMate",  # one folder, optimized bytecode, no console
+}
+
+
+def report_first_paint(app):
+    """
+    Called by main.py when STARTUP_PROBE_ENV is set: once the main window has been
+    mapped and drawn, writes the current time to the probe file and closes the app.
+    """
+    path = os.environ[STARTUP_PROBE_ENV]
+
+    def on_map(event):
+        if event.widget is app:
+            app.unbind("<Map>")
+            # Drawing happens on the idle pass that follows the map
+            app.after_idle(painted)
+
+    def painted():
+        app.update_idletasks()
+        with open(path, "w") as handle:
+            handle.write(repr(time.time()))
+        app.after(0, app.on_close)
+
+    app.bind("<Map>", on_map, add="+")
+
+
+def find_frozen_build(spec="main.spec"):
+    """Returns the executable PyInstaller built from spec, one-file or one-dir."""
+    name = SPECS[spec] + (".exe" if sys.platform == "win32" else "")
+    for candidate in (os.path.join(HERE, "dist", name), os.path.join(HERE, "dist", SPECS[spec], name)):
+        if os.path.isfile(candidate):
+            return candidate
+    raise SystemExit(f"No build of {spec} found in dist/; run `pyinstaller {spec}` first.")
+
+
+def bundle_size(executable):
+    """
+    Returns what has to be shipped for a build: its total size in bytes and its
+    number of files. A one-dir build is the whole folder around its executable.
+    """
+    folder = os.path.dirname(executable)
+    if os.path.normcase(folder) == os.path.normcase(os.path.join(HERE, "dist")):
+        return os.path.getsize(executable), 1
+    size = files = 0
+    for root, _dirs, names in os.walk(folder):
+        for name in names:
+            size += os.path.getsize(os.path.join(root, name))
+            files += 1
+    return size, files
+
+
+def time_to_first_paint(command, workdir, timeout=60):
+    """Launches command once and returns its time to first paint in milliseconds."""
+    import subprocess
+
+    probe = os.path.join(workdir, "first_paint.txt")
+    if os.path.exists(probe):
+        os.remove(probe)
+    env = dict(os.environ, **{STARTUP_PROBE_ENV: probe})
+    start = time.time()
+    subprocess.run(command, cwd=workdir, env=env, timeout=timeout, check=True)
+    with open(probe) as handle:
+        return (float(handle.read()) - start) * 1e3
+
+
+def measure(command, runs):
+    """Launches command runs times from a new scratch directory and returns the times to first paint."""
+    import shutil
+    import tempfile
+
+    workdir = tempfile.mkdtemp(prefix="flighty-startup-")
+    try:
+        return [time_to_first_paint(command, workdir) for _ in range(max(runs, 1))]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare_specs(runs, build):
+    """
+    Times every build in SPECS and prints its launch times next to its bundle
+    size, building them first with PyInstaller if build is true.
+    """
+    import statistics
+    import subprocess
+
+    print(f"{'spec':<20}{'size (MB)':>11}{'files':>8}{'first run':>11}{'min':>9}{'median':>9}{'max':>9}")
+    for spec in SPECS:
+        if build:
+            subprocess.run([sys.executable, "-m", "PyInstaller", "--noconfirm", "--log-level", "WARN", spec],
+                           cwd=HERE, check=True)
+        executable = find_frozen_build(spec)
+        size, files = bundle_size(executable)
+        samples = measure([executable], runs)
+        warm = samples[1:] or samples
+        print(f"{spec:<20}{size / 1e6:>11.1f}{files:>8}{samples[0]:>11.1f}"
+              f"{min(warm):>9.1f}{statistics.median(warm):>9.1f}{max(warm):>9.1f}")
+    print("Times to first paint in milliseconds; the first run starts from a new database.")
+
+
+def main(argv=None):
+    import argparse
+    import statistics
+
+    parser = argparse.ArgumentParser(description="Time from launch to first paint of FlightyReserveMate")
+    parser.add_argument("--runs", type=int, default=5, help="launches to measure (default: %(default)s)")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--frozen", action="store_true", help="measure the PyInstaller build in dist/")
+    target.add_argument("--exe", help="measure this executable")
+    target.add_argument("--compare", action="store_true",
+                        help=f"measure the builds of {' and '.join(SPECS)} with their bundle sizes")
+    parser.add_argument("--build", action="store_true", help="with --compare, run PyInstaller on each spec first")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare_specs(args.runs, args.build)
+        return
+
+    if args.exe:
+        command, label = [os.path.abspath(args.exe)], args.exe
+    elif args.frozen:
+        executable = find_frozen_build()
+        command, label = [executable], os.path.relpath(executable, HERE)
+    else:
+        command, label = [sys.executable, os.path.join(HERE, "main.py")], "python main.py"
+
+    samples = measure(command, args.runs)
+
+    print(f"Time to first paint of {label} (milliseconds)")
+    print(f"first run (new database) {samples[0]:>9.1f}")
+    warm = samples[1:]
+    if warm:
+        print(f"later runs  min {min(warm):.1f}  median {statistics.median(warm):.1f}  max {max(warm):.1f}")
+
+
+if __name__ == "__main__":
+    main()
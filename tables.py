@@ -0,0 +1,31 @@
+"""
+Read-only tables for the pages that show figures rather than records to edit
+(the dashboard and diagnostics pages).
+"""
+from tkinter import ttk
+
+
+def make_table(parent, columns, height=6):
+    """
+    Builds a Treeview with a vertical scrollbar, both in a frame of their own.
+    Rows cannot be selected; set selectmode on the result to allow it.
+
+    Args:
+        parent (tk.Widget): Widget to create the frame in.
+        columns (list): (heading, width, anchor) for each column, in order.
+        height (int): Rows shown without scrolling.
+
+    Returns:
+        ttk.Treeview: The table. Lay out its frame, tree.master, with pack or grid.
+    """
+    frame = ttk.Frame(parent)
+    scroll = ttk.Scrollbar(frame)
+    scroll.pack(side="right", fill="y")
+    tree = ttk.Treeview(frame, columns=[name for name, _, _ in columns], show="headings", height=height,
+                        yscrollcommand=scroll.set, selectmode="none")
+    scroll.config(command=tree.yview)
+    for name, width, anchor in columns:
+        tree.heading(name, text=name, anchor=anchor)
+        tree.column(name, width=width, anchor=anchor)
+    tree.pack(fill="both", expand=True)
+    return tree
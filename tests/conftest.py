@@ -0,0 +1,36 @@
+"""
+Shared fixtures. Every test works on its own database file in pytest's
+temporary directory, never on flights.db.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import repository  # noqa: E402  (needs the path above)
+
+
+@pytest.fixture
+def database_path(tmp_path, monkeypatch):
+    """Points the repository at a new, empty database file and returns its path."""
+    path = str(tmp_path / "flights.db")
+    monkeypatch.setattr(repository, "DATABASE_NAME", path)
+    repository.reservation_cache.clear()
+    yield path
+    repository.close_connections()
+    repository.reservation_cache.clear()
+
+
+@pytest.fixture
+def database(database_path):
+    """A new database with the current schema."""
+    repository.create_table()
+    return database_path
+
+
+def booking(name="Sara Hassan", flight_number="FR123", departure="Cairo", destination="London",
+            date="2031-05-04", seat_number="12A"):
+    """The six fields of a valid reservation, in repository order."""
+    return (name, flight_number, departure, destination, date, seat_number)
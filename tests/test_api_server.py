@@ -0,0 +1,124 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+import api_server
+from conftest import booking
+from validation import FIELDS
+
+
+@pytest.fixture
+def api(database):
+    """Serves the test database and returns call(method, path, body=None) -> (status, payload)."""
+    server = api_server.APIServer(("127.0.0.1", 0), workers=2)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+
+    def call(method, path, body=None):
+        conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=10)
+        try:
+            conn.request(method, path, body=None if body is None else json.dumps(body),
+                         headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            return response.status, json.loads(response.read())
+        finally:
+            conn.close()
+
+    yield call
+    server.shutdown()
+    server.server_close()
+
+
+def reservation(**changes):
+    return dict(zip(FIELDS, booking(**changes)))
+
+
+def test_book_and_read_back(api):
+    status, payload = api("POST", "/reservations", reservation())
+    assert status == 201
+    status, payload = api("GET", f"/reservations/{payload['id']}")
+    assert status == 200
+    assert payload["reservation"]["name"] == "Sara Hassan"
+
+
+def test_invalid_fields_are_reported_per_field(api):
+    status, payload = api("POST", "/reservations", reservation(date="2031-02-30", seat_number="aisle"))
+    assert status == 400
+    assert set(payload["error"]["fields"]) == {"date", "seat_number"}
+
+
+def test_taken_seat_conflicts(api):
+    assert api("POST", "/reservations", reservation())[0] == 201
+    status, payload = api("POST", "/reservations", reservation(name="Omar Saleh"))
+    assert status == 409
+    assert "12A" in payload["error"]["message"]
+
+
+def test_stale_version_conflicts_with_what_is_stored(api):
+    reservation_id = api("POST", "/reservations", reservation())[1]["id"]
+    version = api("GET", f"/reservations/{reservation_id}")[1]["version"]
+    status, payload = api("PUT", f"/reservations/{reservation_id}", dict(reservation(name="Sara Ali"), version=version))
+    assert (status, payload["version"]) == (200, version + 1)
+
+    status, payload = api("PUT", f"/reservations/{reservation_id}", dict(reservation(name="Sara Omar"), version=version))
+    assert status == 409
+    assert payload["version"] == version + 1
+    assert payload["reservation"]["name"] == "Sara Ali"
+
+
+@pytest.mark.parametrize("method, body", [("GET", None), ("PUT", reservation()), ("DELETE", None)])
+def test_unknown_reservation_is_not_found(api, method, body):
+    status, payload = api(method, "/reservations/999", body)
+    assert status == 404
+    assert payload["error"]["title"]
+
+
+def test_unknown_path_is_not_found(api):
+    assert api("GET", "/nothing-here")[0] == 404
+
+
+def test_search_by_ids_is_capped(api):
+    reservation_id = api("POST", "/reservations", reservation())[1]["id"]
+    ids = [reservation_id] + list(range(1000, 1000 + api_server.MAX_PAGE_SIZE))
+    status, payload = api("GET", "/reservations?ids=" + ",".join(map(str, ids[:api_server.MAX_PAGE_SIZE])))
+    assert (status, [row["id"] for row in payload["reservations"]]) == (200, [reservation_id])
+
+    status, payload = api("GET", "/reservations?archived=1&ids=" + ",".join(map(str, ids)))
+    assert status == 400
+    assert str(api_server.MAX_PAGE_SIZE) in payload["error"]["message"]
+
+
+def test_batch_reports_every_item_and_writes_the_valid_ones(api):
+    items = [reservation(), reservation(date="2031-02-30"), "not an object", reservation(name="Omar Saleh"),
+             reservation(name="Nour Kamal", seat_number="12B")]
+    status, payload = api("POST", "/reservations/batch", {"reservations": items})
+    assert status == 200
+    results = payload["results"]
+    assert [result["index"] for result in results] == [0, 1, 2, 3, 4]
+    assert [result["ok"] for result in results] == [True, False, False, False, True]
+    assert results[1]["fields"] == {"date": "2031-02-30 is not a real date."}
+    assert "12A" in results[3]["error"]  # Seat taken by item 0
+
+    status, payload = api("GET", "/reservations")
+    assert [row["name"] for row in payload["reservations"]] == ["Sara Hassan", "Nour Kamal"]
+
+
+def test_batch_update_and_delete_report_missing_ids(api):
+    reservation_id = api("POST", "/reservations", reservation())[1]["id"]
+    status, payload = api("POST", "/reservations/batch/update",
+                          {"reservations": [dict(reservation(name="Sara Ali"), id=reservation_id),
+                                            dict(reservation(seat_number="3C"), id=999)]})
+    assert [result["ok"] for result in payload["results"]] == [True, False]
+
+    status, payload = api("POST", "/reservations/batch/delete", {"ids": [reservation_id, reservation_id, 999]})
+    assert status == 200
+    assert [result["ok"] for result in payload["results"]] == [True, False, False]
+    assert api("GET", f"/reservations/{reservation_id}")[0] == 404
+
+
+def test_booked_seats_path_is_percent_decoded(api):
+    api("POST", "/reservations", reservation())
+    status, payload = api("GET", "/flights/FR123/2031%2D05%2D04/seats")
+    assert (status, payload["booked"]) == (200, ["12A"])
@@ -0,0 +1,99 @@
+import sqlite3
+
+import pytest
+
+import migrations
+import repository
+from conftest import booking
+
+# The only table of the first release, as its database.py created it
+BASELINE_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS reservations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        flight_number TEXT NOT NULL,
+        departure TEXT NOT NULL,
+        destination TEXT NOT NULL,
+        date TEXT NOT NULL,
+        seat_number TEXT NOT NULL
+    )
+'''
+
+BASELINE_ROWS = [
+    booking(),
+    booking(name="Omar Saleh", seat_number="12B"),
+    booking(name="Nour Kamal", flight_number="fr123", seat_number="3C"),  # Same flight, other spelling
+    booking(name="Emma Clark", flight_number="BA77", departure="London", destination="Paris", date="2031-06-01"),
+    booking(name="Ali Nasser", date="2031-05-05", seat_number="1A"),
+]
+
+
+def create_baseline(path, rows):
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute(BASELINE_SCHEMA)
+        conn.executemany('INSERT INTO reservations (name, flight_number, departure, destination, date, seat_number) '
+                         'VALUES (?, ?, ?, ?, ?, ?)', rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def stored():
+    return [tuple(reservation) for reservation in repository.get_reservations_page(limit=100)]
+
+
+def test_baseline_database_is_upgraded_with_every_reservation(database_path):
+    create_baseline(database_path, BASELINE_ROWS)
+
+    repository.create_table()
+
+    assert migrations.schema_version() == migrations.SCHEMA_VERSION
+    # Every row survives; the flight number takes the first spelling stored
+    expected = [(index,) + row for index, row in enumerate(BASELINE_ROWS, start=1)]
+    expected[2] = expected[2][:2] + ("FR123",) + expected[2][3:]
+    assert stored() == expected
+    assert [reservation.name for reservation in repository.search_reservations(name="nour")] == ["Nour Kamal"]
+    # Both spellings of FR123 are one flight now, with one seat map
+    assert sorted(repository.get_booked_seats("FR123", "2031-05-04")) == ["12A", "12B", "3C"]
+    with pytest.raises(repository.SeatUnavailableError):
+        repository.add_reservation(*booking(name="Hana Fathy"))
+    assert repository.add_reservation(*booking(name="Hana Fathy", seat_number="4D")) == len(BASELINE_ROWS) + 1
+
+
+def test_upgrade_is_not_repeated(database_path):
+    create_baseline(database_path, BASELINE_ROWS)
+    repository.create_table()
+
+    assert migrations.migrate() == 0
+    assert len(stored()) == len(BASELINE_ROWS)
+
+
+def test_upgrade_in_chunks_reports_progress(database_path, monkeypatch):
+    monkeypatch.setattr(migrations, "CHUNK_SIZE", 2)
+    monkeypatch.setattr(migrations, "MAX_PAUSE", 0)
+    create_baseline(database_path, BASELINE_ROWS)
+    reports = []
+
+    repository.create_table(reports.append)
+
+    copied = [report for report in reports if report.version == 2 and report.step == "copy"]
+    assert copied[-1].done == copied[-1].total == len(BASELINE_ROWS)
+    assert len(copied) > 3  # One report per chunk, not just before and after
+    assert [row[1] for row in stored()] == [row[0] for row in BASELINE_ROWS]
+
+
+def test_invalid_dates_stop_the_upgrade_until_corrected(database_path):
+    create_baseline(database_path, BASELINE_ROWS + [booking(name="Karim Ali", date="2031-02-30")])
+
+    with pytest.raises(repository.MigrationError, match="2031-02-30"):
+        repository.create_table()
+    repository.close_connections()
+
+    conn = sqlite3.connect(database_path)
+    conn.execute("UPDATE reservations SET date = '2031-03-02' WHERE date = '2031-02-30'")
+    conn.commit()
+    conn.close()
+    repository.create_table()
+    assert migrations.schema_version() == migrations.SCHEMA_VERSION
+    assert stored()[-1][1:] == booking(name="Karim Ali", date="2031-03-02")
@@ -0,0 +1,73 @@
+import sqlite3
+
+import pytest
+
+import outbox
+import repository
+from conftest import booking
+
+
+@pytest.fixture
+def locked(database, monkeypatch):
+    """Another connection holding the write lock, with the app's waits made short."""
+    monkeypatch.setattr(repository, "BUSY_TIMEOUT", 0.05)
+    monkeypatch.setattr(repository, "RETRY_DELAY", 0.001)
+    repository.close_connections()  # Reopen with the short timeout
+    conn = sqlite3.connect(database, isolation_level=None)
+    conn.execute("BEGIN IMMEDIATE")
+    yield conn
+    if conn.in_transaction:
+        conn.execute("ROLLBACK")
+    conn.close()
+
+
+def stored_names():
+    return [reservation.name for reservation in repository.get_reservations_page(limit=100)]
+
+
+def test_busy_write_is_queued_and_replayed(locked):
+    assert outbox.write("add_reservation", *booking()) is outbox.QUEUED
+    assert [entry.operation for entry in outbox.pending()] == ["add_reservation"]
+
+    report = outbox.drain()
+    assert (report.applied, report.pending) == (0, 1)  # Still locked: nothing lost, nothing made
+
+    locked.execute("ROLLBACK")
+    report = outbox.drain()
+    assert (report.applied, report.rejected, report.pending) == (1, [], 0)
+    assert stored_names() == ["Sara Hassan"]
+    assert outbox.pending() == []
+
+
+def test_queued_writes_are_replayed_in_order(locked):
+    outbox.enqueue("add_reservation", *booking())
+    outbox.enqueue("add_reservation", *booking(name="Omar Saleh", seat_number="12B"))
+    outbox.enqueue("delete_reservations", [1])
+    locked.execute("ROLLBACK")
+
+    report = outbox.drain()
+    assert (report.applied, report.rejected, report.pending) == (3, [], 0)
+    assert stored_names() == ["Omar Saleh"]
+
+
+def test_replaying_a_stored_booking_is_not_a_double_booking(database):
+    repository.add_reservation(*booking())
+    outbox.enqueue("add_reservation", *booking())  # As if the app stopped before removing it
+
+    report = outbox.drain()
+    assert (report.applied, report.rejected) == (1, [])
+    assert stored_names() == ["Sara Hassan"]
+
+
+def test_write_that_can_no_longer_be_made_is_rejected_and_kept(database):
+    outbox.enqueue("add_reservation", *booking())
+    repository.add_reservation(*booking(name="Omar Saleh"))  # Someone else took the seat meanwhile
+
+    report = outbox.drain()
+    assert report.applied == 0
+    assert [entry.args[0] for entry in report.rejected] == ["Sara Hassan"]
+    assert "12A" in report.rejected[0].error
+    assert [entry.args[0] for entry in outbox.rejected()] == ["Sara Hassan"]
+
+    outbox.discard(entry.id for entry in report.rejected)
+    assert outbox.rejected() == []
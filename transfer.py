@@ -0,0 +1,176 @@
+import csv
+import json
+import os
+from collections import namedtuple
+from itertools import islice
+
+from repository import add_reservations, get_reservations_page, read_snapshot
+from validation import FIELDS, validate_reservations
+
+# Rows are read, validated and inserted this many at a time, one transaction per
+# chunk, so memory use stays flat no matter how large the file is.
+IMPORT_CHUNK_SIZE = 5000
+EXPORT_PAGE_SIZE = 5000
+
+# Only the first few rejected rows are kept for the report; the rest are counted.
+MAX_REPORTED_ERRORS = 100
+
+FORMATS = ("csv", "jsonl")
+
+# imported/rejected are row counts; errors is a list of (line number, message)
+ImportReport = namedtuple("ImportReport", ["imported", "rejected", "errors"])
+
+
+def detect_format(path):
+    """
+    Picks the file format from the file extension.
+
+    Returns:
+        str: "csv" or "jsonl".
+
+    Raises:
+        ValueError: If the extension is not recognised.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson", ".json"):
+        return "jsonl"
+    raise ValueError(f"Cannot tell the format of '{path}'; use a .csv or .jsonl file.")
+
+
+def _read_csv(handle):
+    """Yields (line number, field values) from a CSV file with a header row."""
+    reader = csv.DictReader(handle)
+    missing = [field for field in FIELDS if field not in (reader.fieldnames or ())]
+    if missing:
+        raise ValueError(f"CSV header is missing column(s): {', '.join(missing)}")
+    for record in reader:
+        yield reader.line_num, tuple((record[field] or "").strip() for field in FIELDS)
+
+
+def _read_jsonl(handle):
+    """Yields (line number, field values) from a JSON Lines file, one object per line."""
+    for line_number, line in enumerate(handle, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, e
+            continue
+        if not isinstance(record, dict):
+            yield line_number, ValueError("Each line must be a JSON object")
+            continue
+        yield line_number, tuple(("" if record.get(field) is None else str(record.get(field))).strip()
+                                 for field in FIELDS)
+
+
+def import_reservations(path, fmt=None, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    """
+    Streams reservations from a CSV or JSON Lines file into the database.
+
+    Every row is checked with the same rules as the booking form. Valid rows are
+    inserted chunk by chunk through add_reservations(); rows that fail validation
+    or are rejected by the database (for example an already booked seat) are
+    skipped and reported.
+
+    Args:
+        path (str): File to read. CSV files need a header row naming the columns.
+        fmt (str): "csv" or "jsonl"; detected from the extension if omitted.
+        chunk_size (int): Rows per insert transaction.
+        progress (callable): Called as progress(imported, rejected) after each chunk.
+
+    Returns:
+        ImportReport: Counts of imported and rejected rows, plus the first
+                      MAX_REPORTED_ERRORS problems with their line numbers.
+
+    Raises:
+        RepositoryError: If a chunk could not be committed at all. Rows of earlier
+                         chunks stay imported.
+    """
+    fmt = fmt or detect_format(path)
+    reader = _read_csv if fmt == "csv" else _read_jsonl
+    imported = rejected = 0
+    errors = []
+
+    def reject(line_number, message):
+        nonlocal rejected
+        rejected += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append((line_number, message))
+
+    with open(path, newline="", encoding="utf-8") as handle:
+        records = reader(handle)
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+            parsed = []
+            for line_number, row in chunk:
+                if isinstance(row, Exception):
+                    reject(line_number, str(row))
+                else:
+                    parsed.append((line_number, row))
+            valid_lines, valid_rows = [], []
+            for (line_number, row), error in zip(parsed, validate_reservations(row for _, row in parsed)):
+                if error:
+                    reject(line_number, error)
+                    continue
+                valid_lines.append(line_number)
+                valid_rows.append(row)
+            # A chunk with nothing valid to write would still take the write lock
+            if valid_rows:
+                for line_number, result in zip(valid_lines, add_reservations(valid_rows)):
+                    if result.ok:
+                        imported += 1
+                    else:
+                        reject(line_number, result.error)
+            if progress:
+                progress(imported, rejected)
+
+    return ImportReport(imported, rejected, sorted(errors))
+
+
+def export_reservations(path, fmt=None, page_size=EXPORT_PAGE_SIZE, progress=None):
+    """
+    Streams every reservation to a CSV or JSON Lines file, page by page in ID
+    order, so only one page is ever held in memory.
+
+    All pages are read from one snapshot of the database, so the file is the
+    reservations exactly as they stood when the export started, even while
+    bookings keep being made and changed.
+
+    Args:
+        path (str): File to write; it is overwritten.
+        fmt (str): "csv" or "jsonl"; detected from the extension if omitted.
+        page_size (int): Reservations fetched per query.
+        progress (callable): Called as progress(exported) after each page.
+
+    Returns:
+        int: Number of reservations written.
+    """
+    fmt = fmt or detect_format(path)
+    columns = ("id",) + FIELDS
+    exported = 0
+    with open(path, "w", newline="", encoding="utf-8") as handle:
+        if fmt == "csv":
+            writer = csv.writer(handle)
+            writer.writerow(columns)
+            write_page = writer.writerows
+        else:
+            def write_page(rows):
+                handle.writelines(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in rows)
+
+        with read_snapshot():
+            last_id = 0
+            while True:
+                rows = get_reservations_page(after_id=last_id, limit=page_size)
+                if not rows:
+                    break
+                write_page(rows)
+                exported += len(rows)
+                last_id = rows[-1][0]
+                if progress:
+                    progress(exported)
+    return exported
@@ -0,0 +1,180 @@
+"""
+Rules every reservation must pass before it is written, shared by the booking
+and edit forms, bulk import, cli.py and the HTTP API.
+
+The patterns are compiled once, at import, and each field's check is cached by
+value: flight numbers, cities, dates and seats repeat across the rows of an
+import, so most of them are checked once per import rather than once per row.
+"""
+import datetime
+import functools
+import re
+
+from repository import nocase
+
+# Reservation fields in the order used by the forms, the database and import files
+FIELDS = ("name", "flight_number", "departure", "destination", "date", "seat_number")
+
+# How each field is called in messages
+FIELD_LABELS = {
+    "name": "Name",
+    "flight_number": "Flight number",
+    "departure": "Departure",
+    "destination": "Destination",
+    "date": "Date",
+    "seat_number": "Seat number",
+}
+
+NAME_MAX_LENGTH = 100
+
+# Airline code (two letters or digits, or three letters) and 1-4 digits, with an
+# optional operational suffix letter: FR123, 9W7, BAW1234, AA100A. The numeric
+# patterns are ASCII-only: \d would otherwise accept other scripts' digits, which
+# the repository rejects.
+FLIGHT_NUMBER_PATTERN = re.compile(r"(?:[A-Z\d]{2}|[A-Z]{3})\d{1,4}[A-Z]?", re.IGNORECASE | re.ASCII)
+
+# A place name: starts with a letter, then letters, spaces and . , ' ( ) -
+PLACE_PATTERN = re.compile(r"[^\W\d_][\w .,'()\-]{0,59}")
+
+DATE_PATTERN = re.compile(r"(\d{4})-(\d{2})-(\d{2})", re.ASCII)
+
+# Row number and seat letter, as seats.py maps them: 12A, 3f
+SEAT_PATTERN = re.compile(r"\d{1,3}[A-Z]", re.IGNORECASE | re.ASCII)
+
+# Distinct values remembered per field check
+FIELD_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=FIELD_CACHE_SIZE)
+def _check_name(name):
+    if len(name) > NAME_MAX_LENGTH:
+        return f"At most {NAME_MAX_LENGTH} characters."
+    if not name.isprintable():
+        return "Contains characters that cannot be shown."
+    return None
+
+
+@functools.lru_cache(maxsize=FIELD_CACHE_SIZE)
+def _check_flight_number(flight_number):
+    if not FLIGHT_NUMBER_PATTERN.fullmatch(flight_number):
+        return "An airline code and a number, such as FR123."
+    return None
+
+
+@functools.lru_cache(maxsize=FIELD_CACHE_SIZE)
+def _check_place(place):
+    if not PLACE_PATTERN.fullmatch(place):
+        return "A place name of at most 60 letters, spaces and . , ' ( ) -"
+    return None
+
+
+@functools.lru_cache(maxsize=FIELD_CACHE_SIZE)
+def _check_date(date):
+    match = DATE_PATTERN.fullmatch(date)
+    if not match:
+        return "Please use YYYY-MM-DD format for the date."
+    try:
+        datetime.date(*(int(part) for part in match.groups()))
+    except ValueError:
+        return f"{date} is not a real date."
+    return None
+
+
+@functools.lru_cache(maxsize=FIELD_CACHE_SIZE)
+def _check_seat_number(seat_number):
+    if not SEAT_PATTERN.fullmatch(seat_number):
+        return "A row number and a seat letter, such as 12A."
+    return None
+
+
+# The check of each field, in FIELDS order
+_CHECKS = (_check_name, _check_flight_number, _check_place, _check_place, _check_date, _check_seat_number)
+
+
+def check_reservation(name, flight_number, departure, destination, date, seat_number):
+    """
+    Applies every rule to one reservation and reports each field's problem,
+    for showing next to the form fields.
+
+    Args:
+        name (str): Passenger's name.
+        flight_number (str): Flight number.
+        departure (str): Departure location.
+        destination (str): Destination location.
+        date (str): Date of the flight.
+        seat_number (str): Seat number.
+
+    Returns:
+        dict: Field name (from FIELDS) to a short message, for every field with
+              a problem; empty if the reservation is valid.
+    """
+    values = (name, flight_number, departure, destination, date, seat_number)
+    errors = {}
+    for field, check, value in zip(FIELDS, _CHECKS, values):
+        if not value:
+            errors[field] = "Required."
+        else:
+            error = check(value)
+            if error:
+                errors[field] = error
+    # Compared the way the database compares them (NOCASE), so both agree on
+    # what counts as the same place
+    if "departure" not in errors and "destination" not in errors and nocase(departure) == nocase(destination):
+        errors["destination"] = "Must differ from the departure."
+    return errors
+
+
+def validate_reservation(name, flight_number, departure, destination, date, seat_number):
+    """
+    Applies every rule to one reservation.
+
+    Returns:
+        str: A message describing the first problem found, naming its field,
+             or None if the reservation is valid.
+    """
+    errors = check_reservation(name, flight_number, departure, destination, date, seat_number)
+    return describe_errors(errors)
+
+
+def validate_reservations(rows):
+    """
+    Applies every rule to many reservations, such as one chunk of an import.
+    Gives the same answers as validate_reservation() row by row, with the
+    field checks looked up once for the whole batch.
+
+    Args:
+        rows (iterable): Tuples of the six fields in FIELDS order.
+
+    Returns:
+        list: For each row, in order, a message describing its first problem,
+              or None if it is valid.
+    """
+    check_name, check_flight_number, check_place, check_date, check_seat_number = (
+        _check_name, _check_flight_number, _check_place, _check_date, _check_seat_number)
+    results = []
+    for row in rows:
+        name, flight_number, departure, destination, date, seat_number = row
+        # Fast path: every field present and passing, which is nearly every row
+        if (name and flight_number and departure and destination and date and seat_number
+                and check_name(name) is None and check_flight_number(flight_number) is None
+                and check_place(departure) is None and check_place(destination) is None
+                and check_date(date) is None and check_seat_number(seat_number) is None
+                and nocase(departure) != nocase(destination)):
+            results.append(None)
+        else:
+            results.append(describe_errors(check_reservation(*row)))
+    return results
+
+
+def describe_errors(errors):
+    """One line for the first problem in a check_reservation() result, or None if there is none."""
+    for field in FIELDS:
+        if field in errors:
+            return f"{FIELD_LABELS[field]}: {errors[field]}"
+    return None
+
+
+def cache_info():
+    """Hits, misses and sizes of the field check caches, by check name."""
+    return {check.__name__.replace("_check_", ""): check.cache_info()
+            for check in (_check_name, _check_flight_number, _check_place, _check_date, _check_seat_number)}
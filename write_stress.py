@@ -0,0 +1,151 @@
+"""
+Stress test for concurrent writers: writer processes book into one database
+while another process keeps taking its write lock, first with one attempt per
+write and then with retries and the outbox (see outbox.py), and every booking
+of the second run is checked to have been stored exactly once. Exits with
+status 1 if any was lost.
+
+Run with:
+    python write_stress.py [--writers N] [--bookings N] [--busy-timeout S] [--hold-ms N] [--gap-ms N]
+
+Works on throwaway databases in a temporary directory (see benchmark.py), so it
+never touches the real flights.db.
+"""
+import argparse
+import multiprocessing
+import sqlite3
+import time
+from datetime import date, timedelta
+
+import outbox
+import repository
+from benchmark import CITIES, latency_summary, use_database
+
+
+def stress_rows(writer, bookings, flights=20):
+    """
+    The bookings of one stress writer: all writers share a few flights (so they
+    contend for the same flight and count rows) but every booking has its own
+    seat, so each one must end up stored exactly once.
+    """
+    day = date(2030, 1, 1)
+    rows = []
+    for i in range(bookings):
+        k = writer * bookings + i
+        flight = k % flights
+        seat = k // flights
+        rows.append((f"Stress {writer}-{i}", f"ST{flight:03d}", CITIES[flight % len(CITIES)],
+                     CITIES[(flight + 1) % len(CITIES)], (day + timedelta(days=flight % 3)).isoformat(),
+                     f"{seat // 26 + 1}{chr(ord('A') + seat % 26)}"))
+    return rows
+
+
+def run_stress_writer(path, rows, busy_timeout, use_outbox):
+    """
+    One stress writer process. With use_outbox it books through outbox.write()
+    with the usual retries and finally drains its queue; without, it makes one
+    attempt per booking and counts the ones that failed as lost.
+
+    Returns:
+        dict: Counts of direct, queued and failed bookings, and latencies.
+    """
+    repository.DATABASE_NAME = path
+    repository.BUSY_TIMEOUT = busy_timeout
+    if not use_outbox:
+        repository.WRITE_RETRIES = 0
+    samples, direct, queued, failed = [], 0, 0, 0
+    for row in rows:
+        start = time.perf_counter()
+        try:
+            if use_outbox:
+                result = outbox.write("add_reservation", *row)
+            else:
+                result = repository.add_reservation(*row)
+        except repository.RepositoryError:
+            failed += 1
+        else:
+            if result is outbox.QUEUED:
+                queued += 1
+            else:
+                direct += 1
+        samples.append(time.perf_counter() - start)
+    if use_outbox:
+        # What the GUI does in the background: keep draining until the queue is empty
+        while True:
+            report = outbox.drain()
+            failed += len(report.rejected)
+            if report.pending == 0:
+                break
+            time.sleep(0.1)
+    repository.close_connections()
+    return {"samples": samples, "direct": direct, "queued": queued, "failed": failed}
+
+
+def run_lock_holder(path, hold, gap, stop):
+    """Plays a batch job: keeps taking the write lock for `hold` seconds, every `gap` seconds."""
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    while not stop.is_set():
+        conn.execute("BEGIN IMMEDIATE")
+        time.sleep(hold)
+        conn.execute("COMMIT")
+        time.sleep(gap)
+    conn.close()
+
+
+def bench_stress(args):
+    """
+    N writer processes book into one database while another process keeps
+    locking it, first with one attempt per write and then with retries and the
+    outbox, and checks that every booking of the second run was stored.
+    """
+    print(f"{args.writers} writers x {args.bookings} bookings, busy timeout {args.busy_timeout * 1e3:.0f} ms, "
+          f"another process holding the write lock {args.hold_ms} ms out of every {args.hold_ms + args.gap_ms} ms")
+    print(f"{'mode':<22}{'stored':>8}{'direct':>8}{'queued':>8}{'lost':>6}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    lost_with_outbox = None
+    for mode, use_outbox in (("one attempt", False), ("retries + outbox", True)):
+        path = use_database(f"stress_{use_outbox}.db")
+        repository.close_connections()
+        stop = multiprocessing.Event()
+        holder = multiprocessing.Process(target=run_lock_holder,
+                                         args=(path, args.hold_ms / 1e3, args.gap_ms / 1e3, stop))
+        holder.start()
+        work = [(path, stress_rows(writer, args.bookings), args.busy_timeout, use_outbox)
+                for writer in range(args.writers)]
+        try:
+            with multiprocessing.Pool(args.writers) as pool:
+                outcomes = pool.starmap(run_stress_writer, work)
+        finally:
+            stop.set()
+            holder.join()
+
+        conn = sqlite3.connect(path)
+        stored = conn.execute("SELECT COUNT(DISTINCT name) FROM reservations WHERE name LIKE 'Stress %'").fetchone()[0]
+        duplicates = conn.execute("SELECT COUNT(*) FROM reservations").fetchone()[0] - stored
+        counted = conn.execute("SELECT COALESCE(SUM(booked), 0) FROM flight_bookings").fetchone()[0]
+        conn.close()
+        expected = args.writers * args.bookings
+        summary = latency_summary([sample for outcome in outcomes for sample in outcome["samples"]])
+        print(f"{mode:<22}{stored:>8}{sum(o['direct'] for o in outcomes):>8}{sum(o['queued'] for o in outcomes):>8}"
+              f"{expected - stored:>6}{summary['p50_ms']:>9.2f}{summary['p99_ms']:>9.2f}{summary['max_ms']:>9.2f}")
+        if duplicates or counted != stored + duplicates:
+            print(f"  inconsistent: {duplicates} duplicate rows, booking counts say {counted}")
+        if use_outbox:
+            lost_with_outbox = expected - stored + duplicates
+    if lost_with_outbox:
+        raise SystemExit(1)
+    print("No bookings lost with retries and the outbox.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent writer processes against a locked database")
+    parser.add_argument("--writers", type=int, default=8, help="writer processes")
+    parser.add_argument("--bookings", type=int, default=500, help="bookings per writer")
+    parser.add_argument("--busy-timeout", type=float, default=0.05,
+                        help="seconds each write waits for the lock (short, to force retries)")
+    parser.add_argument("--hold-ms", type=int, default=1000, help="how long the lock holder keeps the write lock")
+    parser.add_argument("--gap-ms", type=int, default=200, help="pause between the lock holder's transactions")
+    bench_stress(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()